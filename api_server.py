@@ -0,0 +1,333 @@
+import argparse
+import datetime
+import io
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import feature_store
+import metrics
+import scoring
+from model_utils import load_model, model_version, predict_batch, predict_from_weather, prediction_cache
+from schema import coerce as coerce_schema, load_seoul_static
+from stale_cache import stale_while_revalidate
+from utils import (
+    SEOUL_GU_CENTERS, convert_latlon_to_xy, fetch_fcst_summary, get_asos_weather, get_risk_level,
+)
+
+# ----------------------- 헤드리스 JSON 위험도 API -----------------------
+# Streamlit 스크립트 재실행 없이 model_utils / utils 만으로 응답한다. 기상 조회는 격자·일자별
+# stale-while-revalidate 캐시, 예측은 model_utils 의 모델 홀더·예측 캐시를 그대로 공유한다.
+#   GET  /v1/risk?gu=강남구&date=2025-08-05      (또는 lat=..&lon=..)
+#   POST /v1/risk/batch  {"items": [{"gu": ..., "date": ...}, {"lat": ..., "lon": ..., "date": ...}]}
+#   GET  /v1/damage?date=2025-08-05
+#   GET  /health, /metrics
+# KMA_API_KEY / ASOS_API_KEY : 단기예보 / 종관기상관측 인증키
+# HEATAI_DATA_URL            : 학습 데이터 CSV 위치 (raw GitHub URL 등, 기본: 현재 폴더)
+DEFAULT_PORT = int(os.environ.get("HEATAI_API_PORT", "8800"))
+DATA_URL = os.environ.get("HEATAI_DATA_URL", "")
+MAX_BATCH = 500
+MAX_WORKERS = 16
+SEOUL_ASOS = "서울특별시"
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _parse_date(value) -> datetime.date:
+    if not value:
+        return datetime.date.today()
+    try:
+        return datetime.date.fromisoformat(str(value))
+    except ValueError:
+        raise BadRequest(f"date 형식 오류 (YYYY-MM-DD): {value}")
+
+
+def _locate(item: dict) -> tuple:
+    """요청 항목 → (자치구 또는 None, 위도, 경도)."""
+    if item.get("gu"):
+        gu = str(item["gu"]).strip()
+        if gu not in SEOUL_GU_CENTERS:
+            raise BadRequest(f"알 수 없는 자치구: {gu}")
+        return (gu, *SEOUL_GU_CENTERS[gu])
+    try:
+        return None, float(item["lat"]), float(item["lon"])
+    except (KeyError, TypeError, ValueError):
+        raise BadRequest("gu 또는 lat/lon 이 필요합니다")
+
+
+# ---- 기상 조회 (캐시 공유) ----
+@stale_while_revalidate("api.grid_fcst", fresh_ttl=600, is_good=bool,
+                        key=lambda nx, ny, target_date, kma_key: (nx, ny, target_date))
+def _grid_fcst(nx: int, ny: int, target_date: datetime.date, kma_key: str) -> dict:
+    return fetch_fcst_summary(nx, ny, target_date, kma_key)[0]
+
+
+def _source(lat: float, lon: float, target_date: datetime.date, today: datetime.date):
+    """과거는 서울 ASOS 관측, 오늘·미래는 단기예보 격자."""
+    if target_date < today:
+        return ("asos", target_date)
+    return ("fcst", convert_latlon_to_xy(lat, lon), target_date)
+
+
+def _fetch(source, keys: dict) -> dict:
+    if source[0] == "asos":
+        return get_asos_weather(SEOUL_ASOS, source[1].strftime("%Y%m%d"), keys["asos"])
+    (nx, ny), target_date = source[1], source[2]
+    out = _grid_fcst(nx, ny, target_date, keys["kma"])
+    return {**out, "age_s": _grid_fcst.age(nx, ny, target_date, keys["kma"])}
+
+
+def _describe(gu, lat, lon, target_date, source, weather: dict) -> dict:
+    return {"gu": gu, "lat": lat, "lon": lon, "date": target_date.isoformat(),
+            "source": "asos" if source[0] == "asos" else f"fcst {source[1][0]},{source[1][1]}",
+            "TMX": weather.get("TMX"), "TMN": weather.get("TMN"), "REH": weather.get("REH"),
+            "age_s": weather.get("age_s")}
+
+
+# ---- 엔드포인트 ----
+def risk_point(item: dict, keys: dict) -> dict:
+    gu, lat, lon = _locate(item)
+    target_date = _parse_date(item.get("date"))
+    source = _source(lat, lon, target_date, datetime.date.today())
+    weather = _fetch(source, keys)
+    out = _describe(gu, lat, lon, target_date, source, weather)
+    if None in (out["TMX"], out["TMN"], out["REH"]):
+        return {**out, "pred": None, "risk": None, "error": "기상 자료 없음"}
+    pred, _, heat_index, _ = predict_from_weather(out["TMX"], out["TMN"], out["REH"],
+                                                  day=target_date, key=SEOUL_ASOS)
+    return {**out, "heat_index": heat_index, "pred": round(float(pred), 2), "risk": get_risk_level(pred),
+            "model_version": model_version()}
+
+
+def risk_batch(items: list, keys: dict) -> dict:
+    """같은 격자·일자는 한 번만 조회하고 전체를 predict_batch 1회로 채점."""
+    if not isinstance(items, list) or not items:
+        raise BadRequest("items 목록이 필요합니다")
+    if len(items) > MAX_BATCH:
+        raise BadRequest(f"items 는 최대 {MAX_BATCH}개")
+    today = datetime.date.today()
+    located = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise BadRequest("items 의 각 항목은 객체여야 합니다")
+        gu, lat, lon = _locate(item)
+        target_date = _parse_date(item.get("date"))
+        located.append((gu, lat, lon, target_date, _source(lat, lon, target_date, today)))
+
+    unique = list(dict.fromkeys(loc[4] for loc in located))
+    metrics.observe("api.batch_fetch.sources", len(unique))
+    with metrics.span("api.batch_fetch"):
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(unique))) as pool:
+            fetched = dict(zip(unique, pool.map(lambda s: _fetch(s, keys), unique)))
+    metrics.incr("api.batch_dedup_saved", len(located) - len(unique))
+
+    rows = [_describe(gu, lat, lon, d, src, fetched[src]) for gu, lat, lon, d, src in located]
+    col = lambda k: np.array([np.nan if r[k] is None else r[k] for r in rows], dtype=float)
+    pred, input_df = predict_batch(col("TMX"), col("TMN"), col("REH"),
+                                   day=[loc[3] for loc in located], key=SEOUL_ASOS)
+    heat_index = input_df["최고체감온도(°C)"].to_numpy()
+    for row, p, hi in zip(rows, pred, heat_index):
+        ok = not np.isnan(p)
+        row["heat_index"] = float(hi) if ok else None
+        row["pred"] = round(float(p), 2) if ok else None
+        row["risk"] = get_risk_level(p) if ok else None
+    return {"model_version": model_version(), "results": rows}
+
+
+@stale_while_revalidate("api.dataset", fresh_ttl=600, is_good=lambda df: not df.empty)
+def _dataset(filename: str) -> pd.DataFrame:
+    if DATA_URL:
+        import requests
+        r = requests.get(f"{DATA_URL.rstrip('/')}/{filename}", timeout=20)
+        r.raise_for_status()
+        return coerce_schema(pd.read_csv(io.StringIO(r.text), encoding="utf-8-sig"), strict=False)
+    return coerce_schema(pd.read_csv(filename, encoding="utf-8-sig"), strict=False)
+
+
+@stale_while_revalidate("api.static", fresh_ttl=24 * 3600, is_good=lambda df: not df.empty)
+def _static() -> pd.DataFrame:
+    return load_seoul_static("seoul_static_data.csv")
+
+
+@stale_while_revalidate("api.damage", fresh_ttl=600, is_good=bool)
+def _damage_records(target_date: datetime.date) -> list:
+    day = pd.Timestamp(target_date)
+    ml_data = _dataset("ML_asos_dataset.csv")
+    totals = _dataset("ML_asos_total_prediction.csv")
+    pred_row = totals[totals["일자"] == day]
+    if ml_data.empty or pred_row.empty:
+        return []
+
+    lag = feature_store.sync(ml_data, feature_store.GU_STORE_FILE, "자치구").frame(target_date)
+    merged = pd.merge(_static(), ml_data[ml_data["일자"] == day], on="자치구", how="left")
+    metrics.observe("api.damage.rows", len(merged))
+    with metrics.span("api.damage"):
+        table = scoring.damage_table(merged, float(pred_row["서울시예측환자수"].values[0]), lag)
+    cols = ["자치구", "S", "E", "P_pred", "H", "피해점수_사전", "피해점수", "위험등급", "보상금"]
+    return json.loads(table[cols].assign(자치구=table["자치구"].astype(str))
+                      .to_json(orient="records", force_ascii=False))
+
+
+def damage(item: dict) -> dict:
+    """자치구별 피해점수(사전/사후)·위험등급·보상금 (tab3 와 같은 scoring.damage_table, 일자별 캐시)."""
+    target_date = _parse_date(item.get("date"))
+    records = _damage_records(target_date)
+    if not records:
+        return {"date": target_date.isoformat(), "results": [], "error": "해당 일자의 예측값이 없습니다"}
+    return {"date": target_date.isoformat(), "results": records}
+
+
+# ---- HTTP ----
+def _flat(query: str) -> dict:
+    return {k: v[-1] for k, v in parse_qs(query).items()}
+
+
+def make_handler(keys: dict):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive (부하 테스트·파트너 클라이언트 연결 재사용)
+        disable_nagle_algorithm = True  # 헤더/본문 분할 쓰기가 지연 ACK 와 겹쳐 응답마다 ~40ms 밀리지 않도록
+
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self, method: str):
+            url = urlsplit(self.path)
+            route = f"{method} {url.path.rstrip('/') or '/'}"
+            with metrics.span("api.request", route=route):
+                try:
+                    if route == "GET /health":
+                        return self._send(200, {"ok": True, "model_version": model_version()})
+                    if route == "GET /metrics":
+                        return self._send(200, {**metrics.snapshot(), "prediction_cache": prediction_cache.stats()})
+                    if route == "GET /v1/risk":
+                        return self._send(200, risk_point(_flat(url.query), keys))
+                    if route == "GET /v1/damage":
+                        return self._send(200, damage(_flat(url.query)))
+                    if route == "POST /v1/risk/batch":
+                        length = int(self.headers.get("Content-Length") or 0)
+                        try:
+                            body = json.loads(self.rfile.read(length) or b"{}")
+                        except ValueError:
+                            raise BadRequest("JSON 본문 해석 실패")
+                        if not isinstance(body, dict):
+                            raise BadRequest("JSON 본문은 객체여야 합니다 ({\"items\": [...]})")
+                        return self._send(200, risk_batch(body.get("items"), keys))
+                    return self._send(404, {"error": f"없는 경로: {route}"})
+                except BadRequest as e:
+                    return self._send(400, {"error": str(e)})
+                except Exception as e:
+                    metrics.record_error("api.request", e, route=route)
+                    return self._send(500, {"error": type(e).__name__})
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def make_server(host: str = "127.0.0.1", port: int = DEFAULT_PORT, kma_key: str = None,
+                asos_key: str = None) -> ThreadingHTTPServer:
+    keys = {"kma": kma_key or os.environ.get("KMA_API_KEY", ""),
+            "asos": asos_key or os.environ.get("ASOS_API_KEY", "")}
+    load_model()   # 첫 요청이 모델 로드 비용을 떠안지 않도록
+    server = ThreadingHTTPServer((host, port), make_handler(keys))
+    server.daemon_threads = True
+    return server
+
+
+# ---- 로컬 부하 테스트 ----
+def load_test(host: str, port: int, paths: list, n_requests: int = 2000, concurrency: int = 16) -> dict:
+    """keep-alive 연결 concurrency 개로 GET paths 를 돌아가며 n_requests 번 호출 → rps, 지연 분위수(ms)."""
+    import http.client
+
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+    next_index = lambda: next(counter, None)
+
+    def worker():
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        local, failed = [], 0
+        while (i := next_index()) is not None:
+            t0 = time.perf_counter()
+            try:
+                conn.request("GET", paths[i % len(paths)])
+                resp = conn.getresponse()
+                resp.read()
+                failed += resp.status >= 500
+            except OSError:
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+            local.append((time.perf_counter() - t0) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    lat = np.sort(np.array(latencies))
+    return {"requests": len(lat), "errors": errors[0], "seconds": round(elapsed, 3),
+            "rps": round(len(lat) / elapsed, 1),
+            "p50_ms": round(float(np.percentile(lat, 50)), 2),
+            "p99_ms": round(float(np.percentile(lat, 99)), 2),
+            "max_ms": round(float(lat[-1]), 2)}
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="HeatAI 헤드리스 JSON 위험도 API")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    ap.add_argument("--loadtest", action="store_true", help="서버를 띄운 뒤 로컬 부하 테스트 결과만 출력")
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--date", default=None, help="부하 테스트 일자 (기본: 오늘)")
+    args = ap.parse_args(argv)
+
+    server = make_server(args.host, args.port)
+    if not args.loadtest:
+        print(f"✅ http://{args.host}:{server.server_port} 에서 대기 중 (Ctrl+C 종료)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    date = args.date or datetime.date.today().isoformat()
+    paths = [f"/v1/risk?gu={quote(gu)}&date={date}" for gu in SEOUL_GU_CENTERS]
+    print(json.dumps(load_test(args.host, server.server_port, paths, args.requests, args.concurrency),
+                     ensure_ascii=False))
+    server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
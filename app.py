@@ -4,26 +4,37 @@ import datetime
 import datetime as dt
 KST = dt.timezone(dt.timedelta(hours=9))
 import requests
-import os
-import base64
 import io
-import json
-import time
-import math
-from urllib.parse import unquote, quote
-import urllib.parse
 import subprocess
 import sys
+from urllib.parse import unquote
 
 
 from utils import (
     get_weather, get_asos_weather, get_risk_level,
-    calculate_avg_temp, region_to_stn_id,convert_latlon_to_xy, get_fixed_base_datetime
+    region_to_latlon, convert_latlon_to_xy, get_base_datetime,
+    fetch_ultra_now, fetch_today_tmx_tmn, SEOUL_GUS, SEOUL_GU_CENTERS, api_budget
+)
+from model_utils import BIAS_COL, explain_from_weather, model_version, predict_from_weather
+import metrics
+import poller
+import scoring
+from stale_cache import stale_while_revalidate, describe_age
+import feature_store
+from schema import coerce as coerce_schema, load_seoul_static
+from github_publisher import GitHubPublisher, PublishError
+from national import national_snapshot
+from policies import compute_payouts, load_policies
+from heatmap import grid_snapshot, render_heatmap
+from ingest import (
+    load_kdca_workbook, workbook_hash, fetch_weather_for_rows, build_training_rows, upsert_dataset,
+    dataset_bytes, merge_dataset_bytes,
 )
-from model_utils import predict_from_weather
 
 # ----------------------- 설정 -----------------------
 st.set_page_config(layout="centered")
+metrics.serve()  # HEATAI_METRICS_PORT 설정 시 /metrics 제공
+_profile_tab = st.query_params.get("profile")  # ?profile=tab2 → 해당 탭 1회 cProfile
 
 KMA_API_KEY = unquote(st.secrets["KMA"]["API_KEY"])
 ASOS_API_KEY = unquote(st.secrets["ASOS"]["API_KEY"])
@@ -35,9 +46,9 @@ GITHUB_FILENAME = "ML_asos_dataset.csv"
 
 # ----------------------- UI 시작 -----------------------
 st.title("Weather Pay")
-tab1, tab2, tab3 = st.tabs(["학습 데이터 입력", "환자 수 지표 산출", "피해점수 계산 및 보상"])
+tab1, tab2, tab3, tab4 = st.tabs(["학습 데이터 입력", "환자 수 지표 산출", "피해점수 계산 및 보상", "전국 현황"])
 
-with tab1:
+with tab1, metrics.profile("tab1", enabled=_profile_tab == "tab1"):
     with st.expander("이 탭에서는 무엇을 하나요?"):
         st.markdown("""
         이 탭은 AI 모델의 학습을 위한 사용자 입력 학습 데이터를 추가하는 기능을 수행합니다. 
@@ -55,129 +66,82 @@ with tab1:
 
         **수행 내용 요약**:
 
-        1. 질병청 엑셀 파일 업로드 → 자치구별 환자 수 자동 추출
-        2. 선택 날짜의 기상정보 자동 수집 (ASOS API)
+        1. 질병청 엑셀 파일 업로드 → 시트 전체의 일자 × 자치구 환자 수 한 번에 추출
+        2. 선택 기간의 기상정보를 한 번의 기간 조회로 수집 (ASOS API)
         3. 자치구별 환자수 + 기상정보 → 학습용 데이터프레임 생성
-        4. `ML_asos_dataset.csv`에 저장 후 자동 재학습 수행
+        4. `ML_asos_dataset.csv`에 일괄 저장(upsert) 후 자동 재학습 수행
 """)
 
-    all_gus = [
-        '종로구', '중구', '용산구', '성동구', '광진구', '동대문구', '중랑구', '성북구', '강북구', '도봉구',
-        '노원구', '은평구', '서대문구', '마포구', '양천구', '강서구', '구로구', '금천구', '영등포구',
-        '동작구', '관악구', '서초구', '강남구', '송파구', '강동구'
-    ]
+    all_gus = SEOUL_GUS
     gus = st.multiselect("자치구 선택 (선택하지 않으면 전체)", all_gus, key="gu_tab1_multi")
     if not gus:
         gus = all_gus
 
+    region = "서울특별시"
     min_record_date = datetime.date(2025, 7, 1)
     max_record_date = datetime.date.today() - datetime.timedelta(days=1)
 
-    date_selected = st.date_input(
-        "저장할 날짜 선택", 
-        value=max_record_date, 
-        min_value=min_record_date, 
+    date_range = st.date_input(
+        "저장할 기간 선택 (시트 전체 일괄 저장)",
+        value=(min_record_date, max_record_date),
+        min_value=min_record_date,
         max_value=max_record_date,
         key="date_tab1"
     )
+    if not isinstance(date_range, (tuple, list)):
+        date_range = (date_range, date_range)
+    date_from, date_selected = date_range[0], date_range[-1]
 
     uploaded_file = st.file_uploader("질병청 환자수 파일 업로드 (.xlsx, 시트명: 서울특별시)", type=["xlsx"], key="upload_tab1")
 
     if uploaded_file and date_selected:
         try:
-            df_raw = pd.read_excel(uploaded_file, sheet_name="서울특별시", header=None)
-            districts = df_raw.iloc[0, 1::2].tolist()
-            dates = df_raw.iloc[3:, 0].tolist()
-            df_values = df_raw.iloc[3:, 1::2]
-            df_values.columns = districts
-            df_values.insert(0, "일자", dates)
-            df_long = df_values.melt(id_vars=["일자"], var_name="자치구", value_name="환자수")
-            df_long["일자"] = pd.to_datetime(df_long["일자"], errors="coerce").dt.strftime("%Y-%m-%d")
-            df_long["환자수"] = pd.to_numeric(df_long["환자수"], errors="coerce").fillna(0).astype(int)
-            df_long["지역"] = "서울특별시"
-
-            preview_list = []
-            ymd = date_selected.strftime("%Y-%m-%d")
-
-            weather = get_asos_weather(region, ymd.replace("-", ""), ASOS_API_KEY)
-            tmx = weather.get("TMX", 0)
-            tmn = weather.get("TMN", 0)
-            reh = weather.get("REH", 0)
-            pred, avg_temp, heat_index, input_df = predict_from_weather(tmx, tmn, reh)
-
-
-            for gu in gus:
-                selected = df_long[(df_long["일자"] == ymd) & (df_long["자치구"] == gu)]
-                if selected.empty:
-                    st.warning(f"{ymd} {gu} 환자수 데이터가 없습니다.")
-                    continue
-
-                환자수 = int(selected["환자수"].values[0])
-                preview_list.append({
-                    "일자": ymd,
-                    "지역": region,
-                    "자치구": gu,
-                    "최고체감온도(°C)": heat_index,
-                    "최고기온(°C)": tmx,
-                    "평균기온(°C)": avg_temp,
-                    "최저기온(°C)": tmn,
-                    "평균상대습도(%)": reh,
-                    "환자수": 환자수
-                })
-
-            if not preview_list:
-                st.warning("선택한 날짜와 자치구 조합에 저장할 데이터가 없습니다.")
+            data = uploaded_file.getvalue()
+            df_long = load_kdca_workbook(workbook_hash(data), data)
+
+            ymd_from, ymd_to = date_from.strftime("%Y-%m-%d"), date_selected.strftime("%Y-%m-%d")
+            df_long = df_long[
+                (df_long["일자"] >= ymd_from) & (df_long["일자"] <= ymd_to) & (df_long["자치구"].isin(gus))
+            ]
+            if df_long.empty:
+                st.warning("선택한 기간과 자치구 조합에 저장할 데이터가 없습니다.")
                 st.stop()
 
-            preview_df = pd.DataFrame(preview_list)
-            st.markdown("#### 저장될 학습 데이터 미리보기")
+            weather_by_date = fetch_weather_for_rows(df_long, region, ASOS_API_KEY)
+            budget = api_budget(ASOS_API_KEY)
+            st.caption(f"ASOS 키 오늘 남은 요청: {budget['remaining']:,} / {budget['quota']:,} "
+                       f"(백필 가능 {budget['by_priority']['backfill']:,})")
+            preview_df = build_training_rows(df_long, weather_by_date)
+
+            missing = sorted(set(df_long["일자"]) - set(preview_df["일자"]))
+            if missing:
+                st.warning(f"ASOS 기상자료가 없는 일자 {len(missing)}일은 제외됩니다: {', '.join(missing[:10])}")
+            if preview_df.empty:
+                st.warning("선택한 기간에 저장할 데이터가 없습니다.")
+                st.stop()
+
+            st.markdown(f"#### 저장될 학습 데이터 미리보기 ({preview_df['일자'].nunique()}일 × {preview_df['자치구'].nunique()}개 구)")
             st.dataframe(preview_df)
 
             if st.button("GitHub에 저장하고 모델 재학습하기", key="save_and_train_tab1"):
                 csv_path = "ML_asos_dataset.csv"
-
-                if os.path.exists(csv_path):
-                    try:
-                        existing = pd.read_csv(csv_path, encoding="utf-8-sig")
-                    except UnicodeDecodeError:
-                        existing = pd.read_csv(csv_path, encoding="cp949")
-                else:
-                    existing = pd.DataFrame()
-
-                merge_keys = ["일자", "자치구"]
-                if not existing.empty:
-                    existing = existing[~existing.set_index(merge_keys).index.isin(preview_df.set_index(merge_keys).index)]
-                df_all = pd.concat([existing, preview_df], ignore_index=True)
-                df_all.to_csv(csv_path, index=False, encoding="utf-8-sig")
-                st.success("학습 데이터 저장 완료 (로컬)")
+                upsert_dataset(preview_df, csv_path)
+                st.success(f"학습 데이터 저장 완료 (로컬, {len(preview_df)}행)")
 
                 try:
-                    with open(csv_path, "rb") as f:
-                        content = f.read()
-                    b64_content = base64.b64encode(content).decode("utf-8")
-
-                    api_url = f"https://api.github.com/repos/{GITHUB_USERNAME}/{GITHUB_REPO}/contents/{GITHUB_FILENAME}"
-                    r = requests.get(api_url, headers={"Authorization": f"Bearer {GITHUB_TOKEN}"})
-                    sha = r.json().get("sha") if r.status_code == 200 else None
-
-                    payload = {
-                        "message": f"Update {GITHUB_FILENAME} with new data for {region} ({len(preview_list)} entries)",
-                        "content": b64_content,
-                        "branch": GITHUB_BRANCH
-                    }
-                    if sha:
-                        payload["sha"] = sha
-
-                    headers = {
-                        "Authorization": f"Bearer {GITHUB_TOKEN}",
-                        "Accept": "application/vnd.github+json"
-                    }
-                    r = requests.put(api_url, headers=headers, json=payload)
-                    if r.status_code in [200, 201]:
+                    publisher = GitHubPublisher(GITHUB_USERNAME, GITHUB_REPO, GITHUB_BRANCH, GITHUB_TOKEN,
+                                                merge={GITHUB_FILENAME: merge_dataset_bytes})
+                    publisher.stage(GITHUB_FILENAME, content=dataset_bytes(preview_df))
+                    commit = publisher.flush(
+                        f"Update {GITHUB_FILENAME} with new data for {region} ({len(preview_df)} entries)"
+                    )
+                    if commit:
                         st.success("GitHub 저장 완료")
                         st.info(f"[GitHub에서 보기](https://github.com/{GITHUB_USERNAME}/{GITHUB_REPO}/blob/{GITHUB_BRANCH}/{GITHUB_FILENAME})")
                     else:
-                        st.warning(f"GitHub 저장 실패: {r.status_code} {r.text[:200]}")
+                        st.info("GitHub의 데이터와 동일하여 커밋을 생략했습니다.")
+                except PublishError as e:
+                    st.warning(f"GitHub 저장 실패 (대기열에 보관, 다음 저장 시 재시도): {e}")
 
                 except Exception as e:
                     st.error(f"처리 중 오류 발생: {e}")
@@ -195,106 +159,22 @@ with tab1:
         except Exception as e:
             st.error(f"처리 중 오류 발생: {e}")
 
-with tab2:
+with tab2, metrics.profile("tab2", enabled=_profile_tab == "tab2"):
     # ---------- 보조 함수들 ----------
+    # 두 조회 모두 마지막 정상값을 격자별로 보관해, 기상청 지연·장애 중에도 즉시 응답하고 뒤에서 갱신한다.
+    @stale_while_revalidate("ultra_now", fresh_ttl=180,
+                            is_good=lambda out: out.get("REH") is not None or out.get("T1H") is not None,
+                            key=lambda nx, ny, api_key: (nx, ny))
     def _ultra_now_safe(nx: int, ny: int, api_key: str) -> dict:
-        """초단기실황 REH/T1H: 00/30 교차 + 전시간 폴백, resultCode 체크"""
-        def candidates():
-            now_kst = dt.datetime.now(dt.timezone.utc).astimezone(KST)
-            ref = now_kst - dt.timedelta(minutes=40)
-            hh = ref.strftime("%H")
-            mm = "30" if ref.minute >= 30 else "00"
-            d0 = ref.strftime("%Y%m%d")
-            c = [
-                (d0, f"{hh}{mm}"),
-                (d0, f"{hh}{'00' if mm=='30' else '30'}"),
-            ]
-            prev = ref - dt.timedelta(hours=1)
-            d1, h1 = prev.strftime("%Y%m%d"), prev.strftime("%H")
-            c += [(d1, f"{h1}30"), (d1, f"{h1}00")]
-            # 중복 제거
-            seen, out = set(), []
-            for bd, bt in c:
-                k = bd + bt
-                if k not in seen:
-                    seen.add(k); out.append((bd, bt))
-            return out
-
-        def call(bd, bt):
-            url = "http://apis.data.go.kr/1360000/VilageFcstInfoService_2.0/getUltraSrtNcst"
-            params = {
-                "serviceKey": unquote(api_key),
-                "dataType": "JSON",
-                "numOfRows": "100",
-                "pageNo": "1",
-                "base_date": bd,
-                "base_time": bt,
-                "nx": nx, "ny": ny,
-            }
-            r = requests.get(url, params=params, timeout=8)
-            r.raise_for_status()
-            resp = r.json().get("response", {})
-            if resp.get("header", {}).get("resultCode") != "00":
-                return None
-            items = resp.get("body", {}).get("items", {}).get("item", [])
-            reh = t1h = None
-            for it in items:
-                cat = it.get("category")
-                try:
-                    val = float(it.get("obsrValue"))
-                except (TypeError, ValueError):
-                    continue
-                if cat == "REH": reh = val
-                elif cat == "T1H": t1h = val
-            if reh is None and t1h is None:
-                return None
-            bdate = items[0].get("baseDate", bd) if items else bd
-            btime = items[0].get("baseTime", bt) if items else bt
-            return {"REH": reh, "T1H": t1h, "base_date": bdate, "base_time": btime}
-
-        for bd, bt in candidates():
-            try:
-                out = call(bd, bt)
-                if out:
-                    return out
-            except Exception:
-                continue
-        return {"REH": None, "T1H": None, "base_date": None, "base_time": None}
+        """초단기실황 REH/T1H (utils.fetch_ultra_now)"""
+        return fetch_ultra_now(nx, ny, api_key)
 
+    @stale_while_revalidate("today_tmx_tmn", fresh_ttl=600,
+                            is_good=lambda out: out.get("TMX") is not None,
+                            key=lambda nx, ny, api_key, base_date, base_time: (nx, ny, base_date))
     def _today_tmx_tmn_safe(nx: int, ny: int, api_key: str, base_date: str, base_time: str) -> dict:
         """단기예보에서 오늘 TMX/TMN만 추출 (KST 기준)"""
-        url = "http://apis.data.go.kr/1360000/VilageFcstInfoService_2.0/getVilageFcst"
-        params = {
-            "serviceKey": unquote(api_key),
-            "numOfRows": "1000",
-            "pageNo": "1",
-            "dataType": "JSON",
-            "base_date": base_date,
-            "base_time": base_time,
-            "nx": nx, "ny": ny,
-        }
-        try:
-            r = requests.get(url, params=params, timeout=10)
-            r.raise_for_status()
-            resp = r.json().get("response", {})
-            if resp.get("header", {}).get("resultCode") != "00":
-                return {"TMX": None, "TMN": None}
-            items = resp.get("body", {}).get("items", {}).get("item", [])
-            today_kst = dt.datetime.now(dt.timezone.utc).astimezone(KST).strftime("%Y%m%d")
-            tmx = tmn = None
-            for it in items:
-                if it.get("fcstDate") != today_kst:
-                    continue
-                cat = it.get("category")
-                try:
-                    v = float(it.get("fcstValue"))
-                except (TypeError, ValueError):
-                    continue
-                if cat == "TMX": tmx = v
-                elif cat == "TMN": tmn = v
-            return {"TMX": tmx, "TMN": tmn}
-        except Exception:
-            return {"TMX": None, "TMN": None}
+        return fetch_today_tmx_tmn(nx, ny, api_key, base_date, base_time)
 
     def _reverse_geocode_to_gu(lat: float, lon: float) -> dict:
         """좌표 → {'city': '서울특별시', 'gu': '동작구'} (정규화 포함)"""
@@ -315,7 +195,8 @@ with tab2:
             if gu.endswith("-gu"): gu = gu.replace("-gu", "구")
             if gu and not gu.endswith("구"): gu = gu + "구"
             return {"city": city, "gu": gu}
-        except Exception:
+        except Exception as e:
+            metrics.record_error("geo.reverse_geocode", e)
             return {}
 
     def _haversine_km(a, b):
@@ -343,6 +224,11 @@ with tab2:
         now_kst = dt.datetime.now(dt.timezone.utc).astimezone(KST).strftime("%Y-%m-%d %H:%M")
         st.markdown(f"<div style='text-align:right;color:#6b7280;'>기준시각(실황): {now_kst} KST</div>", unsafe_allow_html=True)
 
+    # ---------- 폴러 스냅샷 (호스트당 1개 폴러가 25개 구를 주기적으로 갱신) ----------
+    poller.ensure_started(KMA_API_KEY)
+    snapshot = poller.read_snapshot()
+    snap_fresh = any(v["obs_age_s"] is not None and v["obs_age_s"] < poller.MAX_AGE for v in snapshot.values())
+
     # ---------- 날짜 분기 ----------
     today = dt.date.today()
     if date_selected > today:
@@ -351,6 +237,8 @@ with tab2:
     elif date_selected < today:
         ymd = date_selected.strftime("%Y%m%d")
         weather = get_asos_weather(region, ymd, ASOS_API_KEY)
+    elif snap_fresh:
+        weather = {}  # 자치구 값은 아래에서 폴러 스냅샷으로 채움 (네트워크 호출 없음)
     else:
         weather_fcst, base_date, base_time = get_weather(region, date_selected, KMA_API_KEY)
         lat0, lon0 = region_to_latlon[region]
@@ -367,27 +255,16 @@ with tab2:
     q_lat = params.get("lat", None)
     q_lon = params.get("lon", None)
 
-    seoul_gus = [
-        '종로구','중구','용산구','성동구','광진구','동대문구','중랑구','성북구','강북구','도봉구',
-        '노원구','은평구','서대문구','마포구','양천구','강서구','구로구','금천구','영등포구',
-        '동작구','관악구','서초구','강남구','송파구','강동구'
-    ]
-    gu_centers = {
-        '종로구': (37.5731,126.9793), '중구': (37.5636,126.9976), '용산구': (37.5323,126.9907), '성동구': (37.5634,127.0368),
-        '광진구': (37.5384,127.0823), '동대문구': (37.5744,127.0396), '중랑구': (37.6063,127.0927), '성북구': (37.5894,127.0167),
-        '강북구': (37.6396,127.0259), '도봉구': (37.6688,127.0471), '노원구': (37.6542,127.0568), '은평구': (37.6176,126.9227),
-        '서대문구': (37.5792,126.9368), '마포구': (37.5663,126.9018), '양천구': (37.5169,126.8665), '강서구': (37.5509,126.8495),
-        '구로구': (37.4954,126.8879), '금천구': (37.4568,126.8956), '영등포구': (37.5264,126.8963), '동작구': (37.5126,126.9393),
-        '관악구': (37.4784,126.9516), '서초구': (37.4836,127.0327), '강남구': (37.5172,127.0473), '송파구': (37.5145,127.1059),
-        '강동구': (37.5301,127.1238)
-    }
+    seoul_gus = SEOUL_GUS
+    gu_centers = SEOUL_GU_CENTERS
 
     detected_gu = None
     lat_f = lon_f = None
     if q_lat and q_lon:
         try:
             lat_f, lon_f = float(q_lat), float(q_lon)
-            rg = _reverse_geocode_to_gu(lat_f, lon_f)
+            with metrics.span("geo.reverse_geocode"):
+                rg = _reverse_geocode_to_gu(lat_f, lon_f)
             if rg.get("city") == "서울특별시" and rg.get("gu") in seoul_gus:
                 detected_gu = rg["gu"]
             else:
@@ -411,9 +288,21 @@ with tab2:
     nx, ny = convert_latlon_to_xy(lat_f, lon_f)
 
     # ---------- 오늘일 때: 초단기실황 + TMX/TMN 재확인 & 기준시각 업데이트 ----------
-    if date_selected == today:
+    snap = snapshot.get(selected_gu)
+    use_snap = (date_selected == today and snap is not None and snap["obs_age_s"] is not None
+                and snap["obs_age_s"] < poller.MAX_AGE and snap["REH"] is not None)
+    if use_snap:
+        ultra = {"T1H": snap["T1H"], "REH": snap["REH"]}
+        tmx_tmn = {"TMX": snap["TMX"], "TMN": snap["TMN"]}
+        if snap["TMX"] is None:   # 오늘 받은 예보가 아직 없음 (자정 직후·예보 장애) → 직접 조회
+            bd, bt = get_base_datetime(today)
+            tmx_tmn = _today_tmx_tmn_safe(nx, ny, KMA_API_KEY, bd, bt)
+        tmx = tmx_tmn.get("TMX") or ultra.get("T1H")
+        tmn = tmx_tmn.get("TMN") or ultra.get("T1H")
+        reh = ultra["REH"]
+    elif date_selected == today:
         ultra = _ultra_now_safe(nx, ny, KMA_API_KEY)
-        bd, bt = get_fixed_base_datetime(today)
+        bd, bt = get_base_datetime(today)
         tmx_tmn = _today_tmx_tmn_safe(nx, ny, KMA_API_KEY, bd, bt)
         tmx = tmx_tmn.get("TMX") or ultra.get("T1H")
         tmn = tmx_tmn.get("TMN") or ultra.get("T1H")
@@ -429,26 +318,52 @@ with tab2:
     else:
         tmx, tmn, reh = weather.get("TMX"), weather.get("TMN"), weather.get("REH")
 
+    # ---------- 보관값 사용 시 경과 시간 표시 ----------
+    if use_snap:
+        st.caption(f"📡 자치구 실황 스냅샷 사용 ({describe_age(snap['obs_age_s'])} 갱신)")
+        # 실황 발표 간격(1시간)보다 많이 늦어졌을 때만 지연 안내
+        ages = {"초단기실황": snap["obs_age_s"]} if snap["obs_age_s"] >= 1.5 * poller.NOWCAST_EVERY else {}
+    elif date_selected == today:
+        ages = {"초단기실황": _ultra_now_safe.age(nx, ny, KMA_API_KEY),
+                "단기예보": _today_tmx_tmn_safe.age(nx, ny, KMA_API_KEY, bd, bt)}
+    elif date_selected > today:
+        ages = {"단기예보": get_weather.age(region, date_selected, KMA_API_KEY)}
+    else:
+        ages = {}
+    stale = {k: a for k, a in ages.items() if a is not None and a >= 180}
+    if stale:
+        st.caption("⏱️ 기상청 응답 지연으로 마지막 수신값을 사용 중: "
+                   + ", ".join(f"{k} {describe_age(a)}" for k, a in stale.items()))
+
     # ---------- 모델 입력 검증 ----------
     if not all(v is not None for v in [tmx, tmn, reh]):
         st.error("실시간 기상 입력을 충분히 확보하지 못했습니다. 잠시 후 다시 시도해주세요.")
         st.stop()
 
     # ---------- 예측 ----------
-    pred, avg_temp, heat_index, input_df = predict_from_weather(tmx, tmn, reh)
+    pred, avg_temp, heat_index, input_df = predict_from_weather(tmx, tmn, reh, day=date_selected, key=region)
     risk = get_risk_level(pred)
 
     # ---------- 출력 ----------
     st.markdown("#### 입력값(실시간)")
-    st.dataframe(input_df, use_container_width=True)
+    with metrics.span("render.dataframe", tab="tab2"):
+        st.dataframe(input_df, use_container_width=True)
 
     c1, c2, c3 = st.columns(3)
     c1.metric("자치구", selected_gu)
     c2.metric("예측 환자 수(도시기준)", f"{pred:.2f}명")
     c3.metric("위험 등급", risk)
 
+    # ---------- 위험 요인 (피처별 기여도: 폴러가 미리 계산한 값 → 없으면 예측과 같은 키의 캐시) ----------
+    explained = poller.lookup_explanation(selected_gu, tmx, tmn, reh, model_version()) if use_snap else None
+    contribs = pd.Series(explained[1]) if explained else explain_from_weather(tmx, tmn, reh, day=date_selected, key=region)
+    base_value = contribs.pop(BIAS_COL)
+    st.markdown("#### 위험 요인 기여도")
+    st.bar_chart(contribs.rename("기여도(명)"))
+    st.caption(f"기준값 {base_value:.2f}명에서 각 요인이 더하거나 뺀 환자 수입니다 (합계 = 예측 {pred:.2f}명).")
+
 
-with tab3:
+with tab3, metrics.profile("tab3", enabled=_profile_tab == "tab3"):
     with st.expander("이 탭에서는 무엇을 하나요?"):
         st.markdown("""
         이 탭은 HeatAI의 핵심 기능으로, 
@@ -464,91 +379,22 @@ with tab3:
         2. 환경적 지표(E): 열섬지수, 녹지율, 냉방보급률 (표준화)
         3. P_pred: tab2에서 예측된 서울시 전체 온열 환자 수 
         4. P_real: tab1에서 입력된 자치구별 실제 온열 환자 수 
-        5. H: 최근 7일간 최고체감온도 기반 폭염 지속 가중치 계산
+        5. H: 최고체감온도 33°C/35°C 이상 연속 일수 기반 폭염 지속 가중치 계산
 
         **사전 피해점수** = 100 * (0.25 * S + 0.25 * E + 0.5 * P_pred) * H  
         **사후 피해점수** = 100 * (0.2 * S + 0.2 * E + 0.5 * P_pred + 0.1 * P_real) * H
         """)
 
-    # 함수 정의
-    def calculate_heatwave_multiplier(temps):
-        count_33 = count_35 = max_33 = max_35 = 0
-        for t in temps:
-            if t >= 33:
-                count_33 += 1
-                max_33 = max(max_33, count_33)
-            else:
-                count_33 = 0
-            if t >= 35:
-                count_35 += 1
-                max_35 = max(max_35, count_35)
-            else:
-                count_35 = 0
-        if max_35 >= 2:
-            return 1.3
-        elif max_33 >= 2:
-            return 1.15
-        else:
-            return 1.0
-
-    def calculate_damage_score_prescore(s, e, p_pred):
-        return 100 * (0.25 * s + 0.25 * e + 0.5 * p_pred)
-
-    def calculate_damage_score_final(s, e, p_pred, p_real):
-        return 100 * (0.2 * s + 0.2 * e + 0.5 * p_pred + 0.1 * p_real)
-
-    def score_to_grade(score):
-        if score < 30: return "낮음"
-        elif score < 40: return "보통"
-        elif score < 50: return "높음"
-        else: return "매우 높음"
-
-    def calc_payout(score):
-        if score < 30: return 0
-        elif score < 40: return 5000
-        elif score < 50: return 10000
-        else: return 20000
-
-    def calculate_social_index(row):
-        return (
-            0.5 * row["고령자비율"] +
-            0.3 * row["야외근로자비율"] +
-            0.2 * row["열쾌적취약인구비율"]
-        )
-
-    def standardize_column(df, col):
-        min_val = df[col].min()
-        max_val = df[col].max()
-        range_val = max_val - min_val if max_val != min_val else 1
-        return (df[col] - min_val) / range_val
-
-    def calculate_environment_index(row):
-        return (
-            0.5 * row["열섬지수_std"] +
-            0.3 * (1 - row["녹지율_std"]) +
-            0.2 * (1 - row["냉방보급률_std"])
-        )
-
-    def distribute_pred_by_s(merged_df, total_pred):
-        s_sum = merged_df["S"].sum()
-        merged_df["P_pred_raw"] = total_pred * (merged_df["S"] / s_sum)
-        merged_df["P_pred"] = (merged_df["P_pred_raw"] / 25) ** 0.5
-        return merged_df
-
+    # 함수 정의 (피해점수 산식은 scoring 모듈)
     def load_csv_with_fallback(path):
-        for enc in ["utf-8-sig", "cp949", "euc-kr"]:
-            try:
-                return pd.read_csv(path, encoding=enc)
-            except UnicodeDecodeError:
-                continue
-        raise UnicodeDecodeError(f"인코딩 실패: {path}")
+        return load_seoul_static(path)
 
     def load_csv_from_github(filename):
         try:
             github_url =   f"https://raw.githubusercontent.com/{GITHUB_USERNAME}/{GITHUB_REPO}/{GITHUB_BRANCH}/{filename}"
             r = requests.get(github_url)
             r.raise_for_status()
-            return pd.read_csv(io.StringIO(r.text), encoding="utf-8-sig")
+            return coerce_schema(pd.read_csv(io.StringIO(r.text), encoding="utf-8-sig"), strict=False)
         except Exception as e:
             st.error(f"GitHub에서 {filename} 불러오기 실패: {e}")
             return pd.DataFrame()
@@ -566,7 +412,9 @@ with tab3:
         if ml_data.empty:
             st.warning("기록된 학습 데이터가 없습니다. tab2에서 데이터를 먼저 저장해주세요.")
             st.stop()
-        ml_data = ml_data[ml_data["일자"] == ymd]
+        # 폭염 지속성 피처: 저장소(feature_store_gu.csv)에 새 날짜만 update 로 이어 붙이고 선택일 행만 조회
+        lag_feats = feature_store.sync(ml_data, feature_store.GU_STORE_FILE, "자치구").frame(selected_date)
+        ml_data = ml_data[ml_data["일자"] == pd.Timestamp(ymd)]
         static_data = load_csv_with_fallback("seoul_static_data.csv")
         merged_all = pd.merge(static_data, ml_data, on="자치구", how="left")
 
@@ -575,7 +423,7 @@ with tab3:
             st.stop()
 
         df_total = load_csv_from_github("ML_asos_total_prediction.csv")
-        pred_row = df_total[df_total["일자"] == ymd]
+        pred_row = df_total[df_total["일자"] == pd.Timestamp(ymd)]
 
         if pred_row.empty:
             st.warning(f"{ymd} 예측값이 존재하지 않습니다. tab1에서 먼저 예측을 수행하세요.")
@@ -583,41 +431,17 @@ with tab3:
 
         seoul_pred = float(pred_row["서울시예측환자수"].values[0])
 
-        merged_all["S"] = merged_all.apply(calculate_social_index, axis=1)
-        for col in ["열섬지수", "녹지율", "냉방보급률"]:
-            merged_all[f"{col}_std"] = standardize_column(merged_all, col)
-        merged_all["E"] = merged_all.apply(calculate_environment_index, axis=1)
+        metrics.observe("tab3.scoring.rows", len(merged_all))
 
-        merged_all = distribute_pred_by_s(merged_all, seoul_pred)
-
-        merged_all["피해점수_사전"] = merged_all.apply(
-            lambda row: calculate_damage_score_prescore(
-                row["S"], row["E"], row["P_pred"]
-            ),
-            axis=1
-        )
-
-        merged_all["피해점수"] = merged_all.apply(
-            lambda row: calculate_damage_score_final(
-                row["S"], row["E"], row["P_pred"], 1.0 if row["환자수"] >= 1 else 0.0
-            ),
-            axis=1
-        )
-
-        # 폭염 지속성 가중치 계산 및 반영
-        heatwave_temps = merged_all.sort_values("일자").groupby("자치구")["최고체감온도(°C)"].apply(list)
-        merged_all["H"] = merged_all["자치구"].map(lambda gu: calculate_heatwave_multiplier(heatwave_temps.get(gu, [])))
-        merged_all["피해점수_사전"] *= merged_all["H"]
-        merged_all["피해점수"] *= merged_all["H"]
-
-        merged_all["위험등급"] = merged_all["피해점수"].apply(score_to_grade)
-        merged_all["보상금"] = merged_all["피해점수"].apply(calc_payout)
+        with metrics.span("tab3.scoring"):
+            merged_all = scoring.damage_table(merged_all, seoul_pred, lag_feats)
 
         col1, col2 = st.columns(2)
         with col1:
             selected_gu = st.selectbox("자치구 선택", sorted(merged_all["자치구"].unique()))
         with col2:
-            subs_count = st.number_input(f"{selected_gu} 가입자 수", min_value=0, step=1, key="subs_tab3")
+            subs_count = st.number_input(f"{selected_gu} 가입자 수 (계약 파일이 없을 때의 단순 추정)",
+                                         min_value=0, step=1, key="subs_tab3")
 
         merged = merged_all[merged_all["자치구"] == selected_gu].copy()
         if merged.empty:
@@ -638,5 +462,58 @@ with tab3:
         st.markdown("#### 피해점수 분포 (사후 기준)")
         st.bar_chart(data=merged_all.set_index("자치구")["피해점수"])
 
+        st.markdown("#### 계약별 보상금 일괄 산정")
+        policy_file = st.file_uploader(
+            "가입자 계약 파일 (계약번호, 자치구, 보장등급, 시작일, 종료일, 자기부담금)",
+            type=["csv", "parquet", "npz"], key="policy_file")
+        if policy_file is not None:
+            with metrics.span("tab3.policies"):
+                policy_df = load_policies(policy_file, name=policy_file.name)
+                payouts, per_gu = compute_payouts(policy_df, merged_all, selected_date)
+            st.success(f"계약 {len(policy_df):,}건 중 {int((payouts > 0).sum()):,}건 지급, "
+                       f"총 보상금 {int(payouts.sum()):,}원")
+            st.dataframe(per_gu.sort_values("총보상금", ascending=False), use_container_width=True)
+            st.download_button(
+                "계약별 보상금 CSV 다운로드",
+                policy_df[["계약번호", "자치구", "보장등급"]].assign(보상금=payouts)
+                    .to_csv(index=False).encode("utf-8-sig"),
+                file_name=f"payouts_{selected_date:%Y%m%d}.csv", mime="text/csv")
+
     except Exception as e:
         st.error(f"피해점수 그래프 생성 중 오류 발생: {e}")
+
+with tab4, metrics.profile("tab4", enabled=_profile_tab == "tab4"):
+    st.subheader("전국 시·도 온열질환 위험 현황")
+    st.caption("17개 시·도 기상을 동시에 조회(같은 관측소·격자는 1회)하고 한 번의 모델 호출로 채점합니다.")
+    nat_date = st.date_input("조회 일자", value=dt.date.today(), key="nat_date")
+
+    with metrics.span("tab4.snapshot"):
+        nat = national_snapshot(nat_date, KMA_API_KEY, ASOS_API_KEY)
+
+    if nat["예측환자수"].isna().all():
+        st.error("전국 기상 입력을 확보하지 못했습니다. 잠시 후 다시 시도해주세요.")
+    else:
+        stale_age = nat["경과(초)"].max()
+        if pd.notna(stale_age) and stale_age >= 180:
+            st.caption(f"⏱️ 일부 지역은 마지막 수신값 사용 중 (최대 {describe_age(stale_age)})")
+        with metrics.span("render.dataframe", tab="tab4"):
+            st.dataframe(nat.drop(columns=["위도", "경도", "경과(초)"]), use_container_width=True, hide_index=True)
+        st.map(nat.dropna(subset=["예측환자수"]).assign(size=lambda d: 3000 + d["예측환자수"].clip(lower=0) * 3000),
+               latitude="위도", longitude="경도", size="size")
+
+    st.markdown("---")
+    st.subheader("서울 5km 격자 위험 지도")
+    st.caption("서울을 덮는 기상청 격자 전체의 단기예보를 동시에 받아 한 번에 채점합니다 (예보 발표시각마다 갱신).")
+    if st.checkbox("격자 지도 보기", key="grid_map"):
+        with metrics.span("tab4.grid"):
+            grid = grid_snapshot(nat_date, KMA_API_KEY)
+        if grid["예측환자수(도시기준)"].isna().all():
+            st.error("격자 예보를 확보하지 못했습니다. 잠시 후 다시 시도해주세요.")
+        else:
+            with metrics.span("render.heatmap", tab="tab4"):
+                st.pyplot(render_heatmap(grid))
+            st.dataframe(
+                grid.groupby("자치구")[["최고체감온도(°C)", "예측환자수(도시기준)"]].max()
+                    .sort_values("예측환자수(도시기준)", ascending=False),
+                use_container_width=True,
+            )
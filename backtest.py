@@ -0,0 +1,180 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import scoring
+from feature_store import LAG_FEATURES, FeatureStore, heatwave_multiplier
+from model_artifact import ARTIFACT_FILE, load_artifact, read_manifest
+from model_utils import SUPPORTED_FEATURES
+from schema import FEATURES, combine, load_dynamic, load_seoul_static, load_static
+
+# ----------------------- 과거 일자 일괄 재현 (백테스트) -----------------------
+# 정적·ASOS 데이터셋의 모든 서울 일자를 체감온도 → 일괄 예측 → 자치구 배분 → 피해점수 → 등급/보상금
+# 순서로 배열 연산만으로 재현하고, 결과를 열 지향 파일(parquet, 없으면 csv)로 남긴다.
+STATIC_FILE = "ML_static_dataset.csv"
+DYNAMIC_FILE = "ML_asos_dataset.csv"
+SEOUL_STATIC_FILE = "seoul_static_data.csv"
+MODEL_FILE = "trained_model.pkl"
+FEATURE_FILE = "feature_names.pkl"
+REGION = "서울특별시"
+
+
+def model_version(model_file: str = MODEL_FILE, artifact_file: str = ARTIFACT_FILE) -> str:
+    """서빙(model_utils.model_version)과 같은 버전: 아티팩트가 있으면 부스터 sha256, 없으면 피클 sha256 앞 12자리."""
+    if artifact_file and os.path.exists(artifact_file):
+        return read_manifest(artifact_file)["model_version"]
+    with open(model_file, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def load_history(static_file: str = STATIC_FILE, dynamic_file: str = DYNAMIC_FILE):
+    """서울 일자별 기상(피처) 테이블과 (일자, 자치구) 실제 환자수 테이블."""
+    frames = [load_static(static_file, strict=False)]
+    if dynamic_file and os.path.exists(dynamic_file):
+        frames.append(load_dynamic(dynamic_file, strict=False))
+    df = combine(*frames)
+    df = df[df["지역"] == REGION].dropna(subset=FEATURES)
+
+    daily = df.groupby("일자", sort=True)[FEATURES].mean().reset_index()
+    daily["지역"] = REGION
+    real = pd.DataFrame(columns=["일자", "자치구", "환자수"])
+    if "자치구" in df.columns:
+        real = (df.dropna(subset=["자치구"]).groupby(["일자", "자치구"], observed=True)["환자수"]
+                .sum().reset_index())
+    return daily, real
+
+
+# ---- 워커 (구간별 일괄 예측) ----
+_worker = {}
+
+def _init_worker(model_file: str, feature_file: str, artifact_file: str = None):
+    """아티팩트가 있으면 서빙과 같은 스키마 검증을 거쳐 그것으로, 없으면 joblib 피클로 예측."""
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    if artifact_file and os.path.exists(artifact_file):
+        model = load_artifact(artifact_file, expected_features=SUPPORTED_FEATURES)
+        _worker["model"], _worker["features"] = model, model.features
+        return
+    import joblib
+    _worker["model"] = joblib.load(model_file)
+    _worker["features"] = joblib.load(feature_file)
+
+
+def _predict_chunk(X: pd.DataFrame) -> np.ndarray:
+    return _worker["model"].predict(X.reindex(columns=_worker["features"]).astype(float))
+
+
+def predict_dates(daily: pd.DataFrame, model_file: str, feature_file: str, n_jobs: int = 1,
+                  chunk_days: int = 62, artifact_file: str = ARTIFACT_FILE) -> np.ndarray:
+    """일자 구간을 나눠 프로세스 풀에서 일괄 예측 (구간마다 model.predict 1회)."""
+    chunks = [daily.iloc[i:i + chunk_days] for i in range(0, len(daily), chunk_days)]
+    if n_jobs <= 1:
+        _init_worker(model_file, feature_file, artifact_file)
+        return np.concatenate([_predict_chunk(c) for c in chunks]) if chunks else np.empty(0)
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                             initargs=(model_file, feature_file, artifact_file)) as pool:
+        return np.concatenate(list(pool.map(_predict_chunk, chunks)))
+
+
+def run_backtest(daily: pd.DataFrame, real: pd.DataFrame, gu_static: pd.DataFrame,
+                 model_file: str = MODEL_FILE, feature_file: str = FEATURE_FILE, n_jobs: int = 1,
+                 artifact_file: str = ARTIFACT_FILE) -> pd.DataFrame:
+    """(일자 × 자치구) 결과 long 테이블. 모든 단계가 (일자 수, 자치구 수) 배열 연산."""
+    gus = gu_static["자치구"].astype(str).to_numpy()
+    s = scoring.social_index(gu_static).to_numpy(dtype=float)
+    e = scoring.environment_index(gu_static).to_numpy(dtype=float)
+
+    dates = pd.DatetimeIndex(daily["일자"])
+    store = FeatureStore.from_frame(daily, "지역").frame()
+    streak = store.set_index("일자").reindex(dates)
+
+    # 지연·이동창 피처로 학습한 모델이면 같은 저장소 행을 붙여 예측 (없는 열은 _predict_chunk 에서 NaN)
+    X = daily.assign(**{c: streak[c].to_numpy() for c in LAG_FEATURES if c in streak.columns})
+    pred = predict_dates(X, model_file, feature_file, n_jobs=n_jobs, artifact_file=artifact_file)
+    p_raw, p_pred = scoring.distribute_pred(s, pred)                      # (D, G)
+
+    real_mat = (real.assign(자치구=real["자치구"].astype(str))
+                .pivot_table(index="일자", columns="자치구", values="환자수", aggfunc="sum", observed=True)
+                .reindex(index=dates, columns=gus))
+    has_real = real_mat.notna().to_numpy()
+    p_real = (real_mat.fillna(0).to_numpy() >= 1).astype(float)
+
+    h = heatwave_multiplier(streak["연속폭염일수"].fillna(0), streak["연속극한폭염일수"].fillna(0))[:, None]
+
+    pre = scoring.damage_prescore(s, e, p_pred) * h
+    final = scoring.damage_final(s, e, p_pred, p_real) * h
+
+    n_d, n_g = p_pred.shape
+    out = pd.DataFrame({
+        "일자": np.repeat(dates.to_numpy(), n_g),
+        "자치구": pd.Categorical(np.tile(gus, n_d), categories=gus),
+        "서울시예측환자수": np.repeat(pred.astype(np.float32), n_g),
+        "P_pred": p_pred.ravel().astype(np.float32),
+        "P_real": p_real.ravel().astype(np.float32),
+        "실측여부": has_real.ravel(),
+        "H": np.broadcast_to(h, (n_d, n_g)).ravel().astype(np.float32),
+        "피해점수_사전": pre.ravel().astype(np.float32),
+        "피해점수": final.ravel().astype(np.float32),
+    })
+    out["위험등급"] = pd.Categorical(scoring.score_to_grade(out["피해점수"]), categories=scoring.GRADE_LABELS)
+    out["보상금"] = scoring.calc_payout(out["피해점수"]).astype(np.int32)
+    return out
+
+
+def write_columnar(df: pd.DataFrame, path: str) -> str:
+    """parquet 로 저장 (pyarrow/fastparquet 미설치 시 같은 이름의 .csv 로 대체)."""
+    try:
+        df.to_parquet(path, index=False)
+        return path
+    except ImportError:
+        alt = os.path.splitext(path)[0] + ".csv"
+        df.to_csv(alt, index=False, encoding="utf-8-sig")
+        print(f"⚠️ parquet 엔진이 없어 CSV 로 저장했습니다 → {alt}")
+        return alt
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="HeatAI 과거 일자 백테스트")
+    ap.add_argument("--start", help="시작일 YYYY-MM-DD")
+    ap.add_argument("--end", help="종료일 YYYY-MM-DD")
+    ap.add_argument("--months", default="", help="포함할 월 (예: 7,8)")
+    ap.add_argument("--model", default=MODEL_FILE)
+    ap.add_argument("--features", default=FEATURE_FILE)
+    ap.add_argument("--artifact", default=ARTIFACT_FILE, help="있으면 피클 대신 사용 (빈 값: 피클만)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--out", default=None, help="결과 파일 (기본: backtest_<모델버전>.parquet)")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    daily, real = load_history()
+    if args.start:
+        daily = daily[daily["일자"] >= pd.Timestamp(args.start)]
+    if args.end:
+        daily = daily[daily["일자"] <= pd.Timestamp(args.end)]
+    if args.months:
+        daily = daily[daily["일자"].dt.month.isin([int(m) for m in args.months.split(",")])]
+    if daily.empty:
+        print("❌ 대상 일자가 없습니다.")
+        return 1
+
+    version = model_version(args.model, args.artifact)
+    result = run_backtest(daily.reset_index(drop=True), real, load_seoul_static(SEOUL_STATIC_FILE),
+                          args.model, args.features, n_jobs=args.jobs, artifact_file=args.artifact)
+    result["모델버전"] = version
+    path = write_columnar(result, args.out or f"backtest_{version}.parquet")
+
+    summary = result.groupby(result["일자"].dt.year).agg(
+        일수=("일자", "nunique"), 평균피해점수=("피해점수", "mean"), 가입자당보상금합계=("보상금", "sum"))
+    print(summary.to_string())
+    print(f"\n✅ {len(daily)}일 × {result['자치구'].nunique()}개 구 = {len(result)}행 → {path} "
+          f"(모델 {version}, {time.perf_counter() - t0:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import collections
+import datetime
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from singleflight import file_lock
+
+# ----------------------- 지연(lag)·이동창 피처 저장소 -----------------------
+# 학습(rebuild, 전체 이력 일괄 계산)과 서빙(update, 하루씩 링버퍼 갱신)이 같은 정의를 쓴다.
+# 창은 당일 포함, 날짜 기준(결측일은 건너뜀)이며 전일값은 정확히 하루 전 관측이 있을 때만 채운다.
+# 저장 파일에는 체감온도 원값도 함께 두어, 읽을 때 링버퍼·연속일수 상태를 복원하고 update 로 이어 간다.
+STORE_FILE = "feature_store.csv"        # 학습(지역 단위)이 저장, 예측 함수가 읽음
+GU_STORE_FILE = "feature_store_gu.csv"  # 자치구 단위 (tab3 / API 피해점수)
+HI_COL = "최고체감온도(°C)"
+HOT_DAY_C = 33.0
+EXTREME_DAY_C = 35.0
+WINDOW_DAYS = 7
+
+LAG_FEATURES = [
+    "전일체감온도(°C)",
+    "체감온도3일평균(°C)", "체감온도3일최고(°C)",
+    "체감온도7일평균(°C)", "체감온도7일최고(°C)",
+    "연속폭염일수", "연속극한폭염일수",
+]
+
+
+def heatwave_multiplier(hot_streak, extreme_streak):
+    """폭염 지속 가중치 H: 35°C 이상 2일 연속 1.3, 33°C 이상 2일 연속 1.15, 그 외 1.0 (배열 가능)."""
+    hot_streak = np.asarray(hot_streak, dtype=float)
+    extreme_streak = np.asarray(extreme_streak, dtype=float)
+    return np.where(extreme_streak >= 2, 1.3, np.where(hot_streak >= 2, 1.15, 1.0))
+
+
+def _streak(flag: np.ndarray, new_run: np.ndarray) -> np.ndarray:
+    """flag 가 연속으로 참인 일수 (new_run 위치에서 끊김)."""
+    run_id = np.cumsum(new_run | ~flag)
+    counts = pd.Series(flag.astype(np.int16)).groupby(run_id).cumsum().to_numpy()
+    return np.where(flag, counts, 0).astype(np.int16)
+
+
+class FeatureStore:
+    """key(자치구/지역)별 일 단위 체감온도 이력으로 지연·이동창 피처를 유지한다."""
+
+    def __init__(self, key_col: str = "자치구"):
+        self.key_col = key_col
+        self._buffers = {}   # key → deque[(date, hi)] (최근 WINDOW_DAYS 일)
+        self._streaks = {}   # key → (마지막 날짜, 폭염 연속, 극한 연속)
+        self._rows = {}      # (date, key) → 피처 dict
+        self._hi = {}        # (date, key) → 그날 체감온도 (저장·복원용)
+
+    # ---- 학습용: 전체 이력 일괄 계산 ----
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, key_col: str = "자치구") -> "FeatureStore":
+        store = cls(key_col)
+        store.rebuild(df)
+        return store
+
+    def rebuild(self, df: pd.DataFrame) -> pd.DataFrame:
+        """(일자, key_col, 최고체감온도) 프레임 → 피처 테이블. 벡터 연산으로 한 번에 계산한다."""
+        d = df[["일자", self.key_col, HI_COL]].dropna()
+        d = d.assign(일자=pd.to_datetime(d["일자"]).dt.normalize(), key=d[self.key_col].astype(str))
+        d = d.groupby(["key", "일자"], sort=True, observed=True)[HI_COL].mean().reset_index()
+        d[HI_COL] = d[HI_COL].astype(np.float64).round(2)  # float32 원본의 표현 오차 제거
+
+        hi = d[HI_COL].to_numpy(dtype=np.float64)
+        same_key = d["key"].to_numpy()[1:] == d["key"].to_numpy()[:-1]
+        gap_days = np.diff(d["일자"].to_numpy()).astype("timedelta64[D]").astype(np.int64)
+        consecutive = np.concatenate([[False], same_key & (gap_days == 1)])
+
+        feats = pd.DataFrame({"일자": d["일자"], self.key_col: d["key"]})
+        feats[LAG_FEATURES[0]] = np.where(consecutive, np.concatenate([[np.nan], hi[:-1]]), np.nan)
+        rolled = d.set_index("일자").groupby("key", sort=False)[HI_COL]
+        for n in (3, 7):
+            r = rolled.rolling(f"{n}D")
+            feats[f"체감온도{n}일평균(°C)"] = r.mean().to_numpy()
+            feats[f"체감온도{n}일최고(°C)"] = r.max().to_numpy()
+        feats["연속폭염일수"] = _streak(hi >= HOT_DAY_C, ~consecutive)
+        feats["연속극한폭염일수"] = _streak(hi >= EXTREME_DAY_C, ~consecutive)
+
+        # 링버퍼 상태도 마지막 이력에 맞춰 둔다 (이후 update 로 이어서 갱신)
+        self._rows = {(row[0].date(), row[1]): dict(zip(LAG_FEATURES, row[2:]))
+                      for row in feats[["일자", self.key_col] + LAG_FEATURES].itertuples(index=False)}
+        self._hi = {(day.date(), key): float(v) for key, day, v in d[["key", "일자", HI_COL]].itertuples(index=False)}
+        self._restore_state()
+        return feats
+
+    def _restore_state(self):
+        """저장된 행(_rows, _hi)에서 key 별 링버퍼(최근 WINDOW_DAYS 관측)와 마지막 연속일수를 다시 만든다."""
+        self._buffers.clear()
+        self._streaks.clear()
+        for day, key in sorted(self._hi):
+            self._buffers.setdefault(key, collections.deque(maxlen=WINDOW_DAYS)).append((day, self._hi[(day, key)]))
+        for key, buf in self._buffers.items():
+            day = buf[-1][0]
+            feats = self._rows.get((day, key), {})
+            self._streaks[key] = (day, int(feats.get("연속폭염일수", 0)), int(feats.get("연속극한폭염일수", 0)))
+
+    def last_day(self, key: str):
+        buf = self._buffers.get(str(key))
+        return buf[-1][0] if buf else None
+
+    # ---- 서빙용: 새 날짜 하루 반영 ----
+    def _compute(self, day: datetime.date, key: str, heat_index: float) -> tuple:
+        """상태를 바꾸지 않고 day 피처와 새 연속일수를 계산. 반환: (피처 dict, (폭염 연속, 극한 연속))."""
+        buf = self._buffers.get(key, ())
+        if buf and buf[-1][0] >= day:
+            raise ValueError(f"{key}: {day} 는 마지막 반영일 {buf[-1][0]} 이후여야 합니다.")
+
+        prev = buf[-1] if buf else None
+        consecutive = prev is not None and (day - prev[0]).days == 1
+        window = [(d, v) for d, v in list(buf)[-(WINDOW_DAYS - 1):]] + [(day, float(heat_index))]
+
+        feats = {"전일체감온도(°C)": prev[1] if consecutive else np.nan}
+        for n in (3, 7):
+            values = [v for d, v in window if (day - d).days < n]
+            feats[f"체감온도{n}일평균(°C)"] = float(np.mean(values))
+            feats[f"체감온도{n}일최고(°C)"] = max(values)
+
+        _, hot, ext = self._streaks.get(key, (None, 0, 0))
+        if not consecutive:
+            hot = ext = 0
+        hot = hot + 1 if heat_index >= HOT_DAY_C else 0
+        ext = ext + 1 if heat_index >= EXTREME_DAY_C else 0
+        feats["연속폭염일수"], feats["연속극한폭염일수"] = hot, ext
+        return feats, (hot, ext)
+
+    def update(self, day: datetime.date, key: str, heat_index: float) -> dict:
+        """key 의 day 체감온도를 링버퍼에 넣고 그 날 피처를 계산해 저장한다 (날짜 순서대로 호출)."""
+        key = str(key)
+        heat_index = round(float(heat_index), 2)
+        feats, (hot, ext) = self._compute(day, key, heat_index)
+        self._buffers.setdefault(key, collections.deque(maxlen=WINDOW_DAYS)).append((day, heat_index))
+        self._streaks[key] = (day, hot, ext)
+        self._rows[(day, key)] = feats
+        self._hi[(day, key)] = heat_index
+        return feats
+
+    def advance(self, df: pd.DataFrame) -> int:
+        """df 에서 key 별 마지막 반영일 이후의 날짜만 골라 update() 를 날짜 순서대로 한 번씩 호출. 반환: 추가한 행 수."""
+        d = df[["일자", self.key_col, HI_COL]].dropna()
+        d = d.assign(일자=pd.to_datetime(d["일자"]).dt.normalize(), key=d[self.key_col].astype(str))
+        last = pd.Series({k: pd.Timestamp(buf[-1][0]) for k, buf in self._buffers.items() if buf}, dtype="datetime64[ns]")
+        d = d[d["key"].map(last).isna().to_numpy() | (d["일자"] > d["key"].map(last)).to_numpy()]
+        d = d.groupby(["일자", "key"], sort=True, observed=True)[HI_COL].mean().reset_index()
+        for day, key, v in d[["일자", "key", HI_COL]].itertuples(index=False):
+            self.update(day.date(), key, float(v))
+        return len(d)
+
+    def features_for(self, day: datetime.date, key: str, heat_index: float = None) -> dict:
+        """저장된 (day, key) 피처. 없고 day 가 마지막 반영일 이후면 heat_index 로 미리 계산한 값 (저장하지 않음)."""
+        key = str(key)
+        row = self._rows.get((day, key))
+        if row is not None:
+            return row
+        last = self.last_day(key)
+        if heat_index is None or heat_index != heat_index or (last is not None and day <= last):
+            return {}
+        return self._compute(day, key, round(float(heat_index), 2))[0]
+
+    # ---- 조회 ----
+    def get(self, day: datetime.date, key: str) -> dict:
+        return self._rows.get((day, str(key)), {})
+
+    def frame(self, day: datetime.date = None) -> pd.DataFrame:
+        rows = [{"일자": pd.Timestamp(d), self.key_col: k, **f}
+                for (d, k), f in self._rows.items() if day is None or d == day]
+        return pd.DataFrame(rows, columns=["일자", self.key_col] + LAG_FEATURES)
+
+    def save(self, path: str):
+        """피처 테이블 + 체감온도 원값을 CSV 로 저장 (임시 파일에 쓴 뒤 교체)."""
+        df = self.frame()
+        df.insert(2, HI_COL, [self._hi.get((d.date(), k), np.nan) for d, k in zip(df["일자"], df[self.key_col])])
+        tmp = f"{path}.{os.getpid()}.tmp"
+        df.sort_values(["일자", self.key_col]).to_csv(tmp, index=False, encoding="utf-8-sig")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, key_col: str = "자치구") -> "FeatureStore":
+        """save() 로 저장한 피처 테이블을 읽고 링버퍼·연속일수 상태를 복원한다 (창 재계산 없음, 이후 update 가능)."""
+        store = cls(key_col)
+        df = pd.read_csv(path, encoding="utf-8-sig", parse_dates=["일자"])
+        for row in df[["일자", key_col] + LAG_FEATURES].itertuples(index=False):
+            store._rows[(row[0].date(), str(row[1]))] = dict(zip(LAG_FEATURES, row[2:]))
+        if HI_COL in df.columns:
+            ok = df[HI_COL].notna()
+            store._hi = {(d.date(), str(k)): float(v)
+                         for d, k, v in df.loc[ok, ["일자", key_col, HI_COL]].itertuples(index=False)}
+            store._restore_state()
+        return store
+
+
+# ----------------------- 증분 갱신 (precompute) -----------------------
+_loaded = {}   # path → (mtime, FeatureStore)
+
+
+def sync(df: pd.DataFrame, path: str = GU_STORE_FILE, key_col: str = "자치구") -> FeatureStore:
+    """저장된 상태에 df 의 새 날짜만 update() 로 이어 붙여 저장 (파일이 없으면 전체 rebuild 후 저장).
+
+    같은 프로세스에서는 파일이 바뀌지 않은 한 다시 읽지 않으므로, 새 날짜가 없으면 추가 비용이 없다.
+    """
+    with file_lock(path + ".lock"):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            store = FeatureStore.from_frame(df, key_col)
+            store.save(path)
+            _loaded[path] = (os.stat(path).st_mtime_ns, store)
+            return store
+        cached = _loaded.get(path)
+        store = cached[1] if cached and cached[0] == mtime and cached[1].key_col == key_col else FeatureStore.load(path, key_col)
+        if store.advance(df):
+            store.save(path)
+            mtime = os.stat(path).st_mtime_ns
+        _loaded[path] = (mtime, store)
+        return store
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="지연·이동창 피처 저장소 증분 갱신 (새 날짜만 update)")
+    ap.add_argument("--data", default="ML_asos_dataset.csv")
+    ap.add_argument("--out", default=GU_STORE_FILE)
+    ap.add_argument("--key", default="자치구")
+    args = ap.parse_args(argv)
+
+    df = pd.read_csv(args.data, encoding="utf-8-sig")
+    store = sync(df, args.out, args.key)
+    print(f"✅ {args.out}: {len(store._rows)}행, key {len(store._buffers)}개")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
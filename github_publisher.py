@@ -0,0 +1,262 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import requests
+
+from singleflight import file_lock
+
+# ----------------------- GitHub Git Data API 일괄 커밋 -----------------------
+GITHUB_API = "https://api.github.com"
+
+
+class PublishError(RuntimeError):
+    pass
+
+
+def git_blob_sha(content: bytes) -> str:
+    """git 이 계산하는 blob sha (원격 트리와 비교해 바뀌지 않은 파일은 올리지 않음)."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class GitHubPublisher:
+    """변경 파일을 로컬 큐에 모았다가 blob/tree/commit/ref 엔드포인트로 한 번에 커밋한다.
+
+    - 큐(queue_dir)는 프로세스 재시작 후에도 남으며, 같은 내용은 blob sha 로 한 번만 저장된다.
+      index.json 갱신은 flock 으로 감싸 같은 큐를 쓰는 다른 프로세스와 겹치지 않는다.
+    - merge={repo_path: fn} 로 등록한 파일은 전체 내용이 아니라 변경분(행)을 스테이징하고,
+      커밋할 때마다 원격 최신 내용을 받아 fn(원격 bytes, 변경분 bytes) → 새 내용으로 다시 적용한다.
+    - ref 갱신은 fast-forward 만 허용하고, 그 사이 다른 커밋이 들어오면(422)
+      최신 head 의 원격 파일 위에 변경분을 다시 적용해 재시도한다 (lost update 없음).
+    - api_base 를 바꾸면 로컬 대역 HTTP 서버로 시험할 수 있다.
+    """
+
+    def __init__(self, owner: str, repo: str, branch: str, token: str,
+                 api_base: str = GITHUB_API, queue_dir: str = ".publish_queue",
+                 max_retries: int = 5, session: requests.Session = None, timeout: float = 20,
+                 merge: dict = None):
+        self.repo_url = f"{api_base.rstrip('/')}/repos/{owner}/{repo}"
+        self.branch = branch
+        self.queue_dir = queue_dir
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.session.headers.update({"Accept": "application/vnd.github+json"})
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        self.merge = dict(merge or {})
+        self._lock = threading.Lock()        # index.json (프로세스 내부)
+        self._flush_lock = threading.Lock()
+        self._uploaded = set()  # 이번 프로세스에서 이미 올린 blob sha
+        os.makedirs(self.queue_dir, exist_ok=True)
+
+    # ---- 로컬 큐 ----
+    @property
+    def _index_path(self):
+        return os.path.join(self.queue_dir, "index.json")
+
+    def _index_locked(self):
+        return file_lock(os.path.join(self.queue_dir, "index.lock"))
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index: dict):
+        tmp = f"{self._index_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self._index_path)
+
+    def _write_blob(self, content: bytes) -> str:
+        sha = git_blob_sha(content)
+        blob_path = os.path.join(self.queue_dir, sha)
+        if not os.path.exists(blob_path):
+            tmp = f"{blob_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, blob_path)
+        return sha
+
+    def _read_blob(self, sha: str) -> bytes:
+        with open(os.path.join(self.queue_dir, sha), "rb") as f:
+            return f.read()
+
+    def stage(self, repo_path: str, content: bytes = None, local_path: str = None) -> str:
+        """repo_path 의 새 내용을 큐에 넣는다 (content 또는 local_path 중 하나). 반환: blob sha.
+
+        merge 가 등록된 경로면 content 는 변경분이며, 아직 올리지 못한 변경분이 있으면 그 위에 합친다.
+        """
+        if content is None:
+            with open(local_path or repo_path, "rb") as f:
+                content = f.read()
+        with self._lock, self._index_locked():
+            index = self._read_index()
+            fn = self.merge.get(repo_path)
+            if fn is not None and repo_path in index:
+                try:
+                    content = fn(self._read_blob(index[repo_path]), content)
+                except OSError:
+                    pass
+            sha = self._write_blob(content)
+            replaced = index.get(repo_path)
+            index[repo_path] = sha
+            self._write_index(index)
+            if replaced and replaced != sha:
+                self._remove_blobs({replaced})
+        return sha
+
+    def pending(self) -> dict:
+        with self._lock, self._index_locked():
+            return self._read_index()
+
+    def _snapshot(self) -> tuple:
+        """index 와 blob 내용을 잠금 안에서 함께 읽는다 (flush 도중 다른 stage 가 교체된 blob 을 지워도 무관)."""
+        with self._lock, self._index_locked():
+            index = self._read_index()
+            return index, {sha: self._read_blob(sha) for sha in set(index.values())}
+
+    # ---- API ----
+    def _api(self, method: str, path: str, **kwargs):
+        r = self.session.request(method, self.repo_url + path, timeout=self.timeout, **kwargs)
+        if r.status_code >= 400 and r.status_code != 422:
+            raise PublishError(f"{method} {path} → {r.status_code} {r.text[:200]}")
+        return r
+
+    def _head(self):
+        r = self._api("GET", f"/git/ref/heads/{self.branch}")
+        if r.status_code != 200:
+            raise PublishError(f"branch 조회 실패: {r.status_code} {r.text[:200]}")
+        head = r.json()["object"]["sha"]
+        tree = self._api("GET", f"/git/commits/{head}").json()["tree"]["sha"]
+        return head, tree
+
+    def _remote_blobs(self, tree_sha: str, paths) -> dict:
+        r = self._api("GET", f"/git/trees/{tree_sha}", params={"recursive": "1"})
+        wanted = set(paths)
+        return {e["path"]: e["sha"] for e in r.json().get("tree", []) if e.get("path") in wanted}
+
+    def _fetch_blob(self, sha: str) -> bytes:
+        r = self._api("GET", f"/git/blobs/{sha}")
+        if r.status_code != 200:
+            raise PublishError(f"blob 조회 실패: {r.status_code} {r.text[:200]}")
+        return base64.b64decode(r.json()["content"])
+
+    def _rebase(self, index: dict, blobs: dict, remote: dict) -> tuple:
+        """merge 경로의 변경분을 원격 최신 내용 위에 다시 적용. 반환: (올릴 {경로: sha}, {sha: 내용})."""
+        target, contents = {}, dict(blobs)
+        for p, sha in index.items():
+            fn = self.merge.get(p)
+            if fn is None:
+                target[p] = sha
+                continue
+            base = self._fetch_blob(remote[p]) if p in remote else b""
+            merged = fn(base, blobs[sha])
+            target[p] = git_blob_sha(merged)
+            contents[target[p]] = merged
+        return target, contents
+
+    def _upload_blob(self, sha: str, content: bytes):
+        if sha in self._uploaded:
+            return
+        r = self._api("POST", "/git/blobs", json={
+            "content": base64.b64encode(content).decode("ascii"), "encoding": "base64"
+        })
+        if r.status_code == 422:
+            raise PublishError(f"blob 업로드 실패: {r.text[:200]}")
+        if r.json().get("sha") != sha:
+            raise PublishError(f"blob sha 불일치: {sha}")
+        self._uploaded.add(sha)
+
+    def flush(self, message: str):
+        """큐 전체를 커밋 하나로 반영. 반환: 커밋 sha (바뀐 파일이 없으면 None)."""
+        with self._flush_lock:
+            index, blobs = self._snapshot()
+            if not index:
+                return None
+
+            for attempt in range(self.max_retries):
+                head, base_tree = self._head()
+                remote = self._remote_blobs(base_tree, index)
+                target, contents = self._rebase(index, blobs, remote)
+                changed = {p: sha for p, sha in target.items() if remote.get(p) != sha}
+                if not changed:
+                    self._clear(index)
+                    return None
+
+                for sha in set(changed.values()):
+                    self._upload_blob(sha, contents[sha])
+
+                r = self._api("POST", "/git/trees", json={
+                    "base_tree": base_tree,
+                    "tree": [{"path": p, "mode": "100644", "type": "blob", "sha": sha}
+                             for p, sha in sorted(changed.items())],
+                })
+                if r.status_code not in (200, 201):
+                    raise PublishError(f"tree 생성 실패: {r.status_code} {r.text[:200]}")
+                r = self._api("POST", "/git/commits", json={
+                    "message": message, "tree": r.json()["sha"], "parents": [head]
+                })
+                if r.status_code not in (200, 201):
+                    raise PublishError(f"commit 생성 실패: {r.status_code} {r.text[:200]}")
+                commit = r.json()["sha"]
+
+                r = self._api("PATCH", f"/git/refs/heads/{self.branch}", json={"sha": commit, "force": False})
+                if r.status_code == 200:
+                    self._clear(index)
+                    return commit
+                # 422: 그 사이 branch 가 움직임 → 최신 head 의 원격 파일 위에 변경분을 다시 적용
+                time.sleep(min(0.5 * (2 ** attempt), 8))
+
+            raise PublishError(f"ref 갱신 충돌이 {self.max_retries}회 반복되었습니다.")
+
+    def _clear(self, flushed: dict):
+        with self._lock, self._index_locked():
+            index = self._read_index()
+            for p, sha in flushed.items():
+                if index.get(p) == sha:
+                    del index[p]
+            self._write_index(index)
+            self._remove_blobs(set(flushed.values()) - set(index.values()))
+
+    def _remove_blobs(self, shas):
+        """큐에서 더 이상 참조하지 않는 blob 파일 삭제 (index 잠금 안에서 호출)."""
+        live = set(self._read_index().values())
+        for sha in set(shas) - live:
+            try:
+                os.remove(os.path.join(self.queue_dir, sha))
+            except OSError:
+                pass
+
+
+# ----------------------- CLI (CI 모델 커밋용) -----------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="파일들을 Git Data API 로 한 커밋에 반영")
+    ap.add_argument("files", nargs="+")
+    ap.add_argument("-m", "--message", required=True)
+    ap.add_argument("--repo", default=os.environ.get("GITHUB_REPOSITORY", ""), help="owner/repo")
+    ap.add_argument("--branch", default=os.environ.get("GITHUB_REF_NAME", "main"))
+    ap.add_argument("--api-base", default=os.environ.get("GITHUB_API_URL", GITHUB_API))
+    args = ap.parse_args(argv)
+
+    owner, _, repo = args.repo.partition("/")
+    if not owner or not repo:
+        ap.error("--repo owner/repo 가 필요합니다.")
+    pub = GitHubPublisher(owner, repo, args.branch, os.environ.get("GITHUB_TOKEN", ""), api_base=args.api_base)
+    for path in args.files:
+        pub.stage(path)
+    commit = pub.flush(args.message)
+    print(f"✅ 커밋 완료: {commit}" if commit else "ℹ️ 변경 사항 없음")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
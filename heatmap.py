@@ -0,0 +1,130 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from model_utils import explain_batch, predict_batch, top_factor
+from utils import (
+    SEOUL_GU_CENTERS, cache_data, convert_latlon_to_xy, convert_xy_to_latlon, fetch_fcst_summary,
+    get_base_datetime,
+)
+
+# ----------------------- 서울 5km 격자 위험 지도 -----------------------
+# 서울을 덮는 기상청 격자를 모두 나열해 격자별 단기예보를 동시에 받고, 체감온도·예측을 한 번에 계산한다.
+# 결과는 발표시각(base_date, base_time)별로 캐시되므로 새 예보가 나올 때만 다시 조회한다.
+SEOUL_BBOX = (37.41, 37.72, 126.76, 127.19)   # 위도 min/max, 경도 min/max
+MAX_CELL_KM = 5.5                              # 가장 가까운 구 중심에서 이 거리 안의 격자만 서울로 본다
+MAX_WORKERS = 16
+VALUE_COL = "예측환자수(도시기준)"
+REGION = "서울특별시"                           # 지연 피처 저장소 key (학습 데이터의 지역)
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * np.arcsin(np.sqrt(h))
+
+
+def seoul_grid_cells() -> pd.DataFrame:
+    """서울 격자 목록 (nx, ny, 위도, 경도, 자치구). 구 경계 자료가 없어 가장 가까운 구 중심으로 배정한다."""
+    lat0, lat1, lon0, lon1 = SEOUL_BBOX
+    corners = [convert_latlon_to_xy(la, lo) for la in (lat0, lat1) for lo in (lon0, lon1)]
+    xs = np.arange(min(c[0] for c in corners), max(c[0] for c in corners) + 1)
+    ys = np.arange(min(c[1] for c in corners), max(c[1] for c in corners) + 1)
+    gx, gy = (a.ravel() for a in np.meshgrid(xs, ys))
+    lat, lon = convert_xy_to_latlon(gx, gy)
+
+    gus = list(SEOUL_GU_CENTERS)
+    centers = np.array([SEOUL_GU_CENTERS[g] for g in gus])
+    dist = _haversine_km(lat[:, None], lon[:, None], centers[None, :, 0], centers[None, :, 1])
+    nearest = dist.argmin(axis=1)
+    keep = dist[np.arange(len(gx)), nearest] <= MAX_CELL_KM
+    return pd.DataFrame({
+        "nx": gx[keep], "ny": gy[keep], "위도": lat[keep], "경도": lon[keep],
+        "자치구": np.asarray(gus, dtype=object)[nearest[keep]],
+    }).reset_index(drop=True)
+
+
+@metrics.cache_stats("grid_snapshot")
+@cache_data(ttl=3 * 3600, show_spinner=False)
+@metrics.cache_fill
+def _grid_snapshot(target_date: datetime.date, base_date: str, base_time: str, kma_key: str) -> pd.DataFrame:
+    cells = seoul_grid_cells()
+    metrics.observe("grid.fetch.cells", len(cells))
+    with metrics.span("grid.fetch"):
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            results = list(pool.map(
+                lambda c: fetch_fcst_summary(c[0], c[1], target_date, kma_key, priority="precompute")[0],
+                cells[["nx", "ny"]].itertuples(index=False, name=None)))
+
+    col = lambda k: np.array([np.nan if r.get(k) is None else r[k] for r in results], dtype=float)
+    pred, input_df = predict_batch(col("TMX"), col("TMN"), col("REH"), day=target_date, key=REGION)
+    out = pd.concat([cells, input_df[["최고기온(°C)", "최저기온(°C)", "평균상대습도(%)", "최고체감온도(°C)"]]], axis=1)
+    out[VALUE_COL] = np.round(pred, 2)
+    out["주요요인"] = top_factor(explain_batch(input_df))
+    out.attrs["base"] = f"{base_date} {base_time}"
+    return out
+
+
+def grid_snapshot(target_date: datetime.date, kma_key: str) -> pd.DataFrame:
+    """서울 격자별 (기상, 체감온도, 예측) 테이블. 같은 발표시각 안에서는 캐시된 결과."""
+    base_date, base_time = get_base_datetime(target_date)
+    return _grid_snapshot(target_date, base_date, base_time, kma_key)
+
+
+# ---- 그리기 ----
+def _use_korean_font():
+    from matplotlib import font_manager, rcParams
+
+    installed = {f.name for f in font_manager.fontManager.ttflist}
+    for name in ("NanumGothic", "Malgun Gothic", "AppleGothic", "Noto Sans CJK KR"):
+        if name in installed:
+            rcParams["font.family"] = name
+            break
+    rcParams["axes.unicode_minus"] = False
+
+
+def render_heatmap(grid: pd.DataFrame, value_col: str = VALUE_COL):
+    """격자 칸을 값으로 칠하고 자치구 경계(인접 칸의 구가 다른 변)와 구 이름을 겹쳐 그린 Figure."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection, PolyCollection
+
+    _use_korean_font()
+    x, y = grid["nx"].to_numpy(dtype=float), grid["ny"].to_numpy(dtype=float)
+    dx = np.array([-0.5, 0.5, 0.5, -0.5])
+    dy = np.array([-0.5, -0.5, 0.5, 0.5])
+    clat, clon = convert_xy_to_latlon(x[:, None] + dx, y[:, None] + dy)   # (칸, 4 모서리)
+    polys = np.stack([clon, clat], axis=-1)
+
+    fig, ax = plt.subplots(figsize=(7, 6))
+    cells = PolyCollection(polys, array=grid[value_col].to_numpy(dtype=float), cmap="YlOrRd",
+                           edgecolors="white", linewidths=0.3)
+    ax.add_collection(cells)
+    fig.colorbar(cells, ax=ax, label=value_col, shrink=0.8)
+
+    # 구 경계: 오른쪽/위쪽 이웃 칸과 구가 다르면 공유 변을 그린다
+    owner = {(int(a), int(b)): g for a, b, g in zip(grid["nx"], grid["ny"], grid["자치구"])}
+    edges = []
+    for (a, b), g in owner.items():
+        for (na, nb), corner_x, corner_y in (((a + 1, b), [0.5, 0.5], [-0.5, 0.5]),
+                                             ((a, b + 1), [-0.5, 0.5], [0.5, 0.5])):
+            if owner.get((na, nb), g) != g:
+                elat, elon = convert_xy_to_latlon(a + np.array(corner_x), b + np.array(corner_y))
+                edges.append(np.column_stack([elon, elat]))
+    ax.add_collection(LineCollection(edges, colors="#374151", linewidths=1.2))
+
+    for gu, (lat, lon) in SEOUL_GU_CENTERS.items():
+        ax.plot(lon, lat, "o", ms=2, color="#111827")
+        ax.annotate(gu, (lon, lat), fontsize=7, ha="center", va="bottom", xytext=(0, 2), textcoords="offset points")
+
+    ax.autoscale_view()
+    ax.set_aspect(1 / np.cos(np.radians(37.55)))
+    ax.set_xlabel("경도")
+    ax.set_ylabel("위도")
+    ax.set_title(f"서울 5km 격자 온열질환 위험 (발표 {grid.attrs.get('base', '')})")
+    fig.tight_layout()
+    return fig
@@ -0,0 +1,146 @@
+import datetime
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+from singleflight import file_lock
+from utils import cache_data, compute_heat_index_array, get_asos_weather_range
+
+# ----------------------- 질병청 엑셀 일괄 수집 -----------------------
+KDCA_SHEET = "서울특별시"
+DATASET_COLUMNS = [
+    "일자", "지역", "자치구", "최고체감온도(°C)", "최고기온(°C)",
+    "평균기온(°C)", "최저기온(°C)", "평균상대습도(%)", "환자수"
+]
+MERGE_KEYS = ["일자", "자치구"]
+
+
+def workbook_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _to_date_str(v):
+    if isinstance(v, (datetime.datetime, datetime.date)):
+        return v.strftime("%Y-%m-%d")
+    ts = pd.to_datetime(v, errors="coerce")
+    return None if pd.isna(ts) else ts.strftime("%Y-%m-%d")
+
+
+def parse_kdca_workbook(data: bytes, sheet_name: str = KDCA_SHEET) -> pd.DataFrame:
+    """질병청 온열질환 엑셀 → (일자, 지역, 자치구, 환자수) long 테이블.
+
+    시트를 read-only 모드로 한 번만 스트리밍한다.
+    1행: 홀수 열(1, 3, 5, ...)에 자치구명 / 4행부터: 0열 일자, 자치구 열에 환자수.
+    """
+    from openpyxl import load_workbook
+
+    wb = load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, ())
+        districts = [(i, str(v).strip()) for i, v in enumerate(header) if i >= 1 and (i - 1) % 2 == 0 and v]
+        next(rows, None)
+        next(rows, None)
+
+        dates, gus, counts = [], [], []
+        for row in rows:
+            if not row:
+                continue
+            ymd = _to_date_str(row[0])
+            if ymd is None:
+                continue
+            for i, gu in districts:
+                v = row[i] if i < len(row) else None
+                dates.append(ymd)
+                gus.append(gu)
+                counts.append(v)
+    finally:
+        wb.close()
+
+    df = pd.DataFrame({"일자": dates, "자치구": gus, "환자수": counts})
+    df["환자수"] = pd.to_numeric(df["환자수"], errors="coerce").fillna(0).astype(int)
+    df.insert(1, "지역", sheet_name)
+    return df
+
+
+@cache_data(show_spinner=False)
+def load_kdca_workbook(file_hash: str, _data: bytes, sheet_name: str = KDCA_SHEET) -> pd.DataFrame:
+    """파일 해시 기준 캐시 (재실행마다 엑셀을 다시 파싱하지 않음)."""
+    return parse_kdca_workbook(_data, sheet_name)
+
+
+def build_training_rows(df_long: pd.DataFrame, weather_by_date: dict) -> pd.DataFrame:
+    """환자수 long 테이블 + 일자별 ASOS 기상 → 학습 데이터 행 (체감온도는 배열 연산)."""
+    w = pd.DataFrame.from_dict(weather_by_date, orient="index")
+    if w.empty:
+        return pd.DataFrame(columns=DATASET_COLUMNS)
+    w.index = pd.to_datetime(w.index, format="%Y%m%d").strftime("%Y-%m-%d")
+    w = w.rename(columns={"TMX": "최고기온(°C)", "TMN": "최저기온(°C)", "REH": "평균상대습도(%)"})
+
+    rows = df_long.merge(w, left_on="일자", right_index=True, how="inner")
+    rows = rows.dropna(subset=["최고기온(°C)", "최저기온(°C)", "평균상대습도(%)"])
+    tmx = rows["최고기온(°C)"].to_numpy(dtype=float)
+    tmn = rows["최저기온(°C)"].to_numpy(dtype=float)
+    rows["평균기온(°C)"] = np.round((tmx + tmn) / 2, 1)
+    heat_index = compute_heat_index_array(tmx, rows["평균상대습도(%)"].to_numpy(dtype=float))
+    rows["최고체감온도(°C)"] = np.round(heat_index.astype(float), 1)
+    return rows[DATASET_COLUMNS].sort_values(MERGE_KEYS).reset_index(drop=True)
+
+
+def fetch_weather_for_rows(df_long: pd.DataFrame, region: str, api_key: str) -> dict:
+    """df_long 의 전체 일자 범위를 ASOS 한 번의 기간 조회로 가져온다."""
+    ymds = pd.to_datetime(df_long["일자"]).dt.strftime("%Y%m%d")
+    if ymds.empty:
+        return {}
+    return get_asos_weather_range(region, ymds.min(), ymds.max(), api_key, priority="backfill")
+
+
+def _read_csv(src) -> pd.DataFrame:
+    try:
+        return pd.read_csv(src, encoding="utf-8-sig")
+    except UnicodeDecodeError:
+        if hasattr(src, "seek"):
+            src.seek(0)
+        return pd.read_csv(src, encoding="cp949")
+
+
+def read_dataset(csv_path: str) -> pd.DataFrame:
+    if not os.path.exists(csv_path):
+        return pd.DataFrame()
+    return _read_csv(csv_path)
+
+
+def _upsert(existing: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    if not existing.empty:
+        keep = ~existing.set_index(MERGE_KEYS).index.isin(rows.set_index(MERGE_KEYS).index)
+        existing = existing[keep]
+    return pd.concat([existing, rows], ignore_index=True)
+
+
+def upsert_dataset(rows: pd.DataFrame, csv_path: str) -> pd.DataFrame:
+    """(일자, 자치구) 기준 upsert 를 한 번에 적용한다.
+
+    csv_path.lock 에 flock 을 잡고 읽기→교체를 하므로 동시에 저장하는 다른 프로세스의 행을 덮어쓰지 않으며,
+    임시 파일에 전체를 쓴 뒤 os.replace 로 교체하므로 중간 상태가 남지 않는다.
+    """
+    with file_lock(csv_path + ".lock"):
+        df_all = _upsert(read_dataset(csv_path), rows)
+        tmp = f"{csv_path}.{os.getpid()}.tmp"
+        df_all.to_csv(tmp, index=False, encoding="utf-8-sig")
+        os.replace(tmp, csv_path)
+    return df_all
+
+
+def dataset_bytes(rows: pd.DataFrame) -> bytes:
+    """행 → 데이터셋 CSV bytes (GitHub 변경분 스테이징용)."""
+    return rows.to_csv(index=False).encode("utf-8-sig")
+
+
+def merge_dataset_bytes(base: bytes, rows: bytes) -> bytes:
+    """GitHubPublisher merge 함수: 원격(또는 대기 중) CSV base 위에 변경분 rows 를 (일자, 자치구) 기준 upsert."""
+    existing = _read_csv(io.BytesIO(base)) if base.lstrip(b"\xef\xbb\xbf").strip() else pd.DataFrame()
+    return dataset_bytes(_upsert(existing, _read_csv(io.BytesIO(rows))))
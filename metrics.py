@@ -0,0 +1,219 @@
+import bisect
+import contextlib
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+# ----------------------- 경량 계측 (지연 히스토그램 / 카운터) -----------------------
+# HEATAI_METRICS_FILE : 이벤트를 JSON-lines 로 기록할 파일 경로
+# HEATAI_METRICS_PORT : 설정 시 serve() 가 127.0.0.1:<port>/metrics 로 스냅샷 제공
+# HEATAI_PROFILE_DIR  : profile() 결과(.prof) 저장 위치 (기본 ./profiles)
+logger = logging.getLogger("heatai")
+
+BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+_lock = threading.Lock()
+_hists = {}
+_counters = {}
+_local = threading.local()
+_server = None
+
+
+def _key(name: str, tags: dict) -> str:
+    if not tags:
+        return name
+    return name + "{" + ",".join(f"{k}={tags[k]}" for k in sorted(tags)) + "}"
+
+
+class _Histogram:
+    __slots__ = ("counts", "n", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.n = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms: float):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.n += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def quantile(self, q: float) -> float:
+        """버킷 상한 기준 근사 분위수."""
+        rank, acc = q * self.n, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank and c:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.n,
+            "mean_ms": round(self.total / self.n, 3) if self.n else 0.0,
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "buckets": dict(zip([str(b) for b in BUCKETS_MS] + ["+inf"], self.counts)),
+        }
+
+
+def _emit(event: dict):
+    path = os.environ.get("HEATAI_METRICS_FILE")
+    if not path:
+        return
+    event["ts"] = round(time.time(), 3)
+    line = json.dumps(event, ensure_ascii=False)
+    with _lock:
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            pass
+
+
+# ----------------------- 기록 API -----------------------
+def observe(name: str, ms: float, **tags):
+    """히스토그램에 값 1개. tags 는 값 종류가 유한한 것만 (건수·크기는 observe("x.rows", n) 처럼 따로 기록)."""
+    k = _key(name, tags)
+    with _lock:
+        h = _hists.get(k)
+        if h is None:
+            h = _hists[k] = _Histogram()
+        h.add(ms)
+
+
+def incr(name: str, n: int = 1, **tags):
+    k = _key(name, tags)
+    with _lock:
+        _counters[k] = _counters.get(k, 0) + n
+    _emit({"type": "counter", "name": name, "n": n, "tags": tags})
+
+
+def record_error(name: str, exc: BaseException, **tags):
+    """삼켜지는 예외를 흔적 없이 버리지 않도록 카운트 + 디버그 로그."""
+    incr(name + ".error", type=type(exc).__name__, **tags)
+    logger.debug("%s 실패: %r", name, exc, exc_info=exc)
+
+
+@contextlib.contextmanager
+def span(name: str, **tags):
+    t0 = time.perf_counter()
+    err = None
+    try:
+        yield
+    except BaseException as e:
+        err = type(e).__name__
+        raise
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        observe(name, ms, **tags)
+        _emit({"type": "span", "name": name, "ms": round(ms, 3), "tags": tags, "error": err})
+
+
+def timed(name: str = None, **tags):
+    def deco(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(label, **tags):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+# ----------------------- 캐시 적중률 -----------------------
+def cache_stats(name: str):
+    """캐시 데코레이터(st.cache_data 등) 바깥에 붙여 호출 수를 센다. 안쪽의 cache_fill 과 짝."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            prev = getattr(_local, "filled", None)
+            _local.filled = False
+            try:
+                out = fn(*args, **kwargs)
+                incr("cache.miss" if _local.filled else "cache.hit", cache=name)
+                return out
+            finally:
+                _local.filled = prev
+        return wrapper
+    return deco
+
+
+def cache_fill(fn):
+    """캐시 데코레이터 안쪽에 붙인다. 실제 본문이 실행될 때(=miss)만 표시."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        _local.filled = True
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+# ----------------------- 조회 / 내보내기 -----------------------
+def snapshot() -> dict:
+    with _lock:
+        return {
+            "histograms": {k: h.to_dict() for k, h in _hists.items()},
+            "counters": dict(_counters),
+        }
+
+
+def reset():
+    with _lock:
+        _hists.clear()
+        _counters.clear()
+
+
+def serve(port: int = None):
+    """127.0.0.1:<port>/metrics 로 snapshot() JSON 을 제공 (프로세스당 한 번)."""
+    global _server
+    port = port or int(os.environ.get("HEATAI_METRICS_PORT", "0") or 0)
+    if _server is not None or not port:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(snapshot(), ensure_ascii=False).encode("utf-8")
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        _server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    except OSError:  # 이미 다른 프로세스가 사용 중
+        return None
+    threading.Thread(target=_server.serve_forever, daemon=True, name="heatai-metrics").start()
+    return _server
+
+
+@contextlib.contextmanager
+def profile(name: str, enabled: bool = False):
+    """enabled 일 때만 cProfile 로 감싸 profiles/<name>-<시각>.prof 저장."""
+    if not enabled:
+        yield None
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield prof
+    finally:
+        prof.disable()
+        out_dir = os.environ.get("HEATAI_PROFILE_DIR", "profiles")
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        prof.dump_stats(path)
+        logger.info("profile 저장: %s", path)
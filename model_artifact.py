@@ -0,0 +1,169 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+
+import metrics
+
+# ----------------------- 단일 모델 아티팩트 (부스터 + 피처 스키마 매니페스트) -----------------------
+# 파일 = MAGIC | 매니페스트 길이(uint32) | 매니페스트 JSON | zlib 압축한 XGBoost 네이티브 부스터(UBJSON).
+# 매니페스트에는 피처 순서·dtype, 부스터 sha256, 학습 데이터 지문, 평가 지표가 들어 있어
+# 로드할 때 한 번만 검증하고, 이후 예측 입력은 피처 순서대로 쌓은 배열(위치 기반)로 넘긴다.
+ARTIFACT_FILE = "trained_model.artifact"
+MAGIC = b"HEATAIM1"
+FORMAT_VERSION = 1
+_LEN = struct.Struct("<I")
+
+
+class ArtifactError(ValueError):
+    pass
+
+
+def data_fingerprint(blocks) -> dict:
+    """학습 행렬 지문: blocks 는 (X, y) 조각들. 행 수 + X·y float32 바이트 sha256 (조각 나눔과 무관).
+
+    같은 데이터로 재학습했는지 확인하는 용도이며, 샤드 단위 학습도 전체를 메모리에 모으지 않고 계산한다.
+    """
+    hx, hy, rows = hashlib.sha256(), hashlib.sha256(), 0
+    for X, y in blocks:
+        hx.update(np.ascontiguousarray(np.asarray(X, dtype=np.float32)).tobytes())
+        hy.update(np.ascontiguousarray(np.asarray(y, dtype=np.float32)).tobytes())
+        rows += len(y)
+    return {"rows": rows, "sha256": hashlib.sha256(hx.digest() + hy.digest()).hexdigest()}
+
+
+def write_artifact(model, features, path: str = ARTIFACT_FILE, fingerprint: dict = None,
+                   scores: dict = None, params: dict = None) -> dict:
+    """XGBRegressor/Booster → 아티팩트 파일. 임시 파일에 쓴 뒤 교체하므로 읽는 쪽이 반쯤 쓴 파일을 보지 않는다."""
+    import xgboost as xgb
+
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    booster.feature_names = list(features)
+    booster.feature_types = ["float"] * len(features)
+    raw = bytes(booster.save_raw("ubj"))
+    digest = hashlib.sha256(raw).hexdigest()
+    manifest = {
+        "format": FORMAT_VERSION,
+        "model_version": digest[:12],
+        "booster_sha256": digest,
+        "booster_bytes": len(raw),
+        "compression": "zlib",
+        "features": list(features),
+        "dtypes": ["float32"] * len(features),
+        "objective": json.loads(booster.save_config())["learner"]["objective"]["name"],
+        "xgboost": xgb.__version__,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "data": fingerprint or {},
+        "metrics": {k: round(float(v), 6) for k, v in (scores or {}).items()},
+        "params": {k: v for k, v in (params or {}).items()
+                   if isinstance(v, (bool, int, float, str)) and v == v},
+    }
+    head = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + _LEN.pack(len(head)) + head + zlib.compress(raw, 9))
+    os.replace(tmp, path)
+    return manifest
+
+
+def _read(path: str):
+    with open(path, "rb") as f:
+        blob = f.read()
+    if blob[:len(MAGIC)] != MAGIC:
+        raise ArtifactError(f"모델 아티팩트 형식이 아닙니다: {path}")
+    (n,) = _LEN.unpack_from(blob, len(MAGIC))
+    start = len(MAGIC) + _LEN.size
+    try:
+        manifest = json.loads(blob[start:start + n].decode("utf-8"))
+    except ValueError as e:
+        raise ArtifactError(f"매니페스트 해석 실패: {e}")
+    return manifest, memoryview(blob)[start + n:]
+
+
+def read_manifest(path: str = ARTIFACT_FILE) -> dict:
+    return _read(path)[0]
+
+
+class CompactModel:
+    """검증을 마친 부스터. predict(X) 의 X 는 매니페스트 피처 순서의 배열(또는 같은 순서의 DataFrame)."""
+
+    def __init__(self, booster, manifest: dict):
+        self.booster = booster
+        self.manifest = manifest
+        self.features = list(manifest["features"])
+        self.version = manifest["model_version"]
+
+    def get_booster(self):
+        return self.booster
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ArtifactError(f"입력 열 수 {X.shape[-1]} ≠ 모델 피처 수 {len(self.features)}")
+        return self.booster.inplace_predict(X, validate_features=False)
+
+
+def load_artifact(path: str = ARTIFACT_FILE, expected_features=None) -> CompactModel:
+    """아티팩트 로드 + 1회 검증 (형식 버전, 압축 해제한 부스터 sha256, 부스터↔매니페스트 피처 순서·개수, 기대 피처).
+
+    expected_features: 피처 목록 하나, 또는 허용하는 피처 목록들의 목록 (순서까지 같아야 통과).
+    """
+    import xgboost as xgb
+
+    with metrics.span("model.load_artifact"):
+        manifest, payload = _read(path)
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ArtifactError(f"지원하지 않는 아티팩트 형식: {manifest.get('format')}")
+        try:
+            raw = zlib.decompress(payload) if manifest.get("compression") == "zlib" else bytes(payload)
+        except zlib.error as e:
+            raise ArtifactError(f"부스터 압축 해제 실패: {e}")
+        if hashlib.sha256(raw).hexdigest() != manifest["booster_sha256"]:
+            raise ArtifactError("부스터 체크섬 불일치 (파일 손상)")
+        features = list(manifest["features"])
+        if expected_features is not None:
+            allowed = [list(expected_features)] if all(isinstance(f, str) for f in expected_features) \
+                else [list(e) for e in expected_features]
+            if features not in allowed:
+                raise ArtifactError(f"피처 스키마 불일치: 기대 {' 또는 '.join(map(str, allowed))} / 아티팩트 {features}")
+
+        booster = xgb.Booster()
+        booster.load_model(bytearray(raw))
+        if booster.num_features() != len(features):
+            raise ArtifactError(f"부스터 피처 수 {booster.num_features()} ≠ 매니페스트 {len(features)}")
+        if booster.feature_names is not None and list(booster.feature_names) != features:
+            raise ArtifactError(f"부스터 피처 순서가 매니페스트와 다릅니다: {booster.feature_names}")
+    return CompactModel(booster, manifest)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="HeatAI 모델 아티팩트 (변환 / 확인)")
+    ap.add_argument("--from-pickle", nargs=2, metavar=("MODEL_PKL", "FEATURE_PKL"),
+                    help="기존 joblib 모델·피처 피클을 아티팩트로 변환")
+    ap.add_argument("--out", default=ARTIFACT_FILE)
+    args = ap.parse_args(argv)
+
+    if args.from_pickle:
+        import joblib
+        model, features = joblib.load(args.from_pickle[0]), joblib.load(args.from_pickle[1])
+        write_artifact(model, features, args.out, params=model.get_params() if hasattr(model, "get_params") else None)
+    try:
+        t0 = time.perf_counter()
+        model = load_artifact(args.out)
+        ms = (time.perf_counter() - t0) * 1000
+    except (OSError, ArtifactError) as e:
+        print(f"❌ {e}")
+        return 1
+    print(json.dumps(model.manifest, ensure_ascii=False, indent=2))
+    print(f"✅ {args.out}: {os.path.getsize(args.out) / 1024:.1f} KiB, 로드+검증 {ms:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
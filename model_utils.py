@@ -1,10 +1,218 @@
 import pandas as pd
-import joblib
 import math
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
 
-# ✅ 모델 및 피처 로드
-model = joblib.load("trained_model.pkl")
-feature_names = joblib.load("feature_names.pkl")
+import metrics
+from feature_store import LAG_FEATURES, STORE_FILE as LAG_STORE_FILE
+from schema import FEATURES
+
+MODEL_FILE = "trained_model.pkl"
+FEATURE_FILE = "feature_names.pkl"
+BUNDLE_FILE = "trained_model_bundle.pkl"
+ARTIFACT_FILE = "trained_model.artifact"   # 있으면 우선 사용 (model_artifact: 부스터 + 피처 매니페스트)
+# 서빙이 채울 수 있는 피처 순서 (기상 5개, --lag-features 모델은 + 지연·이동창). 아티팩트가 다르면 로드 실패.
+SUPPORTED_FEATURES = (list(FEATURES), list(FEATURES) + LAG_FEATURES)
+
+PRED_CACHE_SIZE = int(os.environ.get("HEATAI_PRED_CACHE", "4096"))
+VERSION_CHECK_S = 5.0   # 모델 파일 교체 여부를 확인하는 최소 간격(초)
+
+# ✅ 모델 및 피처 로드 (첫 예측 시점까지 지연: xgboost import 비용을 앱 시작에서 제외)
+_model = None
+_feature_names = None
+_model_version = None
+_model_path = None
+_model_sig = None
+_last_check = 0.0
+_load_lock = threading.Lock()
+
+def _file_sig(path: str):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _load_pickles():
+    import joblib
+    with open(MODEL_FILE, "rb") as f:
+        version = hashlib.sha256(f.read()).hexdigest()[:12]
+    return joblib.load(MODEL_FILE), list(joblib.load(FEATURE_FILE)), version
+
+def load_model(force: bool = False):
+    """(model, feature_names) 반환. 최초 1회만 디스크에서 읽는다 (force=True 면 다시 읽음).
+
+    ARTIFACT_FILE 이 있으면 그것만 읽어 스키마를 검증하고(model_artifact.load_artifact),
+    없으면 예전 joblib 피클 두 개를 읽는다.
+    """
+    global _model, _feature_names, _model_version, _model_path, _model_sig
+    if _model is not None and not force:
+        return _model, _feature_names
+    with _load_lock:
+        if _model is None or force:
+            with metrics.span("model.load"):
+                if os.path.exists(ARTIFACT_FILE):
+                    from model_artifact import load_artifact
+                    _model_path, _model_sig = ARTIFACT_FILE, _file_sig(ARTIFACT_FILE)
+                    _model = load_artifact(ARTIFACT_FILE, expected_features=SUPPORTED_FEATURES)
+                    _feature_names, _model_version = _model.features, _model.version
+                else:
+                    _model_path, _model_sig = MODEL_FILE, _file_sig(MODEL_FILE)
+                    _model, _feature_names, _model_version = _load_pickles()
+            prediction_cache.clear()
+            explanation_cache.clear()
+    return _model, _feature_names
+
+def model_version() -> str:
+    """현재 메모리에 올라온 모델의 버전 (아티팩트: 부스터 sha256, 피클: 파일 sha256 앞 12자리)."""
+    load_model()
+    return _model_version
+
+def _reload_if_changed():
+    """모델 파일이 새로 배포(mtime/크기 변경, 아티팩트 추가)됐으면 다시 읽는다. VERSION_CHECK_S 에 한 번만 stat."""
+    global _last_check
+    now = time.monotonic()
+    if _model is None or now - _last_check < VERSION_CHECK_S:
+        return
+    _last_check = now
+    path = ARTIFACT_FILE if os.path.exists(ARTIFACT_FILE) else MODEL_FILE
+    try:
+        sig = _file_sig(path)
+    except OSError:
+        return
+    if path != _model_path or sig != _model_sig:
+        metrics.incr("model.reload")
+        load_model(force=True)
+
+# ✅ 지연·이동창 피처 (학습이 저장한 지역 단위 feature_store.csv 의 행, 파일이 바뀌면 다시 읽음)
+LAG_KEY_COL = "지역"
+_lag_store = (None, None)
+
+def _stored_lags():
+    global _lag_store
+    try:
+        sig = _file_sig(LAG_STORE_FILE)
+    except OSError:
+        return None
+    if _lag_store[0] != sig:
+        from feature_store import FeatureStore
+        _lag_store = (sig, FeatureStore.load(LAG_STORE_FILE, LAG_KEY_COL))
+    return _lag_store[1]
+
+def lag_features(day, key, heat_index=None) -> dict:
+    """모델이 지연·이동창 피처로 학습됐으면 저장소의 (day, key) 행(없는 날은 heat_index 로 이어서 계산), 아니면 {}."""
+    _, feature_names = load_model()
+    if not any(f in LAG_FEATURES for f in feature_names):
+        return {}
+    store = _stored_lags()
+    return store.features_for(day, key, heat_index) if store is not None else {}
+
+def _check_lags(feature_names, provided):
+    missing = [f for f in feature_names if f in LAG_FEATURES and f not in provided]
+    if missing:
+        raise ValueError(f"❌ 모델에 지연·이동창 피처 {missing} 가 필요합니다 "
+                         f"(day/key 로 {LAG_STORE_FILE} 행을 찾지 못했거나 extra 누락)")
+
+# ✅ 예측 메모이제이션 (0.1 단위로 맞춘 피처 벡터 + 모델 버전 → 예측값, LRU)
+class PredictionCache:
+    def __init__(self, maxsize: int = PRED_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data),
+                    "maxsize": self.maxsize, "hit_rate": self.hits / total if total else 0.0,
+                    "model_version": _model_version}
+
+prediction_cache = PredictionCache()
+explanation_cache = PredictionCache()   # 같은 키 → 피처별 기여도(TreeSHAP) + 기준값
+
+BIAS_COL = "기준값"
+
+def _quantize(row) -> tuple:
+    # 0.1 단위 정수로 (결측은 None) → 부동소수 표현 차이와 무관하게 같은 키
+    return tuple(None if v != v else int(round(v * 10)) for v in row)
+
+def _cached_rows(cache: PredictionCache, name: str, X: pd.DataFrame, compute, width: int):
+    """X 의 각 행을 (모델 버전, 양자화 벡터) 로 cache 에서 찾고, 없는 행만 compute(model, 배열, 열 이름) 1회로 채운다.
+
+    X 의 열은 모델 피처 순서여야 하며, compute 에는 그 순서 그대로의 배열(위치 기반)을 넘긴다.
+    반환: (행 수, width) ndarray.
+    """
+    import numpy as np
+
+    _reload_if_changed()
+    model, _ = load_model()
+    values = np.round(X.to_numpy(dtype=float), 1)
+    keys = [(_model_version, _quantize(row)) for row in values]
+    out = np.empty((len(keys), width))
+    miss = []
+    for i, key in enumerate(keys):
+        hit = cache.get(key)
+        if hit is None:
+            miss.append(i)
+        else:
+            out[i] = hit
+    metrics.incr("cache.hit", len(keys) - len(miss), cache=name)
+    if miss:
+        metrics.incr("cache.miss", len(miss), cache=name)
+        computed = np.asarray(compute(model, values[miss], list(X.columns)), dtype=float)
+        for i, row in zip(miss, computed.reshape(len(miss), width)):
+            out[i] = row
+            cache.put(keys[i], tuple(row))
+    return out
+
+def _predict_cached(X: pd.DataFrame):
+    """X 의 각 행을 예측 캐시에서 찾고, 없는 행만 model.predict 1회로 채운다."""
+    def compute(model, values, _):
+        metrics.observe("model.predict.rows", len(values))
+        with metrics.span("model.predict"):
+            return model.predict(values)
+    return _cached_rows(prediction_cache, "prediction", X, compute, 1)[:, 0]
+
+def _explain_cached(X: pd.DataFrame):
+    """X 의 각 행의 피처별 기여도 + 기준값. 없는 행만 pred_contribs(TreeSHAP) 1회로 채운다."""
+    import xgboost as xgb
+
+    def compute(model, values, columns):
+        metrics.observe("model.explain.rows", len(values))
+        with metrics.span("model.explain"):
+            dm = xgb.DMatrix(values, feature_names=columns)
+            return model.get_booster().predict(dm, pred_contribs=True)
+    return _cached_rows(explanation_cache, "explanation", X, compute, X.shape[1] + 1)
+
+def __getattr__(name):
+    # 예전처럼 model_utils.model / model_utils.feature_names 로 접근해도 동작하도록
+    if name == "model":
+        return load_model()[0]
+    if name == "feature_names":
+        return load_model()[1]
+    raise AttributeError(name)
 
 # ✅ 1. Stull의 추정식 기반 습구온도(Tw) 계산 함수
 def compute_tw_stull(ta, rh):
@@ -47,27 +255,174 @@ def compute_heat_index_kma2022(ta, rh):
     return round(heat_index, 1)
 
 # ✅ 3. 예측 함수 (기상 정보 → 예측 환자 수)
-def predict_from_weather(tmx, tmn, reh):
+def predict_from_weather(tmx, tmn, reh, extra: dict = None, day=None, key: str = None):
     """
     tmx: 최고기온 (°C)
     tmn: 최저기온 (°C)
     reh: 평균상대습도 (%)
+    extra: 모델이 지연·이동창 피처로 학습된 경우 FeatureStore 행 (없으면 day/key 로 저장소에서 찾음)
+    day, key: 예측 일자와 지역 (지연 피처 조회용)
     return: (예측 환자 수, 평균기온, 체감온도, 입력데이터프레임)
+
+    모델이 지연 피처를 쓰는데 extra 도 저장소 행도 없으면 ValueError.
+    입력은 0.1 단위로 맞춘 뒤 예측하며, 같은 (모델 버전, 입력) 조합은 캐시에서 바로 반환한다
+    (캐시된 입력데이터프레임은 호출 간에 공유되므로 수정하지 말 것).
     """
-    avg_temp = round((tmx + tmn) / 2, 1)
-    heat_index = compute_heat_index_kma2022(tmx, reh)
+    import numpy as np
 
+    tmx, tmn, reh = round(float(tmx), 1), round(float(tmn), 1), round(float(reh), 1)
+    _reload_if_changed()
+    model, feature_names = load_model()
+    heat_index = compute_heat_index_kma2022(tmx, reh)
     if heat_index is None:
         raise ValueError("❌ 체감온도 계산 실패")
+    if extra is None and day is not None:
+        extra = lag_features(day, key, heat_index)
+    _check_lags(feature_names, extra or {})
 
+    cache_key = (_model_version, "weather", tmx, tmn, reh,
+                 tuple(sorted((k, _quantize((float(v),))[0] if v is not None else None) for k, v in (extra or {}).items())))
+    hit = prediction_cache.get(cache_key)
+    if hit is not None:
+        metrics.incr("cache.hit", cache="prediction")
+        return hit
+    metrics.incr("cache.miss", cache="prediction")
+
+    avg_temp = round((tmx + tmn) / 2, 1)
     input_df = pd.DataFrame([{
         "최고체감온도(°C)": heat_index,
         "최고기온(°C)": tmx,
         "평균기온(°C)": avg_temp,
         "최저기온(°C)": tmn,
-        "평균상대습도(%)": reh
+        "평균상대습도(%)": reh,
+        **(extra or {})
     }])
 
-    X = input_df[feature_names]
-    pred = model.predict(X)[0]
-    return pred, avg_temp, heat_index, input_df
+    row = input_df.iloc[0]
+    X = np.round(np.array([[row.get(f, np.nan) for f in feature_names]], dtype=float), 1)   # 피처 순서대로 (위치 기반)
+    metrics.observe("model.predict.rows", 1)
+    with metrics.span("model.predict"):
+        pred = model.predict(X)[0]
+    out = (pred, avg_temp, heat_index, input_df)
+    prediction_cache.put(cache_key, out)
+    return out
+
+# ✅ 3-1. 여러 지역을 한 번에 예측 (model.predict 1회)
+def predict_batch(tmx, tmn, reh, extra: pd.DataFrame = None, day=None, key=None):
+    """
+    tmx, tmn, reh: 지역 수만큼의 배열 (결측은 NaN → 해당 행 예측도 NaN)
+    extra: 행 순서가 같은 추가 피처 프레임 (선택, 없으면 day/key 로 저장소의 지연 피처를 찾음)
+    day, key: 행별 예측 일자·지역 (스칼라면 모든 행에 같은 값)
+    return: (예측 환자 수 ndarray, 입력데이터프레임)
+    """
+    import numpy as np
+    from utils import compute_heat_index_array
+
+    tmx = np.asarray(tmx, dtype=float)
+    tmn = np.asarray(tmn, dtype=float)
+    reh = np.asarray(reh, dtype=float)
+    input_df = pd.DataFrame({
+        "최고체감온도(°C)": np.round(compute_heat_index_array(tmx, reh).astype(float), 1),
+        "최고기온(°C)": tmx,
+        "평균기온(°C)": np.round((tmx + tmn) / 2, 1),
+        "최저기온(°C)": tmn,
+        "평균상대습도(%)": reh,
+    })
+    _, feature_names = load_model()
+    if extra is None and day is not None and any(f in LAG_FEATURES for f in feature_names):
+        n = len(input_df)
+        days = list(day) if isinstance(day, (list, tuple, np.ndarray, pd.Series)) else [day] * n
+        keys = list(key) if isinstance(key, (list, tuple, np.ndarray, pd.Series)) else [key] * n
+        rows = [lag_features(d, k, hi) for d, k, hi in zip(days, keys, input_df["최고체감온도(°C)"])]
+        # 기상 입력이 있는 행이 하나라도 저장소 행을 못 찾으면 extra 없음 → 아래에서 ValueError
+        if all(r for r, good in zip(rows, _complete_rows(input_df)) if good):
+            extra = pd.DataFrame(rows, columns=LAG_FEATURES)
+    if extra is not None:
+        input_df = pd.concat([input_df, extra.reset_index(drop=True)], axis=1)
+    _check_lags(feature_names, input_df.columns)
+
+    pred = np.full(len(input_df), np.nan)
+    ok = _complete_rows(input_df)
+    if ok.any():
+        pred[ok] = _predict_cached(input_df.loc[ok].reindex(columns=feature_names).astype(float))
+    return pred, input_df
+
+def _complete_rows(input_df: pd.DataFrame):
+    return input_df[["최고체감온도(°C)", "최고기온(°C)", "최저기온(°C)", "평균상대습도(%)"]].notna().all(axis=1).to_numpy()
+
+# ✅ 3-2. 예측 설명 (피처별 기여도, 예측과 같은 키로 캐시)
+def explain_batch(input_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    input_df: predict_batch / predict_from_weather 가 돌려준 입력데이터프레임
+    return: 행 순서가 같은 (피처별 기여도 …, 기준값) 프레임. 기여도 합 + 기준값 = 예측값, 입력 결측 행은 NaN.
+
+    미리 계산해 둔 예측(폴러·전국·격자 스냅샷)에서 한 번 채워 두면 이후 조회는 캐시만 읽는다.
+    """
+    import numpy as np
+
+    _, feature_names = load_model()
+    out = pd.DataFrame(np.nan, index=input_df.index, columns=list(feature_names) + [BIAS_COL])
+    ok = _complete_rows(input_df)
+    if ok.any():
+        out.loc[ok] = _explain_cached(input_df.loc[ok].reindex(columns=feature_names).astype(float))
+    return out
+
+def explain_from_weather(tmx, tmn, reh, extra: dict = None, day=None, key: str = None) -> pd.Series:
+    """predict_from_weather 와 같은 입력의 피처별 기여도 (+ 기준값)."""
+    input_df = predict_from_weather(tmx, tmn, reh, extra, day, key)[3]
+    return explain_batch(input_df).iloc[0]
+
+def top_factor(contribs: pd.DataFrame):
+    """기여도 프레임 → 행마다 예측을 가장 크게 올린 피처 이름 (결측 행은 None)."""
+    import numpy as np
+
+    values = contribs.drop(columns=[BIAS_COL]).to_numpy(dtype=float)
+    names = np.asarray(contribs.columns.drop(BIAS_COL), dtype=object)
+    out = np.full(len(values), None, dtype=object)
+    ok = ~np.isnan(values).all(axis=1)
+    out[ok] = names[np.nanargmax(values[ok], axis=1)]
+    return out
+
+# ✅ 4. 그룹별(자치구/광역) 모델 번들 일괄 추론
+class ModelBundle:
+    """train_model.train_per_group 이 만든 번들. predict() 한 번으로 여러 그룹의 행을 채점한다."""
+
+    def __init__(self, bundle: dict):
+        import xgboost as xgb
+
+        self.group_col = bundle["group_col"]
+        self.features = list(bundle["features"])
+        self.boosters = {}
+        for name, raw in bundle["models"].items():
+            booster = xgb.Booster()
+            booster.load_model(bytearray(raw))
+            self.boosters[name] = booster
+
+    @classmethod
+    def load(cls, path: str = BUNDLE_FILE) -> "ModelBundle":
+        import joblib
+        with metrics.span("model.load_bundle"):
+            return cls(joblib.load(path))
+
+    def predict(self, df: pd.DataFrame):
+        """df 의 각 행을 해당 그룹 모델로 예측 (번들에 없는 그룹은 통합 모델). 반환: 행 순서의 ndarray."""
+        import numpy as np
+        import xgboost as xgb
+
+        X = df[self.features].to_numpy(dtype=np.float32)
+        groups = df[self.group_col].astype(str).to_numpy()
+        out = np.empty(len(df), dtype=np.float32)
+        metrics.observe("model.predict_bundle.rows", len(df))
+        with metrics.span("model.predict_bundle"):
+            fallback = np.ones(len(df), dtype=bool)
+            for name in np.unique(groups):
+                booster = self.boosters.get(name)
+                if booster is None:
+                    continue
+                mask = groups == name
+                out[mask] = booster.predict(xgb.DMatrix(X[mask], feature_names=self.features))
+                fallback &= ~mask
+            if fallback.any():
+                model, feature_names = load_model()
+                out[fallback] = model.predict(df.loc[fallback, feature_names])
+        return out
@@ -0,0 +1,72 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import metrics
+from model_utils import explain_batch, predict_batch, top_factor
+from utils import (
+    cache_data, convert_latlon_to_xy, get_asos_weather, get_risk_level, get_weather,
+    region_to_latlon, region_to_stn_id,
+)
+
+# ----------------------- 전국 17개 시·도 일괄 위험 스냅샷 -----------------------
+# 지역별 업스트림 조회를 동시에 보내되, 같은 관측소(ASOS)·같은 격자(단기예보)는 한 번만 조회하고
+# 17개 행을 model.predict 한 번으로 채점한다.
+REGIONS = list(region_to_stn_id)
+MAX_WORKERS = 16
+
+
+def _source(region: str, target_date: datetime.date, today: datetime.date):
+    """지역의 조회 단위: 과거는 ASOS 관측소, 오늘·미래는 단기예보 격자."""
+    if target_date < today:
+        return ("asos", region_to_stn_id[region])
+    return ("fcst", convert_latlon_to_xy(*region_to_latlon[region]))
+
+
+def _fetch(source, region: str, target_date: datetime.date, kma_key: str, asos_key: str) -> dict:
+    kind, _ = source
+    if kind == "asos":
+        return get_asos_weather(region, target_date.strftime("%Y%m%d"), asos_key)
+    summary, _, _ = get_weather(region, target_date, kma_key)
+    return {**summary, "age_s": get_weather.age(region, target_date, kma_key)}
+
+
+@metrics.cache_stats("national_snapshot")
+@cache_data(ttl=600, show_spinner=False)
+@metrics.cache_fill
+def national_snapshot(target_date: datetime.date, kma_key: str, asos_key: str) -> pd.DataFrame:
+    """전국 시·도별 (TMX, TMN, REH, 체감온도, 예측 환자 수, 위험 등급) 테이블 (예측 내림차순)."""
+    today = datetime.date.today()
+    sources = {r: _source(r, target_date, today) for r in REGIONS}
+    unique = {}
+    for region, src in sources.items():
+        unique.setdefault(src, region)  # 같은 관측소/격자는 첫 지역 이름으로 한 번만 조회
+
+    metrics.observe("national.fetch.sources", len(unique))
+
+    with metrics.span("national.fetch"):
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(unique))) as pool:
+            futures = {src: pool.submit(_fetch, src, region, target_date, kma_key, asos_key)
+                       for src, region in unique.items()}
+            fetched = {src: f.result() for src, f in futures.items()}
+    metrics.incr("national.dedup_saved", len(sources) - len(unique))
+
+    rows = [fetched[sources[r]] for r in REGIONS]
+    col = lambda k: np.array([np.nan if row.get(k) is None else row[k] for row in rows], dtype=float)
+    pred, input_df = predict_batch(col("TMX"), col("TMN"), col("REH"), day=target_date, key=REGIONS)
+
+    out = pd.DataFrame({
+        "지역": REGIONS,
+        "조회원": [f"ASOS {src[1]}" if src[0] == "asos" else f"격자 {src[1][0]},{src[1][1]}"
+                 for src in (sources[r] for r in REGIONS)],
+        "위도": [region_to_latlon[r][0] for r in REGIONS],
+        "경도": [region_to_latlon[r][1] for r in REGIONS],
+    })
+    out = pd.concat([out, input_df[["최고기온(°C)", "최저기온(°C)", "평균상대습도(%)", "최고체감온도(°C)"]]], axis=1)
+    out["예측환자수"] = np.round(pred, 2)
+    out["위험등급"] = [get_risk_level(p) if not np.isnan(p) else "자료 없음" for p in pred]
+    out["주요요인"] = top_factor(explain_batch(input_df))   # 설명도 예측과 함께 미리 계산해 캐시에 둔다
+    out["경과(초)"] = col("age_s")
+    return out.sort_values("예측환자수", ascending=False, na_position="last").reset_index(drop=True)
@@ -0,0 +1,140 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import scoring
+from schema import SchemaError, clean_columns
+from regions import SEOUL_GUS
+
+# ----------------------- 가입자(계약) 저장소 / 보상금 일괄 산정 -----------------------
+# 계약 1건 = (계약번호, 자치구, 보장등급, 시작일, 종료일, 자기부담금).
+# 열 지향으로 보관하고(parquet, 엔진이 없으면 .npz), 사고일 하루의 보상금을 자치구 코드 인덱싱과
+# bincount 로 계약별·자치구별 합계까지 한 번에 계산한다.
+TIERS = {"기본": 1.0, "표준": 1.5, "프리미엄": 2.0}   # 등급별 기본 보상금(scoring.PAYOUTS) 배수
+COLUMNS = ["계약번호", "자치구", "보장등급", "시작일", "종료일", "자기부담금"]
+
+
+def coerce_policies(df: pd.DataFrame) -> pd.DataFrame:
+    """업로드/원본 프레임 → 표준 dtype (자치구·보장등급 category, 날짜 datetime64[s], 자기부담금 int32)."""
+    df = clean_columns(df.copy())
+    missing = [c for c in COLUMNS if c not in df.columns]
+    if missing:
+        raise SchemaError(f"필수 열 누락: {missing}")
+    out = pd.DataFrame({
+        "계약번호": df["계약번호"].astype(str),
+        "자치구": pd.Categorical(df["자치구"].astype(str).str.strip(), categories=SEOUL_GUS),
+        "보장등급": pd.Categorical(df["보장등급"].astype(str).str.strip(), categories=list(TIERS)),
+        "시작일": pd.to_datetime(df["시작일"], errors="coerce").astype("datetime64[s]"),
+        "종료일": pd.to_datetime(df["종료일"], errors="coerce").astype("datetime64[s]"),
+        "자기부담금": pd.to_numeric(df["자기부담금"], errors="coerce").fillna(0).astype(np.int32),
+    })
+    bad = out["자치구"].isna() | out["보장등급"].isna() | out["시작일"].isna() | out["종료일"].isna()
+    if bad.any():
+        raise SchemaError(f"해석 불가 계약 {int(bad.sum())}건 (자치구/보장등급/기간 확인)")
+    return out
+
+
+# ---- 저장 / 읽기 ----
+def save_policies(df: pd.DataFrame, path: str) -> str:
+    """.parquet 이면 parquet(엔진 없으면 .npz 로 대체), 그 외에는 .npz (범주는 코드+카테고리로 저장)."""
+    if path.endswith(".parquet"):
+        try:
+            df.to_parquet(path, index=False)
+            return path
+        except ImportError:
+            path = os.path.splitext(path)[0] + ".npz"
+    np.savez(
+        path,
+        계약번호=df["계약번호"].to_numpy(dtype=str),
+        자치구=df["자치구"].cat.codes.to_numpy(np.int16), 자치구_범주=np.asarray(df["자치구"].cat.categories, dtype=str),
+        보장등급=df["보장등급"].cat.codes.to_numpy(np.int8), 보장등급_범주=np.asarray(df["보장등급"].cat.categories, dtype=str),
+        시작일=df["시작일"].to_numpy("datetime64[s]"), 종료일=df["종료일"].to_numpy("datetime64[s]"),
+        자기부담금=df["자기부담금"].to_numpy(np.int32),
+    )
+    return path if path.endswith(".npz") else path + ".npz"
+
+
+def load_policies(path_or_file, name: str = None) -> pd.DataFrame:
+    """.parquet / .npz / .csv(업로드 포함) → 표준 계약 프레임."""
+    name = name or str(path_or_file)
+    if name.endswith(".npz"):
+        z = np.load(path_or_file)
+        return pd.DataFrame({
+            "계약번호": z["계약번호"],
+            "자치구": pd.Categorical.from_codes(z["자치구"], categories=list(z["자치구_범주"])),
+            "보장등급": pd.Categorical.from_codes(z["보장등급"], categories=list(z["보장등급_범주"])),
+            "시작일": z["시작일"], "종료일": z["종료일"], "자기부담금": z["자기부담금"],
+        })
+    if name.endswith(".parquet"):
+        return coerce_policies(pd.read_parquet(path_or_file))
+    return coerce_policies(pd.read_csv(path_or_file, encoding="utf-8-sig"))
+
+
+# ---- 보상금 산정 ----
+def compute_payouts(policies: pd.DataFrame, damage: pd.DataFrame, day) -> tuple:
+    """사고일 day 의 (계약별 보상금 ndarray, 자치구별 합계 DataFrame).
+
+    damage: 자치구별 '피해점수'(H 반영 후) 테이블. 계약 보상금 = max(등급 기본금 × 보장등급 배수 − 자기부담금, 0),
+    계약 기간(시작일 ≤ day ≤ 종료일) 밖이면 0.
+    """
+    day = np.datetime64(pd.Timestamp(day).normalize(), "s")
+    gu_codes = policies["자치구"].cat.codes.to_numpy()
+    gu_names = list(policies["자치구"].cat.categories)
+
+    # 자치구 코드 → 기본 보상금 (피해점수가 없는 구는 0)
+    score = damage.assign(자치구=damage["자치구"].astype(str)).groupby("자치구")["피해점수"].max()
+    base_by_code = scoring.calc_payout(score.reindex(gu_names).fillna(0).to_numpy()).astype(np.float64)
+    mult = pd.Series(TIERS).reindex(policies["보장등급"].cat.categories).to_numpy(np.float64)
+
+    active = (policies["시작일"].to_numpy() <= day) & (policies["종료일"].to_numpy() >= day)
+    gross = base_by_code[gu_codes] * mult[policies["보장등급"].cat.codes.to_numpy()]
+    payout = np.where(active, np.maximum(gross - policies["자기부담금"].to_numpy(), 0), 0).astype(np.int64)
+
+    n = len(gu_names)
+    per_gu = pd.DataFrame({
+        "자치구": gu_names,
+        "가입건수": np.bincount(gu_codes, weights=active, minlength=n).astype(np.int64),
+        "지급건수": np.bincount(gu_codes, weights=payout > 0, minlength=n).astype(np.int64),
+        "총보상금": np.bincount(gu_codes, weights=payout, minlength=n).astype(np.int64),
+    })
+    per_gu["기본보상금"] = base_by_code.astype(np.int64)
+    return payout, per_gu
+
+
+def synthetic_policies(n: int, seed: int = 0, year: int = 2025) -> pd.DataFrame:
+    """벤치마크용 임의 계약 n 건."""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(f"{year}-06-01", "s") + rng.integers(0, 60, n).astype("timedelta64[D]")
+    return pd.DataFrame({
+        "계약번호": np.char.add("P", np.arange(n).astype(str)),
+        "자치구": pd.Categorical.from_codes(rng.integers(0, len(SEOUL_GUS), n), categories=SEOUL_GUS),
+        "보장등급": pd.Categorical.from_codes(rng.integers(0, len(TIERS), n), categories=list(TIERS)),
+        "시작일": start,
+        "종료일": start + np.timedelta64(90, "D"),
+        "자기부담금": rng.choice(np.array([0, 1000, 3000], dtype=np.int32), n),
+    })
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="계약 보상금 일괄 산정 벤치마크")
+    ap.add_argument("--policies", type=int, default=1_000_000)
+    ap.add_argument("--day", default="2025-08-05")
+    args = ap.parse_args(argv)
+
+    policies = synthetic_policies(args.policies, year=pd.Timestamp(args.day).year)
+    rng = np.random.default_rng(1)
+    damage = pd.DataFrame({"자치구": SEOUL_GUS, "피해점수": rng.uniform(20, 60, len(SEOUL_GUS))})
+    t0 = time.perf_counter()
+    payout, per_gu = compute_payouts(policies, damage, args.day)
+    elapsed = time.perf_counter() - t0
+    print(per_gu.sort_values("총보상금", ascending=False).head(10).to_string(index=False))
+    print(f"\n✅ 계약 {len(policies):,}건 → 지급 {int((payout > 0).sum()):,}건, 총 {int(payout.sum()):,}원 ({elapsed:.3f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
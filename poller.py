@@ -0,0 +1,343 @@
+import argparse
+import datetime as dt
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows 등: 프로세스 간 단일화 없이 프로세스마다 폴러 1개
+    fcntl = None
+
+import metrics
+from model_utils import explain_batch, model_version, predict_batch
+from utils import (
+    KST, SEOUL_GU_CENTERS, SEOUL_GUS, convert_latlon_to_xy, fetch_today_tmx_tmn, fetch_ultra_now,
+    get_base_datetime, next_release, resolver,
+)
+
+# ----------------------- 25개 자치구 실황/예보 백그라운드 폴러 -----------------------
+# 호스트당 폴러 1개(flock)가 자치구 격자 전체를 주기적으로 갱신해 고정 배치 파일(mmap)에 쓰고,
+# 모든 Streamlit 세션은 네트워크 없이 이 파일만 읽는다. 쓰기/읽기는 seqlock 으로 맞춘다
+# (쓰는 중엔 seq 홀수 → 읽는 쪽은 seq 가 짝수이고 앞뒤가 같을 때만 값을 믿는다).
+# 같은 입력으로 예측·피처별 기여도도 미리 계산해 옆 파일(<스냅샷>.explain.json, 모델 버전 포함)에 둔다.
+SNAPSHOT_FILE = os.environ.get("HEATAI_SNAPSHOT_FILE", ".heatai_snapshot.bin")
+# 갱신은 고정 주기가 아니라 utils.PRODUCTS 의 발표시각 + 제공 지연 직후에 맞춘다 (next_release).
+NOWCAST_EVERY = 3600    # 초단기실황 발표 간격 (매시 정시, 지연 안내 기준)
+RETRY_EVERY = 60        # 새 발표가 아직 제공되지 않았으면 이 간격으로 다시 시도
+MAX_AGE = NOWCAST_EVERY + 1800   # 이보다 오래된 실황은 세션에서 쓰지 않음
+REGION = "서울특별시"    # 지연 피처 저장소 key (학습 데이터의 지역)
+
+MAGIC = b"HEAT"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sHHQd")       # magic, version, n, seq, 갱신 시각
+RECORD = struct.Struct("<hhffffdd")     # nx, ny, T1H, REH, TMX, TMN, 실황 수신 시각, 예보 수신 시각
+SEQ_OFFSET = 8
+SIZE = HEADER.size + RECORD.size * len(SEOUL_GUS)
+NAN = float("nan")
+
+
+def covers_day(base_date: str, base_time: str, day: dt.date) -> bool:
+    """발표 (base_date, base_time) 의 예보 구간(발표 다음 시각부터)에 day 가 들어 있는지 (23시 발표는 다음 날부터)."""
+    start = dt.datetime.strptime(base_date + base_time, "%Y%m%d%H%M") + dt.timedelta(hours=1)
+    return start.date() <= day
+
+
+def next_midnight(now: dt.datetime = None) -> dt.datetime:
+    now = now or dt.datetime.now(KST)
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) + dt.timedelta(days=1)
+
+
+def _cells():
+    return [convert_latlon_to_xy(*SEOUL_GU_CENTERS[gu]) for gu in SEOUL_GUS]
+
+
+# ---- 쓰기 ----
+class SnapshotWriter:
+    def __init__(self, path: str = SNAPSHOT_FILE):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) != SIZE:
+            with open(path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, LAYOUT_VERSION, len(SEOUL_GUS), 0, 0.0))
+                f.write(b"\0" * (SIZE - HEADER.size))
+        self._f = open(path, "r+b")
+        self._mm = mmap.mmap(self._f.fileno(), SIZE)
+
+    def write(self, records: list):
+        """records: SEOUL_GUS 순서의 (nx, ny, T1H, REH, TMX, TMN, 실황시각, 예보시각)."""
+        seq = struct.unpack_from("<Q", self._mm, SEQ_OFFSET)[0] | 1   # 홀수: 쓰는 중
+        struct.pack_into("<Q", self._mm, SEQ_OFFSET, seq)
+        for i, rec in enumerate(records):
+            RECORD.pack_into(self._mm, HEADER.size + i * RECORD.size, *rec)
+        HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, len(SEOUL_GUS), seq + 1, time.time())
+        self._mm.flush()
+
+
+# ---- 읽기 ----
+_reader = {}
+
+def read_snapshot(path: str = SNAPSHOT_FILE, retries: int = 100) -> dict:
+    """{자치구: {T1H, REH, TMX, TMN, obs_age_s, fcst_age_s, nx, ny}} (파일 없음/배치 불일치 시 {}).
+
+    폴러는 받은 날(KST)의 TMX/TMN 을 받으므로, 예보를 오늘 받지 않았으면(자정 직후·예보 장애) TMX/TMN 은 None.
+    """
+    mm = _reader.get(path)
+    if mm is None:
+        if not os.path.exists(path) or os.path.getsize(path) != SIZE:
+            return {}
+        with open(path, "rb") as f:
+            mm = _reader[path] = mmap.mmap(f.fileno(), SIZE, access=mmap.ACCESS_READ)
+
+    for _ in range(retries):
+        seq1 = struct.unpack_from("<Q", mm, SEQ_OFFSET)[0]
+        if seq1 % 2:
+            time.sleep(0)
+            continue
+        raw = mm[:SIZE]
+        if struct.unpack_from("<Q", mm, SEQ_OFFSET)[0] == seq1:
+            break
+    else:
+        metrics.incr("poller.read_retry_exhausted")
+        return {}
+
+    magic, version, n, seq, _ = HEADER.unpack_from(raw, 0)
+    if magic != MAGIC or version != LAYOUT_VERSION or n != len(SEOUL_GUS) or seq == 0:
+        return {}
+    now = time.time()
+    today = dt.datetime.fromtimestamp(now, KST).date()
+    out = {}
+    for i, gu in enumerate(SEOUL_GUS):
+        nx, ny, t1h, reh, tmx, tmn, obs_ts, fcst_ts = RECORD.unpack_from(raw, HEADER.size + i * RECORD.size)
+        val = lambda v: None if math.isnan(v) else round(v, 1)
+        if not fcst_ts or dt.datetime.fromtimestamp(fcst_ts, KST).date() != today:
+            tmx = tmn = NAN
+        out[gu] = {
+            "nx": nx, "ny": ny, "T1H": val(t1h), "REH": val(reh), "TMX": val(tmx), "TMN": val(tmn),
+            "obs_age_s": now - obs_ts if obs_ts else None,
+            "fcst_age_s": now - fcst_ts if fcst_ts else None,
+        }
+    return out
+
+
+def explain_path(path: str = SNAPSHOT_FILE) -> str:
+    return path + ".explain.json"
+
+
+def district_inputs(rec: dict) -> tuple:
+    """스냅샷 한 구의 값 → 모델 입력 (TMX, TMN, REH). 예보가 없으면 실황 기온으로 대신한다 (tab2 와 같은 규칙)."""
+    tmx = rec["TMX"] if rec.get("TMX") is not None else rec.get("T1H")
+    tmn = rec["TMN"] if rec.get("TMN") is not None else rec.get("T1H")
+    return tmx, tmn, rec.get("REH")
+
+
+_explained = {}
+
+def read_explanations(path: str = SNAPSHOT_FILE) -> dict:
+    """{model_version, features, districts: {자치구: {inputs, pred, contribs}}} (없으면 {}). 파일이 바뀔 때만 다시 읽는다."""
+    p = explain_path(path)
+    try:
+        mtime = os.stat(p).st_mtime_ns
+    except OSError:
+        return {}
+    cached = _explained.get(p)
+    if cached is None or cached[0] != mtime:
+        try:
+            with open(p, encoding="utf-8") as f:
+                cached = _explained[p] = (mtime, json.load(f))
+        except (OSError, ValueError) as e:
+            metrics.record_error("poller.read_explanations", e)
+            return {}
+    return cached[1]
+
+
+def lookup_explanation(gu: str, tmx, tmn, reh, version: str, path: str = SNAPSHOT_FILE):
+    """폴러가 미리 계산한 (예측, {피처: 기여도}) — 모델 버전과 0.1 단위 입력이 같을 때만, 아니면 None."""
+    doc = read_explanations(path)
+    rec = doc.get("districts", {}).get(gu)
+    if not rec or doc.get("model_version") != version:
+        return None
+    if [round(float(v), 1) for v in (tmx, tmn, reh)] != rec["inputs"]:
+        return None
+    return rec["pred"], dict(zip(doc["features"], rec["contribs"]))
+
+
+# ---- 폴러 ----
+class Poller:
+    def __init__(self, api_key: str, path: str = SNAPSHOT_FILE, workers: int = 8):
+        self.api_key, self.path, self.workers = api_key, path, workers
+        self.cells = _cells()
+        self._now = [(NAN, NAN, 0.0)] * len(self.cells)    # (T1H, REH, 수신 시각)
+        self._fcst = [(NAN, NAN, 0.0)] * len(self.cells)   # (TMX, TMN, 수신 시각)
+        self._writer = SnapshotWriter(path)
+        self._stop = threading.Event()
+
+    def _map_cells(self, fn):
+        uniq = list(dict.fromkeys(self.cells))   # 같은 격자를 쓰는 구는 1회만 조회
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            got = dict(zip(uniq, pool.map(lambda c: fn(*c), uniq)))
+        return [got[c] for c in self.cells]
+
+    def refresh_nowcast(self) -> bool:
+        """반환: 기대한 최신 발표를 받았는지 (아니면 run 이 RETRY_EVERY 뒤 다시 시도)."""
+        expected = resolver.latest("ultra_ncst")
+        metrics.observe("poller.nowcast.cells", len(self.cells))
+        with metrics.span("poller.nowcast"):
+            results = self._map_cells(lambda nx, ny: fetch_ultra_now(nx, ny, self.api_key, priority="precompute"))
+        now = time.time()
+        got = 0
+        for i, r in enumerate(results):
+            if r.get("T1H") is not None or r.get("REH") is not None:   # 실패한 칸은 이전 값 유지
+                t1h = r["T1H"] if r.get("T1H") is not None else NAN
+                reh = r["REH"] if r.get("REH") is not None else NAN
+                self._now[i] = (t1h, reh, now)
+                got += 1
+        return got > 0 and resolver.latest("ultra_ncst") == expected
+
+    def refresh_forecast(self) -> bool:
+        """반환: 오늘 TMX/TMN 을 최신 발표로 받았는지. 최신 발표에 오늘이 없으면(23시 발표) 요청 없이 참."""
+        today = dt.datetime.now(KST).date()
+        bd, bt = get_base_datetime(today)
+        if not covers_day(bd, bt, today):
+            metrics.incr("kma.skipped_unpublished", product="vilage")
+            return True
+        metrics.observe("poller.forecast.cells", len(self.cells))
+        with metrics.span("poller.forecast"):
+            results = self._map_cells(
+                lambda nx, ny: fetch_today_tmx_tmn(nx, ny, self.api_key, bd, bt, priority="precompute"))
+        now = time.time()
+        got = 0
+        for i, r in enumerate(results):
+            if r.get("TMX") is not None:
+                self._fcst[i] = (r["TMX"], r["TMN"] if r.get("TMN") is not None else NAN, now)
+                got += 1
+        return got > 0 and get_base_datetime(today) == (bd, bt)
+
+    def publish(self):
+        self._writer.write([(nx, ny, t1h, reh, tmx, tmn, obs_ts, fcst_ts)
+                            for (nx, ny), (t1h, reh, obs_ts), (tmx, tmn, fcst_ts)
+                            in zip(self.cells, self._now, self._fcst)])
+        metrics.incr("poller.publish")
+
+    def publish_explanations(self):
+        """방금 쓴 스냅샷으로 25개 구 예측 + 기여도를 한 번에 계산해 옆 파일에 원자적으로 교체."""
+        snap = read_snapshot(self.path)
+        gus = [gu for gu in SEOUL_GUS if gu in snap and None not in district_inputs(snap[gu])]
+        if not gus:
+            return
+        tmx, tmn, reh = (np.round(np.array(a, dtype=float), 1) for a in zip(*(district_inputs(snap[gu]) for gu in gus)))
+        pred, input_df = predict_batch(tmx, tmn, reh, day=dt.datetime.now(KST).date(), key=REGION)
+        contribs = explain_batch(input_df)
+        doc = {
+            "model_version": model_version(),
+            "features": list(contribs.columns),
+            "updated": time.time(),
+            "districts": {gu: {"inputs": [float(tmx[i]), float(tmn[i]), float(reh[i])],
+                               "pred": float(pred[i]), "contribs": [round(float(v), 4) for v in contribs.iloc[i]]}
+                          for i, gu in enumerate(gus)},
+        }
+        tmp = explain_path(self.path) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(doc, f, ensure_ascii=False)
+        os.replace(tmp, explain_path(self.path))
+
+    def run(self, once: bool = False):
+        due = {"ultra_ncst": 0.0, "vilage": 0.0}
+        refresh = {"ultra_ncst": self.refresh_nowcast, "vilage": self.refresh_forecast}
+        while not self._stop.is_set():
+            t = time.time()
+            for product, fn in refresh.items():
+                if t < due[product]:
+                    continue
+                try:
+                    fresh = fn()
+                except Exception as e:
+                    metrics.record_error("poller.run", e)
+                    fresh = False
+                # 다음 발표가 제공되는 직후로 예약, 이번 발표를 아직 못 받았으면 그 전에 재시도.
+                # 예보는 자정에도 한 번 (전날 23시 발표에서 새 날짜의 TMX/TMN 을 받는다)
+                due[product] = next_release(product).timestamp()
+                if product == "vilage":
+                    due[product] = min(due[product], next_midnight().timestamp())
+                if not fresh:
+                    due[product] = min(due[product], time.time() + RETRY_EVERY)
+            try:
+                self.publish()
+                self.publish_explanations()
+            except Exception as e:
+                metrics.record_error("poller.run", e)
+            if once:
+                return
+            self._stop.wait(max(1.0, min(due.values()) - time.time()))
+
+    def stop(self):
+        self._stop.set()
+
+
+# ---- 호스트당 1개 ----
+_state = {"poller": None, "lock": None, "tried": 0.0}
+_state_lock = threading.Lock()
+
+def ensure_started(api_key: str, path: str = SNAPSHOT_FILE, retry_every: float = 60.0) -> bool:
+    """이 프로세스가 호스트의 폴러 자리를 얻으면 데몬 스레드로 시작. 반환: 이 프로세스가 폴러인지.
+
+    다른 프로세스가 이미 돌리고 있으면 retry_every 초마다 한 번씩만 자리를 다시 확인한다
+    (그 프로세스가 죽으면 flock 이 풀려 다음 확인 때 넘겨받음).
+    """
+    with _state_lock:
+        if _state["poller"] is not None:
+            return True
+        now = time.monotonic()
+        if _state["tried"] and now - _state["tried"] < retry_every:
+            return False
+        _state["tried"] = now
+
+        if fcntl is not None:
+            lock = open(path + ".lock", "a+")
+            try:
+                fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                return False
+            _state["lock"] = lock   # 프로세스가 살아 있는 동안 보유
+
+        poller = Poller(api_key, path)
+        threading.Thread(target=poller.run, name="heatai-poller", daemon=True).start()
+        _state["poller"] = poller
+        metrics.incr("poller.started")
+        return True
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="HeatAI 자치구 실황/예보 폴러 (단독 실행)")
+    ap.add_argument("--once", action="store_true", help="한 번 갱신 후 종료")
+    ap.add_argument("--out", default=SNAPSHOT_FILE)
+    args = ap.parse_args(argv)
+
+    api_key = os.environ.get("KMA_API_KEY")
+    if not api_key:
+        print("❌ KMA_API_KEY 환경변수가 필요합니다.")
+        return 1
+    if fcntl is not None:
+        lock = open(args.out + ".lock", "a+")
+        try:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            print("⚠️ 이미 다른 폴러가 실행 중입니다.")
+            return 0
+    Poller(api_key, args.out).run(once=args.once)
+    snap = read_snapshot(args.out)
+    ok = sum(1 for v in snap.values() if v["T1H"] is not None)
+    print(f"✅ 스냅샷 갱신: {ok}/{len(SEOUL_GUS)}개 구 실황 → {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import datetime as dt
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# ----------------------- data.go.kr 키별 요청 속도 / 일일 할당량 -----------------------
+# SQLite 파일 하나를 같은 호스트의 모든 프로세스(Streamlit 세션, 백필, 배치)가 공유한다.
+# - 토큰 버킷: 키별 초당 요청 수(rate)와 순간 허용량(burst)
+# - 일일 예산: KST 자정 기준으로 초기화, 우선순위별로 남겨 둘 몫(reserve)을 둔다
+#   realtime 은 예산 끝까지, precompute 는 10%, backfill 은 30% 가 남으면 멈춘다.
+KST = dt.timezone(dt.timedelta(hours=9))
+
+PRIORITIES = {"realtime": 0.0, "precompute": 0.10, "backfill": 0.30}
+
+DEFAULT_RATE = float(os.environ.get("HEATAI_API_RATE", "10"))          # 초당
+DEFAULT_BURST = float(os.environ.get("HEATAI_API_BURST", "20"))
+DEFAULT_DAILY = int(os.environ.get("HEATAI_API_DAILY_QUOTA", "10000"))  # data.go.kr 개발계정 기본
+
+
+class RateLimited(RuntimeError):
+    """예산·속도 제한으로 요청을 보내지 않았음."""
+
+
+def key_id(api_key: str) -> str:
+    # 키 원문은 저장하지 않는다
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _today() -> str:
+    return dt.datetime.now(KST).strftime("%Y%m%d")
+
+
+class RateLimiter:
+    def __init__(self, path: str = None, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                 daily_quota: int = DEFAULT_DAILY):
+        self.path = path or os.environ.get("HEATAI_RATE_DB", ".heatai_quota.sqlite3")
+        self.rate, self.burst, self.daily_quota = rate, burst, daily_quota
+        self._local = threading.local()
+        with self._conn() as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    key TEXT PRIMARY KEY, tokens REAL, updated REAL,
+                    day TEXT, used INTEGER, quota INTEGER, exhausted INTEGER DEFAULT 0
+                )""")
+
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            con.execute("PRAGMA journal_mode=WAL")
+            self._local.con = con
+        return con
+
+    def _row(self, con, key: str, now: float):
+        row = con.execute("SELECT tokens, updated, day, used, quota, exhausted FROM buckets WHERE key=?",
+                          (key,)).fetchone()
+        today = _today()
+        if row is None:
+            row = (self.burst, now, today, 0, self.daily_quota, 0)
+            con.execute("INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?, ?)", (key,) + row)
+        tokens, updated, day, used, _, exhausted = row
+        if day != today:
+            used, exhausted, day = 0, 0, today
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        # 할당량은 저장값이 아니라 현재 설정(HEATAI_API_DAILY_QUOTA)을 따른다 (열은 쓰기 때 함께 갱신)
+        return tokens, day, used, self.daily_quota, exhausted
+
+    def try_acquire(self, api_key: str, priority: str = "realtime") -> float:
+        """토큰 1개를 가져오면 0, 속도 제한이면 기다릴 초를 반환. 예산 부족이면 RateLimited."""
+        key, reserve = key_id(api_key), PRIORITIES[priority]
+        con = self._conn()
+        now = time.time()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, day, used, quota, exhausted = self._row(con, key, now)
+            if exhausted or used >= quota * (1 - reserve):
+                con.execute("UPDATE buckets SET tokens=?, updated=?, day=?, used=?, quota=?, exhausted=? WHERE key=?",
+                            (tokens, now, day, used, quota, exhausted, key))
+                con.execute("COMMIT")
+                raise RateLimited(f"{priority}: 일일 예산 소진 ({used}/{quota}, 예비 {reserve:.0%})")
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+                used += 1
+            else:
+                wait = (1 - tokens) / self.rate
+            con.execute("UPDATE buckets SET tokens=?, updated=?, day=?, used=?, quota=?, exhausted=0 WHERE key=?",
+                        (tokens, now, day, used, quota, key))
+            con.execute("COMMIT")
+            return wait
+        except RateLimited:
+            raise
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def acquire(self, api_key: str, priority: str = "realtime", timeout: float = 5.0):
+        """토큰을 얻을 때까지 기다린다. 실시간은 짧게, 백필은 길게 기다리는 식으로 timeout 을 준다."""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(api_key, priority)
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimited(f"{priority}: 속도 제한 대기 시간 초과")
+            time.sleep(wait)
+
+    def mark_exhausted(self, api_key: str):
+        """업스트림이 할당량 초과(resultCode 22)를 돌려주면 그날 남은 요청을 막는다."""
+        key, now = key_id(api_key), time.time()
+        con = self._conn()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            tokens, day, used, quota, _ = self._row(con, key, now)   # 날짜가 바뀌었으면 used 도 0 으로
+            con.execute("UPDATE buckets SET tokens=?, updated=?, day=?, used=?, quota=?, exhausted=1 WHERE key=?",
+                        (tokens, now, day, used, quota, key))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def remaining(self, api_key: str) -> dict:
+        con = self._conn()
+        con.execute("BEGIN IMMEDIATE")
+        tokens, day, used, quota, exhausted = self._row(con, key_id(api_key), time.time())
+        con.execute("COMMIT")
+        left = 0 if exhausted else max(quota - used, 0)
+        return {
+            "day": day, "used": used, "quota": quota, "remaining": left, "tokens": round(tokens, 2),
+            "by_priority": {p: max(int(quota * (1 - r)) - used, 0) if not exhausted else 0
+                            for p, r in PRIORITIES.items()},
+        }
+
+
+_default = None
+_default_lock = threading.Lock()
+
+def default_limiter() -> RateLimiter:
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = RateLimiter()
+        return _default
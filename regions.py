@@ -0,0 +1,34 @@
+# ----------------------- 지역 / 관측소 / 자치구 상수 -----------------------
+# 외부 의존성이 없는 모듈: schema·policies 와 학습 서브프로세스(train_model.py)가
+# utils(streamlit, 요청 합치기, 스레드 풀)를 불러오지 않고도 같은 상수를 쓰도록 여기 둔다.
+region_to_stn_id = {
+    "서울특별시": 108, "부산광역시": 159, "대구광역시": 143, "인천광역시": 112,
+    "광주광역시": 156, "대전광역시": 133, "울산광역시": 152, "세종특별자치시": 131,
+    "경기도": 119, "강원도": 101, "충청북도": 131, "충청남도": 133,
+    "전라북도": 146, "전라남도": 165, "경상북도": 137, "경상남도": 155, "제주특별자치도": 184
+}
+
+region_to_latlon = {
+    "서울특별시": (37.5665, 126.9780), "부산광역시": (35.1796, 129.0756), "대구광역시": (35.8722, 128.6025),
+    "인천광역시": (37.4563, 126.7052), "광주광역시": (35.1595, 126.8526), "대전광역시": (36.3504, 127.3845),
+    "울산광역시": (35.5384, 129.3114), "세종특별자치시": (36.4800, 127.2890), "경기도": (37.4138, 127.5183),
+    "강원도": (37.8228, 128.1555), "충청북도": (36.6358, 127.4917), "충청남도": (36.5184, 126.8000),
+    "전라북도": (35.7167, 127.1442), "전라남도": (34.8161, 126.4630), "경상북도": (36.5760, 128.5056),
+    "경상남도": (35.4606, 128.2132), "제주특별자치도": (33.4996, 126.5312)
+}
+
+SEOUL_GUS = [
+    '종로구', '중구', '용산구', '성동구', '광진구', '동대문구', '중랑구', '성북구', '강북구', '도봉구',
+    '노원구', '은평구', '서대문구', '마포구', '양천구', '강서구', '구로구', '금천구', '영등포구',
+    '동작구', '관악구', '서초구', '강남구', '송파구', '강동구'
+]
+
+SEOUL_GU_CENTERS = {
+    '종로구': (37.5731,126.9793), '중구': (37.5636,126.9976), '용산구': (37.5323,126.9907), '성동구': (37.5634,127.0368),
+    '광진구': (37.5384,127.0823), '동대문구': (37.5744,127.0396), '중랑구': (37.6063,127.0927), '성북구': (37.5894,127.0167),
+    '강북구': (37.6396,127.0259), '도봉구': (37.6688,127.0471), '노원구': (37.6542,127.0568), '은평구': (37.6176,126.9227),
+    '서대문구': (37.5792,126.9368), '마포구': (37.5663,126.9018), '양천구': (37.5169,126.8665), '강서구': (37.5509,126.8495),
+    '구로구': (37.4954,126.8879), '금천구': (37.4568,126.8956), '영등포구': (37.5264,126.8963), '동작구': (37.5126,126.9393),
+    '관악구': (37.4784,126.9516), '서초구': (37.4836,127.0327), '강남구': (37.5172,127.0473), '송파구': (37.5145,127.1059),
+    '강동구': (37.5301,127.1238)
+}
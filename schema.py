@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+
+from regions import SEOUL_GUS, region_to_stn_id
+
+# ----------------------- 데이터셋 표준 스키마 -----------------------
+# 학습(train_model.py)과 앱(app.py)이 같은 열 이름·dtype 으로 데이터를 읽도록 한 곳에서 정의한다.
+REGIONS = list(region_to_stn_id)
+
+DATE_COL = "일자"
+CATEGORY_COLS = {"지역": REGIONS, "자치구": SEOUL_GUS}
+FLOAT_COLS = [
+    "최고체감온도(°C)", "최고기온(°C)", "평균기온(°C)", "최저기온(°C)", "평균상대습도(%)", "풍속(m/s)",
+    # 자치구 정적 지표 (seoul_static_data.csv)
+    "고령자비율", "야외근로자비율", "열쾌적취약인구비율", "열섬지수", "녹지율", "냉방보급률",
+]
+INT_COLS = {"환자수": np.int16, "연도": np.int16, "월": np.int8,
+            "전체인구": np.int32, "고령자수": np.int32, "총종사자수": np.int32, "임시일용근로자수": np.int32}
+_NULLABLE = {np.int8: "Int8", np.int16: "Int16", np.int32: "Int32"}
+
+FEATURES = ["최고체감온도(°C)", "최고기온(°C)", "평균기온(°C)", "최저기온(°C)", "평균상대습도(%)"]
+TARGET = "환자수"
+REQUIRED = [DATE_COL, "지역"] + FEATURES + [TARGET]
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def clean_columns(df: pd.DataFrame) -> pd.DataFrame:
+    df.columns = df.columns.str.strip().str.replace("\n", "").str.replace(" ", "")
+    return df
+
+
+def read_csv_any(path, encodings=("utf-8-sig", "cp949", "euc-kr")) -> pd.DataFrame:
+    for enc in encodings:
+        try:
+            return pd.read_csv(path, encoding=enc)
+        except UnicodeDecodeError:
+            continue
+    raise SchemaError(f"인코딩 실패: {path}")
+
+
+def detect_encoding(path, encodings=("utf-8-sig", "cp949", "euc-kr"), probe_bytes: int = 1 << 20) -> str:
+    """앞부분 probe_bytes 만 디코딩해 보고 인코딩을 고른다 (청크 읽기용, 파일 전체를 읽지 않음)."""
+    import codecs
+
+    with open(path, "rb") as f:
+        head = f.read(probe_bytes)
+    for enc in encodings:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(head, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    raise SchemaError(f"인코딩 실패: {path}")
+
+
+def _to_category(s: pd.Series, known) -> pd.Categorical:
+    s = s.astype("string").str.strip()
+    extra = sorted(set(s.dropna().unique()) - set(known))
+    return pd.Categorical(s, categories=list(known) + extra)
+
+
+def coerce(df: pd.DataFrame, required=(), strict: bool = True) -> pd.DataFrame:
+    """열 이름 정제 + 표준 dtype 변환을 한 번에 수행한다.
+
+    일자 → datetime64, 지역/자치구 → category, 측정값 → float32, 건수 → int16 등.
+    required 의 결측 행은 제거하며, strict 이면 없는 열·해석 불가 값이 있을 때 SchemaError.
+    """
+    df = clean_columns(df.copy())
+    missing = [c for c in required if c not in df.columns]
+    if missing:
+        raise SchemaError(f"필수 열 누락: {missing}")
+
+    out = {}
+    problems = []
+    for col in df.columns:
+        s = df[col]
+        if col == DATE_COL:
+            v = s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s, errors="coerce")
+            v = v.dt.normalize()
+        elif col in CATEGORY_COLS:
+            v = _to_category(s, CATEGORY_COLS[col])
+        elif col in FLOAT_COLS or col in INT_COLS:
+            v = pd.to_numeric(s, errors="coerce")
+        else:
+            out[col] = s
+            continue
+        bad = int((pd.isna(v) & s.notna()).sum())
+        if bad:
+            problems.append(f"{col}: 해석 불가 값 {bad}개")
+        out[col] = v
+
+    df = pd.DataFrame(out, index=df.index)
+    if strict and problems:
+        raise SchemaError("; ".join(problems))
+    if required:
+        df = df.dropna(subset=list(required))
+
+    for col in df.columns:
+        if col in FLOAT_COLS:
+            df[col] = df[col].astype(np.float32)
+        elif col in INT_COLS:
+            if df[col].isna().any():
+                df[col] = df[col].round().astype(_NULLABLE[INT_COLS[col]])
+            else:
+                df[col] = df[col].round().astype(INT_COLS[col])
+    return df.reset_index(drop=True)
+
+
+# ----------------------- 원본별 로더 -----------------------
+def normalize_static(df: pd.DataFrame) -> pd.DataFrame:
+    """ML_static_dataset 원본 열(일시/광역자치단체) → 표준 열(일자/지역)."""
+    df = clean_columns(df.copy())
+    if "일시" in df.columns:
+        if pd.api.types.is_numeric_dtype(df["일시"]):
+            df["일자"] = pd.to_datetime("1899-12-30") + pd.to_timedelta(df["일시"], unit="D")
+        else:
+            df["일자"] = pd.to_datetime(df["일시"], errors="coerce")
+    for col in ["광역자치단체", "지역", "시도"]:
+        if col in df.columns:
+            df["지역"] = df[col]
+            break
+    return df.drop(columns=[c for c in ["일시", "광역자치단체", "시도"] if c in df.columns])
+
+
+def load_static(path: str, strict: bool = True) -> pd.DataFrame:
+    return coerce(normalize_static(read_csv_any(path, ("cp949", "utf-8-sig"))), strict=strict)
+
+
+def load_dynamic(path: str, strict: bool = True) -> pd.DataFrame:
+    return coerce(read_csv_any(path), strict=strict)
+
+
+def iter_chunks(path: str, static: bool = False, chunksize: int = 200_000, required=REQUIRED):
+    """CSV 를 chunksize 행씩 읽어 표준 스키마로 변환한 프레임을 차례로 돌려준다 (required 결측 행 제외)."""
+    encodings = ("cp949", "utf-8-sig") if static else ("utf-8-sig", "cp949", "euc-kr")
+    for chunk in pd.read_csv(path, encoding=detect_encoding(path, encodings), chunksize=chunksize):
+        if static:
+            chunk = normalize_static(chunk)
+        chunk = coerce(chunk, strict=False)
+        missing = [c for c in required if c not in chunk.columns]
+        if missing:
+            raise SchemaError(f"필수 열 누락: {missing}")
+        yield chunk.dropna(subset=list(required))
+
+
+def load_seoul_static(path: str) -> pd.DataFrame:
+    return coerce(read_csv_any(path), strict=False)
+
+
+def combine(*frames: pd.DataFrame) -> pd.DataFrame:
+    """표준화된 프레임 결합. 범주형 카테고리를 합치고 한쪽에만 있는 열도 dtype 을 유지한다."""
+    frames = [f for f in frames if f is not None and not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    columns = list(dict.fromkeys(c for f in frames for c in f.columns))
+    cats = {}
+    for col, known in CATEGORY_COLS.items():
+        cats[col] = list(known)
+        for f in frames:
+            if col in f.columns:
+                cats[col] += [c for c in f[col].cat.categories if c not in cats[col]]
+
+    aligned = []
+    for f in frames:
+        f = f.copy()
+        for col in columns:
+            if col in cats:
+                if col in f.columns:
+                    f[col] = f[col].cat.set_categories(cats[col])
+                else:
+                    f[col] = pd.Categorical([None] * len(f), categories=cats[col])
+            elif col not in f.columns:
+                if col in FLOAT_COLS:
+                    f[col] = np.full(len(f), np.nan, dtype=np.float32)
+                elif col in INT_COLS:
+                    f[col] = pd.array([pd.NA] * len(f), dtype=_NULLABLE[INT_COLS[col]])
+        aligned.append(f[columns])
+    return pd.concat(aligned, ignore_index=True)
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from feature_store import heatwave_multiplier
+
+# ----------------------- 피해점수 / 등급 / 보상금 (배열 연산) -----------------------
+# tab3 와 백테스트가 같은 산식을 쓰도록 한 곳에 모아 둔다. 입력은 스칼라·배열·Series 모두 가능.
+GRADE_BINS = [30, 40, 50]
+GRADE_LABELS = ["낮음", "보통", "높음", "매우 높음"]
+PAYOUTS = [0, 5000, 10000, 20000]
+N_GU = 25
+
+
+def social_index(df: pd.DataFrame) -> pd.Series:
+    """사회적 지표 S = 0.5·고령자비율 + 0.3·야외근로자비율 + 0.2·열쾌적취약인구비율"""
+    return 0.5 * df["고령자비율"] + 0.3 * df["야외근로자비율"] + 0.2 * df["열쾌적취약인구비율"]
+
+
+def standardize(x):
+    """min-max 표준화 (값이 모두 같으면 0)."""
+    x = pd.Series(x, dtype=float) if not isinstance(x, pd.Series) else x
+    lo, hi = x.min(), x.max()
+    return (x - lo) / (hi - lo if hi != lo else 1)
+
+
+def environment_index(df: pd.DataFrame) -> pd.Series:
+    """환경적 지표 E = 0.5·열섬지수 + 0.3·(1-녹지율) + 0.2·(1-냉방보급률) (각각 표준화)"""
+    return (
+        0.5 * standardize(df["열섬지수"])
+        + 0.3 * (1 - standardize(df["녹지율"]))
+        + 0.2 * (1 - standardize(df["냉방보급률"]))
+    )
+
+
+def distribute_pred(s, total_pred):
+    """서울시 예측 환자 수를 S 비율로 자치구에 배분 → (P_pred_raw, P_pred).
+
+    total_pred 가 일자별 배열이면 (일자 수, 자치구 수) 행렬로 한 번에 계산한다.
+    음수 예측은 환자 0명으로 본다 (sqrt 가 NaN 이 되지 않도록).
+    """
+    s = np.asarray(s, dtype=float)
+    total = np.clip(np.asarray(total_pred, dtype=float), 0, None)
+    raw = total[..., None] * (s / s.sum()) if total.ndim else total * (s / s.sum())
+    return raw, np.sqrt(raw / N_GU)
+
+
+def damage_prescore(s, e, p_pred):
+    return 100 * (0.25 * s + 0.25 * e + 0.5 * p_pred)
+
+
+def damage_final(s, e, p_pred, p_real):
+    return 100 * (0.2 * s + 0.2 * e + 0.5 * p_pred + 0.1 * p_real)
+
+
+def grade_index(score) -> np.ndarray:
+    """점수 → 등급 인덱스 (0: 낮음 … 3: 매우 높음). NaN 은 0점(낮음)으로 본다 (policies 와 같은 처리)."""
+    score = np.nan_to_num(np.asarray(score, dtype=float), nan=0.0)
+    return np.searchsorted(GRADE_BINS, score, side="right")
+
+
+def score_to_grade(score):
+    return np.asarray(GRADE_LABELS, dtype=object)[grade_index(score)]
+
+
+def calc_payout(score):
+    return np.asarray(PAYOUTS)[grade_index(score)]
+
+
+def damage_table(merged: pd.DataFrame, seoul_pred: float, lag: pd.DataFrame) -> pd.DataFrame:
+    """자치구 정적 지표 + 당일 관측(환자수) 테이블에 S, E, P_pred, H, 피해점수(사전/사후), 위험등급, 보상금을 붙인 사본.
+
+    lag: 자치구별 연속폭염일수·연속극한폭염일수 (FeatureStore.frame(일자)).
+    """
+    out = merged.copy()
+    out["S"] = social_index(out)
+    out["E"] = environment_index(out)
+    out["P_pred_raw"], out["P_pred"] = distribute_pred(out["S"], seoul_pred)
+
+    p_real = (out["환자수"].fillna(0) >= 1).astype(float)
+    out["피해점수_사전"] = damage_prescore(out["S"], out["E"], out["P_pred"])
+    out["피해점수"] = damage_final(out["S"], out["E"], out["P_pred"], p_real)
+
+    # 폭염 지속성 가중치 계산 및 반영
+    lag = lag.set_index("자치구")
+    gu_keys = out["자치구"].astype(str)
+    out["H"] = heatwave_multiplier(
+        gu_keys.map(lag["연속폭염일수"]).fillna(0).to_numpy(),
+        gu_keys.map(lag["연속극한폭염일수"]).fillna(0).to_numpy(),
+    )
+    out["피해점수_사전"] *= out["H"]
+    out["피해점수"] *= out["H"]
+
+    out["위험등급"] = score_to_grade(out["피해점수"])
+    out["보상금"] = calc_payout(out["피해점수"])
+    return out
@@ -0,0 +1,157 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows 등: 프로세스 간 합치기 없이 프로세스 내부만 동작
+    fcntl = None
+
+
+# ----------------------- 파일 잠금 -----------------------
+@contextlib.contextmanager
+def file_lock(lock_path: str):
+    """lock_path 에 flock 을 잡은 동안만 실행 (같은 호스트의 프로세스 간 read-modify-write 보호)."""
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path, "a") as lf:
+        fcntl.flock(lf, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lf, fcntl.LOCK_UN)
+
+
+# ----------------------- 진행 중 호출 -----------------------
+class _Call:
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# ----------------------- 요청 합치기 -----------------------
+class SingleFlight:
+    """같은 키로 동시에 들어온 호출을 하나의 실행으로 합친다.
+
+    lock_dir 를 주면 키별 lock 파일(flock)과 짧은 TTL 결과 파일로
+    같은 호스트의 다른 프로세스와도 결과를 공유한다 (결과는 JSON 직렬화 가능해야 함).
+    share(result) 가 참인 결과만 파일로 공유하며(기본: 전부), result_ttl 이 지난 파일은 주기적으로 지운다.
+    """
+
+    def __init__(self, lock_dir: str = None, result_ttl: float = 30.0, share=None):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.result_ttl = result_ttl
+        self.share = share or (lambda result: True)
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._last_sweep = 0.0
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run(key, fn)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    # ---- 프로세스 간 ----
+    def _open_locked(self, lock_path: str):
+        """lock 파일을 열어 잠근다. 잠그는 사이 청소로 파일이 지워졌으면(다른 inode) 새로 연다."""
+        while True:
+            lf = open(lock_path, "a")
+            fcntl.flock(lf, fcntl.LOCK_EX)
+            try:
+                if os.fstat(lf.fileno()).st_ino == os.stat(lock_path).st_ino:
+                    return lf
+            except OSError:
+                pass
+            lf.close()
+
+    def sweep(self, now: float = None):
+        """result_ttl 이 지난 결과 파일과, 아무도 잡고 있지 않은 lock 파일을 지운다."""
+        now = time.time() if now is None else now
+        try:
+            names = os.listdir(self.lock_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.lock_dir, name)
+            try:
+                if now - os.path.getmtime(path) <= self.result_ttl:
+                    continue
+                if not name.endswith(".lock"):
+                    os.remove(path)
+                    continue
+                with open(path, "a") as lf:
+                    fcntl.flock(lf, fcntl.LOCK_EX | fcntl.LOCK_NB)   # 사용 중이면 OSError → 건너뜀
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def _run(self, key, fn):
+        if not self.lock_dir:
+            return fn()
+
+        now = time.time()
+        if now - self._last_sweep > self.result_ttl:
+            self._last_sweep = now
+            self.sweep(now)
+
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        lock_path = os.path.join(self.lock_dir, digest + ".lock")
+        result_path = os.path.join(self.lock_dir, digest + ".json")
+
+        with self._open_locked(lock_path) as lf:
+            os.utime(lock_path)   # 사용 시각 갱신 (청소 기준)
+            try:
+                # 다른 프로세스가 방금 가져온 결과가 있으면 재사용
+                try:
+                    if time.time() - os.path.getmtime(result_path) <= self.result_ttl:
+                        with open(result_path, "r", encoding="utf-8") as f:
+                            return json.load(f)
+                except (OSError, ValueError):
+                    pass
+
+                result = fn()
+                if not self.share(result):
+                    return result
+                try:
+                    tmp = f"{result_path}.{os.getpid()}.tmp"
+                    with open(tmp, "w", encoding="utf-8") as f:
+                        json.dump(result, f, ensure_ascii=False)
+                    os.replace(tmp, result_path)
+                except (OSError, TypeError, ValueError):
+                    pass
+                return result
+            finally:
+                fcntl.flock(lf, fcntl.LOCK_UN)
@@ -0,0 +1,171 @@
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+# ----------------------- 업스트림 장애 차단 (circuit breaker) -----------------------
+# 연속 실패가 threshold 번 쌓이면 cooldown 초 동안 호출 자체를 막는다(open).
+# cooldown 이 지나면 한 번만 시험 호출을 허용(half-open)하고, 성공하면 다시 닫는다.
+
+
+class CircuitOpen(RuntimeError):
+    """차단기가 열려 있어 업스트림을 호출하지 않았음."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, threshold: int = 3, cooldown: float = 60.0):
+        self.name, self.threshold, self.cooldown = name, threshold, cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown or self._probing:
+                return False
+            self._probing = True  # half-open: 시험 호출 1회
+            return True
+
+    def success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                metrics.incr("breaker.close", endpoint=self.name)
+            self._failures, self._opened_at, self._probing = 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and self._failures >= self.threshold):
+                metrics.incr("breaker.open", endpoint=self.name)
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def call(self, fn, *args, **kwargs):
+        if not self.allow():
+            metrics.incr("breaker.rejected", endpoint=self.name)
+            raise CircuitOpen(f"{self.name}: 업스트림 차단 중 (cooldown {self.cooldown:.0f}s)")
+        try:
+            out = fn(*args, **kwargs)
+        except Exception:
+            self.failure()
+            raise
+        self.success()
+        return out
+
+
+# ----------------------- stale-while-revalidate -----------------------
+# 마지막으로 받은 "좋은" 값을 키별로 보관한다.
+# - fresh_ttl 이내: 그대로 반환
+# - fresh_ttl ~ max_stale: 보관 값을 즉시 반환하고 백그라운드에서 갱신
+# - 보관 값이 없거나 max_stale 초과: 동기 호출 (실패하면 그 결과를 그대로 반환)
+# max_stale 이 지난 값은 다시 쓸 일이 없으므로 새 값을 저장할 때(fresh_ttl 에 한 번) 지운다.
+_refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix="swr")
+
+
+class StaleCache:
+    def __init__(self, name: str, fresh_ttl: float, max_stale: float, is_good=bool):
+        self.name, self.fresh_ttl, self.max_stale, self.is_good = name, fresh_ttl, max_stale, is_good
+        self._lock = threading.Lock()
+        self._entries = {}     # key → (fetched_at, value)
+        self._refreshing = set()
+        self._last_sweep = 0.0
+
+    def _store(self, key, value):
+        if self.is_good(value):
+            now = time.time()
+            with self._lock:
+                self._entries[key] = (now, value)
+                if now - self._last_sweep >= self.fresh_ttl:
+                    self._last_sweep = now
+                    for k in [k for k, (t, _) in self._entries.items() if now - t >= self.max_stale]:
+                        del self._entries[k]
+        return value
+
+    def _refresh(self, key, fn):
+        try:
+            self._store(key, fn())
+        except Exception as e:
+            metrics.record_error(f"swr.{self.name}", e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key, fn):
+        """(값, 경과 초) 반환. 경과 초는 보관 값을 줬을 때만 의미가 있고, 방금 받은 값이면 0."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < self.fresh_ttl:
+                metrics.incr("swr", cache=self.name, result="fresh")
+                return entry[1], age
+            if age < self.max_stale:
+                with self._lock:
+                    schedule = key not in self._refreshing
+                    self._refreshing.add(key)
+                if schedule:
+                    _refresher.submit(self._refresh, key, fn)
+                metrics.incr("swr", cache=self.name, result="stale")
+                return entry[1], age
+
+        metrics.incr("swr", cache=self.name, result="miss")
+        value = fn()
+        self._store(key, value)
+        return value, 0.0
+
+    def age(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else time.time() - entry[0]
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def stale_while_revalidate(name: str, fresh_ttl: float, max_stale: float = 6 * 3600,
+                           is_good=bool, key=None):
+    """함수 결과를 이름별 StaleCache 로 감싼다. 같은 이름은 모듈 전역에서 캐시를 공유하므로
+    Streamlit 재실행마다 새로 정의되는 지역 함수에도 쓸 수 있다.
+
+    key(*args) 로 캐시 키를 바꿀 수 있고(기본: 인자 전체), 감싼 함수의 .age(*args) 는
+    마지막으로 돌려준 값이 받아진 지 몇 초 지났는지 알려준다.
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = StaleCache(name, fresh_ttl, max_stale, is_good)
+
+    def deco(fn):
+        key_fn = key or (lambda *args, **kwargs: (args, tuple(sorted(kwargs.items()))))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            value, _ = cache.get(key_fn(*args, **kwargs), functools.partial(fn, *args, **kwargs))
+            return value
+
+        wrapper.age = lambda *args, **kwargs: cache.age(key_fn(*args, **kwargs))
+        wrapper.cache = cache
+        return wrapper
+    return deco
+
+
+def describe_age(seconds) -> str:
+    """경과 초 → '방금', '3분 전', '2시간 전'."""
+    if seconds is None or seconds < 60:
+        return "방금"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}분 전"
+    return f"{int(seconds // 3600)}시간 전"
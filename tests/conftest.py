@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 최상위 모듈(flat layout)을 tests/ 에서 import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,32 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from api_server import make_server
+
+
+@pytest.fixture
+def server():
+    srv = make_server(port=0, kma_key="k", asos_key="k")
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def _post(server, body: bytes):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    conn.request("POST", "/v1/risk/batch", body=body, headers={"Content-Type": "application/json"})
+    r = conn.getresponse()
+    out = r.status, json.loads(r.read())
+    conn.close()
+    return out
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b'"items"', b"{not json", b'{"items": [1]}', b'{"items": []}'])
+def test_batch_rejects_malformed_body_with_400(server, body):
+    status, payload = _post(server, body)
+    assert status == 400
+    assert payload["error"]
@@ -0,0 +1,26 @@
+import datetime as dt
+
+import utils
+from utils import KST, MISSING_TTL_S, BaseTimeResolver
+
+
+def test_missing_slot_is_probed_again_after_ttl():
+    resolver = BaseTimeResolver()
+    now = dt.datetime(2025, 8, 1, 12, 0, tzinfo=KST)
+    slot = resolver.latest("ultra_ncst", now)
+    assert slot == dt.datetime(2025, 8, 1, 11, 0)
+
+    resolver.mark_missing("ultra_ncst", slot)
+    assert resolver.latest("ultra_ncst", now) == dt.datetime(2025, 8, 1, 10, 0)
+
+    resolver._missing[("ultra_ncst", slot)] -= MISSING_TTL_S + 1   # TTL 경과
+    assert resolver.latest("ultra_ncst", now) == slot
+
+
+def test_past_dates_outside_retention_have_no_slot(monkeypatch):
+    today = dt.datetime.now(KST).date()
+    assert utils.get_base_datetime(today)[0] is not None
+    assert utils.get_base_datetime(today - dt.timedelta(days=3)) == (None, None)
+
+    monkeypatch.setattr(utils, "kma_request", lambda *a, **kw: (_ for _ in ()).throw(AssertionError("요청함")))
+    assert utils.fetch_fcst_summary(60, 127, today - dt.timedelta(days=3), "key") == ({}, None, None)
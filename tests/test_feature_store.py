@@ -0,0 +1,114 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import feature_store
+from feature_store import HI_COL, LAG_FEATURES, FeatureStore
+
+
+def _history(days: int = 40, keys=("종로구", "중구", "용산구"), seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-07-01", periods=days, freq="D")
+    df = pd.DataFrame([(d.strftime("%Y-%m-%d"), k, round(float(rng.uniform(28, 38)), 1))
+                       for d in dates for k in keys], columns=["일자", "자치구", HI_COL])
+    return df.drop(index=rng.choice(len(df), size=len(df) // 10, replace=False))   # 결측일 섞기
+
+
+def _sorted(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.sort_values(["일자", "자치구"]).reset_index(drop=True)
+
+
+def test_incremental_update_matches_rebuild():
+    df = _history()
+    store = FeatureStore.from_frame(df[df["일자"] < "2025-07-15"])
+    for day, part in df[df["일자"] >= "2025-07-15"].groupby("일자"):
+        for key, hi in part[["자치구", HI_COL]].itertuples(index=False):
+            store.update(pd.Timestamp(day).date(), key, hi)
+
+    pd.testing.assert_frame_equal(_sorted(store.frame()), _sorted(FeatureStore.from_frame(df).frame()))
+
+
+def test_save_load_restores_state(tmp_path):
+    df = _history()
+    head, tail = df[df["일자"] < "2025-08-01"], df[df["일자"] >= "2025-08-01"]
+    FeatureStore.from_frame(head).save(str(tmp_path / "store.csv"))
+
+    store = FeatureStore.load(str(tmp_path / "store.csv"))
+    assert store.advance(tail) == len(tail)
+    assert store.advance(tail) == 0   # 같은 날짜는 다시 반영하지 않음
+    pd.testing.assert_frame_equal(_sorted(store.frame()), _sorted(FeatureStore.from_frame(df).frame()))
+
+
+def test_update_after_load_continues_streak(tmp_path):
+    df = pd.DataFrame({"일자": ["2025-08-01", "2025-08-02"], "자치구": ["A", "A"], HI_COL: [30.0, 33.5]})
+    FeatureStore.from_frame(df).save(str(tmp_path / "store.csv"))
+
+    feats = FeatureStore.load(str(tmp_path / "store.csv")).update(datetime.date(2025, 8, 3), "A", 35.0)
+    assert feats["전일체감온도(°C)"] == 33.5
+    assert feats["연속폭염일수"] == 2
+    assert feats["체감온도3일평균(°C)"] == pytest.approx((30.0 + 33.5 + 35.0) / 3)
+
+
+def test_features_for_previews_without_storing():
+    df = _history(days=10)
+    store = FeatureStore.from_frame(df)
+    day, key = datetime.date(2025, 7, 11), "종로구"
+    preview = store.features_for(day, key, 36.2)
+    assert store.get(day, key) == {}
+    assert preview == store.update(day, key, 36.2)
+    assert store.features_for(day, key) == store.get(day, key)
+
+
+def test_sync_advances_only_new_days(tmp_path, monkeypatch):
+    df = _history()
+    path = str(tmp_path / "gu.csv")
+    days = sorted(df["일자"].unique())
+    feature_store.sync(df[df["일자"] <= days[20]], path)
+    expected = _sorted(FeatureStore.from_frame(df).frame())
+
+    updates = []
+    original = FeatureStore.update
+    monkeypatch.setattr(FeatureStore, "update", lambda self, *a: updates.append(a) or original(self, *a))
+    monkeypatch.setattr(FeatureStore, "rebuild", lambda self, df: pytest.fail("rebuild 호출"))
+    for day in days[21:]:
+        store = feature_store.sync(df[df["일자"] <= day], path)
+
+    assert len(updates) == int((df["일자"] > days[20]).sum())
+    pd.testing.assert_frame_equal(_sorted(store.frame()), expected)
+    pd.testing.assert_frame_equal(_sorted(FeatureStore.load(path).frame()), expected)
+
+
+def test_lag_model_requires_lag_features(tmp_path, monkeypatch):
+    xgb = pytest.importorskip("xgboost")
+    import model_utils
+    from model_artifact import write_artifact
+    from schema import FEATURES
+
+    rng = np.random.default_rng(0)
+    features = list(FEATURES) + LAG_FEATURES
+    model = xgb.XGBRegressor(n_estimators=5, max_depth=2)
+    model.fit(rng.uniform(20, 40, (200, len(features))), rng.poisson(3, 200))
+    write_artifact(model, features, str(tmp_path / "lag.artifact"))
+    df = pd.DataFrame({"일자": ["2025-08-01", "2025-08-02"], "지역": "서울특별시", HI_COL: [34.0, 35.5]})
+    FeatureStore.from_frame(df, "지역").save(str(tmp_path / "store.csv"))
+
+    monkeypatch.setattr(model_utils, "ARTIFACT_FILE", str(tmp_path / "lag.artifact"))
+    monkeypatch.setattr(model_utils, "LAG_STORE_FILE", str(tmp_path / "store.csv"))
+    model_utils.load_model(force=True)
+    try:
+        with pytest.raises(ValueError, match="지연"):
+            model_utils.predict_from_weather(34.0, 26.0, 70.0)
+        with pytest.raises(ValueError, match="지연"):
+            model_utils.predict_batch([34.0], [26.0], [70.0])
+
+        day = datetime.date(2025, 8, 3)
+        _, _, _, input_df = model_utils.predict_from_weather(34.0, 26.0, 70.0, day=day, key="서울특별시")
+        assert input_df.loc[0, "연속폭염일수"] == 3
+        pred, batch_df = model_utils.predict_batch([34.0], [26.0], [70.0], day=day, key="서울특별시")
+        assert batch_df.loc[0, "전일체감온도(°C)"] == 35.5
+        assert not np.isnan(pred[0])
+    finally:
+        monkeypatch.undo()
+        model_utils.load_model(force=True)
@@ -0,0 +1,205 @@
+import base64
+import hashlib
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pandas as pd
+import pytest
+
+from github_publisher import GitHubPublisher, PublishError, git_blob_sha
+from ingest import dataset_bytes, merge_dataset_bytes
+
+PATH = "ML_asos_dataset.csv"
+
+
+class FakeGitHub:
+    """Git Data API 대역: blob/tree/commit/ref 를 메모리에 보관. race 가 있으면 첫 PATCH 직전에 다른 커밋을 끼워 넣는다.
+
+    before[(method, 종류)] 가 있으면 그 요청을 처리하기 전에 호출하고, 응답 (status, payload) 을 돌려주면 그것으로 답한다.
+    """
+
+    def __init__(self, files: dict):
+        self.blobs, self.trees, self.commits = {}, {}, {}
+        self.lock = threading.Lock()
+        self.patches = []
+        self.race = None
+        self.before = {}
+        tree = self._tree({p: self._blob(c) for p, c in files.items()})
+        self.head = self._commit(tree, [])
+
+    def _blob(self, content: bytes) -> str:
+        sha = git_blob_sha(content)
+        self.blobs[sha] = content
+        return sha
+
+    def _tree(self, entries: dict) -> str:
+        sha = hashlib.sha1(json.dumps(sorted(entries.items())).encode()).hexdigest()
+        self.trees[sha] = dict(entries)
+        return sha
+
+    def _commit(self, tree: str, parents: list) -> str:
+        sha = hashlib.sha1(json.dumps([tree, parents, len(self.commits)]).encode()).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": parents}
+        return sha
+
+    def file(self, path: str) -> bytes:
+        return self.blobs[self.trees[self.commits[self.head]["tree"]][path]]
+
+    def push(self, path: str, content: bytes):
+        """다른 작성자의 커밋 (branch 를 바로 전진)."""
+        entries = dict(self.trees[self.commits[self.head]["tree"]])
+        entries[path] = self._blob(content)
+        self.head = self._commit(self._tree(entries), [self.head])
+
+    def handle(self, method: str, path: str, body):
+        parts = urlparse(path).path.split("/git/", 1)[1].split("/")
+        hook = self.before.get((method, parts[0]))
+        if hook is not None:
+            reply = hook(self)
+            if reply is not None:
+                return reply
+        with self.lock:
+            if method == "GET" and parts[0] == "ref":
+                return 200, {"object": {"sha": self.head}}
+            if method == "GET" and parts[0] == "commits":
+                return 200, {"tree": {"sha": self.commits[parts[1]]["tree"]}}
+            if method == "GET" and parts[0] == "trees":
+                return 200, {"tree": [{"path": p, "sha": s} for p, s in self.trees[parts[1]].items()]}
+            if method == "GET" and parts[0] == "blobs":
+                return 200, {"content": base64.encodebytes(self.blobs[parts[1]]).decode(), "encoding": "base64"}
+            if method == "POST" and parts[0] == "blobs":
+                return 201, {"sha": self._blob(base64.b64decode(body["content"]))}
+            if method == "POST" and parts[0] == "trees":
+                entries = dict(self.trees[body["base_tree"]])
+                entries.update({e["path"]: e["sha"] for e in body["tree"]})
+                return 201, {"sha": self._tree(entries)}
+            if method == "POST" and parts[0] == "commits":
+                return 201, {"sha": self._commit(body["tree"], body["parents"])}
+            if method == "PATCH" and parts[0] == "refs":
+                self.patches.append(body["sha"])
+                if self.race is not None:
+                    race, self.race = self.race, None
+                    race(self)
+                if self.commits[body["sha"]]["parents"] != [self.head]:
+                    return 422, {"message": "Update is not a fast forward"}
+                self.head = body["sha"]
+                return 200, {"object": {"sha": self.head}}
+        return 404, {"message": "Not Found"}
+
+
+@pytest.fixture
+def github():
+    fake = FakeGitHub({PATH: dataset_bytes(_rows(("2025-08-01", "종로구", 1)))})
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(n)) if n else None
+            status, payload = fake.handle(self.command, self.path, body)
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        do_GET = do_POST = do_PATCH = _reply
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fake.api_base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield fake
+    server.shutdown()
+    server.server_close()
+
+
+def _rows(*rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["일자", "자치구", "환자수"])
+
+
+def _publisher(github, tmp_path, **kw):
+    return GitHubPublisher("o", "r", "main", "token", api_base=github.api_base,
+                           queue_dir=str(tmp_path / "queue"), merge={PATH: merge_dataset_bytes}, **kw)
+
+
+def _remote(github) -> pd.DataFrame:
+    df = pd.read_csv(io.BytesIO(github.file(PATH)), encoding="utf-8-sig")
+    return df.sort_values(["일자", "자치구"]).reset_index(drop=True)
+
+
+def test_flush_upserts_staged_rows_onto_remote(github, tmp_path, monkeypatch):
+    monkeypatch.setattr("github_publisher.time.sleep", lambda s: None)
+    pub = _publisher(github, tmp_path)
+    pub.stage(PATH, content=dataset_bytes(_rows(("2025-08-01", "종로구", 5))))
+    pub.stage(PATH, content=dataset_bytes(_rows(("2025-08-02", "중구", 2))))
+
+    assert pub.flush("update") == github.head
+    assert _remote(github).values.tolist() == [["2025-08-01", "종로구", 5], ["2025-08-02", "중구", 2]]
+    assert pub.pending() == {}
+    assert sorted(p.name for p in (tmp_path / "queue").iterdir()) == ["index.json", "index.lock"]
+
+    # 원격과 같으면 커밋하지 않는다
+    pub.stage(PATH, content=dataset_bytes(_rows(("2025-08-02", "중구", 2))))
+    assert pub.flush("noop") is None
+    assert len(github.patches) == 1
+
+
+def test_flush_reapplies_rows_after_concurrent_commit(github, tmp_path, monkeypatch):
+    monkeypatch.setattr("github_publisher.time.sleep", lambda s: None)
+
+    def other_writer(fake):
+        # 첫 ref 갱신 직전에 다른 프로세스가 같은 파일에 다른 행을 커밋 → 422
+        merged = merge_dataset_bytes(fake.file(PATH), dataset_bytes(_rows(("2025-08-03", "용산구", 7))))
+        fake.push(PATH, merged)
+
+    github.race = other_writer
+    pub = _publisher(github, tmp_path)
+    pub.stage(PATH, content=dataset_bytes(_rows(("2025-08-02", "중구", 2), ("2025-08-01", "종로구", 9))))
+
+    commit = pub.flush("update")
+
+    assert len(github.patches) == 2              # 422 한 번 후 재시도 성공
+    assert commit == github.head
+    assert _remote(github).values.tolist() == [
+        ["2025-08-01", "종로구", 9], ["2025-08-02", "중구", 2], ["2025-08-03", "용산구", 7],
+    ]
+    assert pub.pending() == {}
+
+
+@pytest.mark.parametrize("kind", ["trees", "commits"])
+def test_flush_raises_publish_error_on_rejected_object(github, tmp_path, kind):
+    github.before[("POST", kind)] = lambda fake: (422, {"message": "Invalid tree info"})
+    pub = _publisher(github, tmp_path)
+    pub.stage(PATH, content=dataset_bytes(_rows(("2025-08-02", "중구", 2))))
+
+    with pytest.raises(PublishError, match="422"):
+        pub.flush("update")
+    assert PATH in pub.pending()               # 변경분은 큐에 남는다
+
+
+def test_flush_survives_concurrent_stage(github, tmp_path):
+    pub = _publisher(github, tmp_path)
+    other = _publisher(github, tmp_path)       # 같은 큐를 쓰는 다른 세션
+    pub.stage(PATH, content=dataset_bytes(_rows(("2025-08-02", "중구", 2))))
+
+    def restage(fake):
+        # flush 가 스냅샷을 뜬 뒤 다른 세션이 다시 스테이징 → 이전 변경분 blob 이 큐에서 지워진다
+        other.stage(PATH, content=dataset_bytes(_rows(("2025-08-03", "용산구", 7))))
+
+    github.before[("GET", "trees")] = restage
+    assert pub.flush("update") == github.head
+    assert _remote(github).values.tolist() == [["2025-08-01", "종로구", 1], ["2025-08-02", "중구", 2]]
+
+    # 나중에 스테이징한 변경분(앞선 행 포함)은 다음 flush 로 나간다
+    github.before.clear()
+    assert pub.flush("next") == github.head
+    assert _remote(github).values.tolist() == [
+        ["2025-08-01", "종로구", 1], ["2025-08-02", "중구", 2], ["2025-08-03", "용산구", 7],
+    ]
+    assert pub.pending() == {}
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from model_artifact import ArtifactError, load_artifact, read_manifest, write_artifact
+from model_utils import SUPPORTED_FEATURES
+
+xgb = pytest.importorskip("xgboost")
+
+
+def _artifact(tmp_path, features):
+    X = np.random.default_rng(0).random((32, len(features)))
+    model = xgb.XGBRegressor(n_estimators=2, max_depth=2).fit(X, X[:, 0])
+    path = str(tmp_path / "m.artifact")
+    write_artifact(model, features, path)
+    return path
+
+
+def test_load_accepts_any_supported_schema(tmp_path):
+    for features in SUPPORTED_FEATURES:
+        path = _artifact(tmp_path, features)
+        model = load_artifact(path, expected_features=SUPPORTED_FEATURES)
+        assert model.features == features
+        assert model.version == read_manifest(path)["model_version"]
+
+
+def test_load_rejects_unsupported_schema(tmp_path):
+    path = _artifact(tmp_path, list(reversed(SUPPORTED_FEATURES[0])))
+    with pytest.raises(ArtifactError):
+        load_artifact(path, expected_features=SUPPORTED_FEATURES)
+    with pytest.raises(ArtifactError):
+        load_artifact(path, expected_features=SUPPORTED_FEATURES[0])
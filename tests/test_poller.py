@@ -0,0 +1,81 @@
+import datetime as dt
+import json
+import struct
+import time
+
+import poller
+from poller import KST, SnapshotWriter, read_snapshot
+from utils import SEOUL_GUS
+
+
+def _records(obs_ts, fcst_ts):
+    return [(60 + i, 127, 30.0 + i, 60.0, 33.0, 24.0, obs_ts, fcst_ts) for i in range(len(SEOUL_GUS))]
+
+
+def test_forecast_from_previous_day_is_not_served(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    now = time.time()
+    yesterday = dt.datetime.fromtimestamp(now, KST).replace(hour=12) - dt.timedelta(days=1)
+    SnapshotWriter(path).write(_records(now, yesterday.timestamp()))
+
+    rec = read_snapshot(path)[SEOUL_GUS[0]]
+    assert rec["T1H"] == 30.0 and rec["REH"] == 60.0
+    assert rec["TMX"] is None and rec["TMN"] is None
+    assert poller.district_inputs(rec) == (30.0, 30.0, 60.0)
+
+
+def test_refresh_forecast_skips_issuance_without_today(tmp_path, monkeypatch):
+    today = dt.datetime.now(KST).date()
+    monkeypatch.setattr(poller, "get_base_datetime", lambda day: (today.strftime("%Y%m%d"), "2300"))
+    monkeypatch.setattr(poller, "fetch_today_tmx_tmn", lambda *a, **k: 1 / 0)
+
+    p = poller.Poller("key", str(tmp_path / "snap.bin"))
+    assert p.refresh_forecast() is True
+    assert p._fcst[0][2] == 0.0               # 요청하지 않았으므로 그대로
+
+
+def test_covers_day():
+    day = dt.date(2025, 8, 1)
+    assert poller.covers_day("20250731", "2300", day)
+    assert poller.covers_day("20250801", "2000", day)
+    assert not poller.covers_day("20250801", "2300", day)
+    assert poller.next_midnight(dt.datetime(2025, 8, 1, 23, 10, tzinfo=KST)) == dt.datetime(2025, 8, 2, tzinfo=KST)
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    now = time.time()
+    writer = SnapshotWriter(path)
+    writer.write(_records(now, now))
+    writer.write(_records(now, now))
+
+    snap = read_snapshot(path)
+    assert list(snap) == SEOUL_GUS
+    rec = snap[SEOUL_GUS[3]]
+    assert (rec["nx"], rec["ny"], rec["T1H"], rec["REH"], rec["TMX"], rec["TMN"]) == (63, 127, 33.0, 60.0, 33.0, 24.0)
+    assert 0 <= rec["obs_age_s"] < 5 and 0 <= rec["fcst_age_s"] < 5
+    assert struct.unpack_from("<Q", writer._mm, poller.SEQ_OFFSET)[0] == 4     # 쓰기마다 +2 (짝수)
+
+
+def test_reader_rejects_mid_write_sequence(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    writer = SnapshotWriter(path)
+    writer.write(_records(time.time(), time.time()))
+    struct.pack_into("<Q", writer._mm, poller.SEQ_OFFSET, 3)   # 쓰는 도중(홀수)에 멈춘 상태
+
+    assert read_snapshot(path, retries=3) == {}
+    struct.pack_into("<Q", writer._mm, poller.SEQ_OFFSET, 4)
+    assert len(read_snapshot(path, retries=3)) == len(SEOUL_GUS)
+
+
+def test_lookup_explanation_matches_version_and_rounded_inputs(tmp_path):
+    path = str(tmp_path / "snap.bin")
+    doc = {"model_version": "abc", "features": ["f1", "f2"],
+           "districts": {"중구": {"inputs": [33.2, 24.1, 61.0], "pred": 12.5, "contribs": [0.3, -0.1]}}}
+    with open(poller.explain_path(path), "w", encoding="utf-8") as f:
+        json.dump(doc, f)
+
+    assert poller.lookup_explanation("중구", 33.24, 24.06, 61, "abc", path) == (12.5, {"f1": 0.3, "f2": -0.1})
+    assert poller.lookup_explanation("중구", 33.3, 24.1, 61.0, "abc", path) is None
+    assert poller.lookup_explanation("중구", 33.2, 24.1, 61.0, "other", path) is None
+    assert poller.lookup_explanation("종로구", 33.2, 24.1, 61.0, "abc", path) is None
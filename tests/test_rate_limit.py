@@ -0,0 +1,27 @@
+import rate_limit
+from rate_limit import RateLimiter
+
+
+def test_quota_follows_current_setting(tmp_path):
+    path = str(tmp_path / "quota.sqlite3")
+    limiter = RateLimiter(path, daily_quota=100)
+    for _ in range(3):
+        limiter.try_acquire("k")
+    assert limiter.remaining("k")["quota"] == 100
+
+    raised = RateLimiter(path, daily_quota=500)
+    assert raised.remaining("k")["quota"] == 500
+    assert raised.remaining("k")["remaining"] == 497
+
+
+def test_mark_exhausted_resets_used_on_new_day(tmp_path, monkeypatch):
+    limiter = RateLimiter(str(tmp_path / "quota.sqlite3"), daily_quota=100)
+    monkeypatch.setattr(rate_limit, "_today", lambda: "20250801")
+    for _ in range(5):
+        limiter.try_acquire("k")
+
+    monkeypatch.setattr(rate_limit, "_today", lambda: "20250802")
+    limiter.mark_exhausted("k")
+    row = limiter._conn().execute("SELECT day, used, exhausted FROM buckets").fetchone()
+    assert row == ("20250802", 0, 1)
+    assert limiter.remaining("k")["remaining"] == 0
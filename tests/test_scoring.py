@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+import policies
+import scoring
+
+
+def _merged(gus):
+    n = len(gus)
+    return pd.DataFrame({
+        "자치구": gus,
+        "고령자비율": np.linspace(0.1, 0.3, n),
+        "야외근로자비율": np.linspace(0.05, 0.2, n),
+        "열쾌적취약인구비율": np.linspace(0.1, 0.4, n),
+        "열섬지수": np.linspace(1, 3, n),
+        "녹지율": np.linspace(0.2, 0.6, n),
+        "냉방보급률": np.linspace(0.7, 0.9, n),
+        "환자수": 0,
+    })
+
+
+def test_nan_score_grades_low():
+    assert list(scoring.calc_payout([np.nan])) == [0]
+    assert list(scoring.score_to_grade([np.nan])) == ["낮음"]
+
+
+def test_negative_prediction_is_zero_patients():
+    gus = ["종로구", "중구", "용산구"]
+    lag = pd.DataFrame({"자치구": gus, "연속폭염일수": 0, "연속극한폭염일수": 0})
+    neg = scoring.damage_table(_merged(gus), -3.5, lag)
+    zero = scoring.damage_table(_merged(gus), 0.0, lag)
+
+    assert (neg["P_pred"] == 0).all()
+    assert list(neg["위험등급"]) == list(zero["위험등급"])
+    assert list(neg["보상금"]) == list(zero["보상금"])
+
+    pols = policies.synthetic_policies(30)
+    pols["자치구"] = pd.Categorical.from_codes(np.arange(30) % 3, categories=gus)
+    _, per_gu = policies.compute_payouts(pols, neg, "2025-07-15")
+    assert list(per_gu["기본보상금"]) == list(neg["보상금"])
@@ -0,0 +1,111 @@
+import pytest
+
+import stale_cache
+from stale_cache import CircuitBreaker, CircuitOpen, StaleCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    monotonic = time
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(stale_cache, "time", c)
+    return c
+
+
+class Refresher:
+    """백그라운드 갱신 대역: 제출만 기록하고 run() 할 때 실행한다."""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, fn, *args):
+        self.jobs.append((fn, args))
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for fn, args in jobs:
+            fn(*args)
+
+
+@pytest.fixture
+def refresher(monkeypatch):
+    r = Refresher()
+    monkeypatch.setattr(stale_cache, "_refresher", r)
+    return r
+
+
+def _fail():
+    raise OSError("upstream down")
+
+
+def test_breaker_open_half_open_closed(clock):
+    br = CircuitBreaker("kma", threshold=2, cooldown=30)
+    for _ in range(2):
+        with pytest.raises(OSError):
+            br.call(_fail)
+    assert br.state == "open"
+    with pytest.raises(CircuitOpen):
+        br.call(lambda: "x")
+
+    clock.now += 30
+    assert br.state == "half_open"
+    assert br.allow() is True
+    assert br.allow() is False          # 시험 호출은 한 번만
+    br.failure()                        # 시험 실패 → 다시 open
+    assert br.state == "open"
+
+    clock.now += 30
+    assert br.call(lambda: "ok") == "ok"
+    assert br.state == "closed"
+
+
+def test_one_refresh_per_stale_key(clock, refresher):
+    cache = StaleCache("t", fresh_ttl=10, max_stale=100)
+    calls = []
+
+    def fetch(v):
+        calls.append(v)
+        return v
+
+    assert cache.get("k", lambda: fetch("v1")) == ("v1", 0.0)
+    clock.now += 20
+    for _ in range(3):
+        assert cache.get("k", lambda: fetch("v2")) == ("v1", 20)
+    assert len(refresher.jobs) == 1
+    assert calls == ["v1"]
+
+    refresher.run()
+    assert calls == ["v1", "v2"]
+    assert cache.get("k", lambda: fetch("v3")) == ("v2", 0)
+
+
+def test_past_max_stale_fetches_synchronously(clock, refresher):
+    cache = StaleCache("t", fresh_ttl=10, max_stale=100)
+    cache.get("k", lambda: "v1")
+    clock.now += 100
+    assert cache.get("k", lambda: "v2") == ("v2", 0.0)
+    assert refresher.jobs == []
+
+    # 실패한 결과(is_good 거짓)는 보관하지 않고 그대로 돌려준다
+    clock.now += 100
+    assert cache.get("k", lambda: {}) == ({}, 0.0)
+    assert cache.age("k") == 100
+
+
+def test_expired_entries_are_dropped_on_store(clock):
+    cache = StaleCache("t", fresh_ttl=10, max_stale=100)
+    cache.get("old", lambda: "v")
+    clock.now += 50
+    cache.get("recent", lambda: "v")
+    clock.now += 60
+    cache.get("new", lambda: "v")
+    assert set(cache._entries) == {"recent", "new"}
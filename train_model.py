@@ -1,138 +1,490 @@
-import pandas as pd
-import joblib
+import argparse
+import datetime
+import math
 import os
-from xgboost import XGBRegressor
-from sklearn.metrics import mean_squared_error, r2_score
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
 
-# ✅ 추론 함수
-from model_utils import predict_from_weather
+from feature_store import FeatureStore, LAG_FEATURES, STORE_FILE
+from model_artifact import ARTIFACT_FILE, data_fingerprint, write_artifact
+from schema import load_static, load_dynamic, combine, iter_chunks, FEATURES, TARGET, REQUIRED
 
 # ✅ 파일 경로
-STATIC_FILE = "ML_static_dataset.csv"  
+STATIC_FILE = "ML_static_dataset.csv"
 DYNAMIC_FILE = "ML_asos_dataset.csv"
 MODEL_FILE = "trained_model.pkl"
 FEATURE_FILE = "feature_names.pkl"
+BUNDLE_FILE = "trained_model_bundle.pkl"
+FEATURE_STORE_FILE = STORE_FILE   # model_utils 가 예측 시 지연 피처를 읽는 파일
+
+GROUP_COLS = {"district": "자치구", "region": "지역"}
+MIN_GROUP_ROWS = 10
+
+CHUNK_ROWS = 200_000   # 디스크 스트리밍 학습: CSV 청크 행 수 (= 한 번에 메모리에 두는 행 예산)
+PARTITIONS = None      # 디스크 스트리밍 학습: (일자, 지역) 해시 파티션 수 (None: 입력 크기 / 청크 예산으로 결정)
+
+XGB_PARAMS = dict(
+    n_estimators=200,
+    max_depth=4,
+    learning_rate=0.1,
+    random_state=42
+)
+
+
+# ✅ 1. 데이터 로드 (정적 + 동적, 표준 스키마로 정제·형변환)
+def load_data(static_file: str = STATIC_FILE, dynamic_file: str = DYNAMIC_FILE):
+    if not os.path.exists(static_file):
+        raise FileNotFoundError(f"정적 데이터 파일이 없습니다: {static_file}")
+
+    df_static = load_static(static_file)
+    print(f"✅ 정적 데이터 로드 완료: {df_static.shape}")
+
+    if dynamic_file and os.path.exists(dynamic_file):
+        df_dynamic = load_dynamic(dynamic_file)
+        print(f"✅ 동적 데이터 로드 완료: {df_dynamic.shape}")
+        df = combine(df_static, df_dynamic)
+    else:
+        print("⚠️ 동적 데이터 없음 → 정적 데이터만 사용")
+        df = df_static.copy()
+
+    print(f"📊 결합 후 전체 행 수: {len(df)} (메모리 {df.memory_usage(deep=True).sum() / 1024:.0f} KiB)")
+    return df
+
+
+# ✅ 2. 결측치 제거 + (일자, 지역) 집계
+def aggregate(df, keys=("일자", "지역")):
+    print("\n📌 결측치 개수:")
+    print(df[REQUIRED].isna().sum())
+
+    df = df.dropna(subset=REQUIRED)
+    print("🧹 결측치 제거 후 행 수:", len(df))
+
+    # 범주형 키: 관측된 조합만
+    grouped = df.groupby(list(keys), observed=True).agg({
+        '최고체감온도(°C)': 'mean',
+        '최고기온(°C)': 'mean',
+        '평균기온(°C)': 'mean',
+        '최저기온(°C)': 'mean',
+        '평균상대습도(%)': 'mean',
+        '환자수': 'sum'
+    }).reset_index()
+    print(f"📊 집계 완료: {grouped.shape}")
+
+    if len(grouped) == 0 or not all(col in grouped.columns for col in FEATURES + [TARGET]):
+        raise ValueError("학습 가능한 데이터가 없습니다.")
+    return grouped
+
+
+# ✅ 3. 모델 학습 / 평가
+def fit(grouped, features=FEATURES, params=None):
+    from xgboost import XGBRegressor
+
+    X = grouped[list(features)]
+    y = grouped[TARGET].astype("float32")
+    model = XGBRegressor(**(params or XGB_PARAMS))
+    model.fit(X, y)
+    return model
+
+
+def evaluate(model, grouped, features=FEATURES) -> dict:
+    from sklearn.metrics import mean_squared_error, r2_score
+
+    y = grouped[TARGET].astype("float32")
+    y_pred = model.predict(grouped[list(features)])
+    mse = mean_squared_error(y, y_pred)
+    scores = {"r2": r2_score(y, y_pred), "rmse": mse ** 0.5}  # ✔ squared=False 사용 안 함 (버전 호환성)
+
+    print("\n📈 모델 성능 평가")
+    print(f"  - R²: {scores['r2']:.4f}")
+    print(f"  - RMSE: {scores['rmse']:.4f}")
+    return scores
+
+
+# ✅ 4. 저장 (단일 아티팩트 + 예전 피클 두 개; 앱은 아티팩트를 우선 사용)
+def save(model, features=FEATURES, model_file: str = MODEL_FILE, feature_file: str = FEATURE_FILE,
+         artifact_file: str = ARTIFACT_FILE, fingerprint: dict = None, scores: dict = None):
+    joblib.dump(model, model_file)
+    joblib.dump(list(features), feature_file)
+    print(f"\n✅ 모델 및 피처 저장 완료 → '{model_file}', '{feature_file}'")
+    print(f"🧠 사용된 피처: {list(features)}")
+    if artifact_file:
+        manifest = write_artifact(model, features, artifact_file, fingerprint, scores, XGB_PARAMS)
+        sizes = {f: os.path.getsize(f) for f in (model_file, feature_file, artifact_file)}
+        print(f"📦 아티팩트 저장 완료 → '{artifact_file}' (모델 {manifest['model_version']}, "
+              f"{sizes[artifact_file] / 1024:.1f} KiB / 피클 {(sizes[model_file] + sizes[feature_file]) / 1024:.1f} KiB)")
+
+
+# ✅ 5. 추론 함수 연동 테스트 (방금 저장한 모델을 다시 읽어 확인)
+def smoke_test(model_file: str = MODEL_FILE, feature_file: str = FEATURE_FILE, artifact_file: str = ARTIFACT_FILE):
+    import model_utils
+
+    print("\n🧪 예측 함수 연동 테스트 (predict_from_weather)")
+    model_utils.MODEL_FILE, model_utils.FEATURE_FILE = model_file, feature_file
+    model_utils.ARTIFACT_FILE = artifact_file or ""
+    model_utils.load_model(force=True)
+
+    sample_tmx = 34.0
+    sample_tmn = 26.0
+    sample_reh = 70.0
+    pred, avg_temp, heat_index, input_df = model_utils.predict_from_weather(
+        sample_tmx, sample_tmn, sample_reh, day=datetime.date.today(), key="서울특별시")
+
+    print(f"  - 입력: TMX={sample_tmx}, TMN={sample_tmn}, REH={sample_reh}")
+    print(f"  - 평균기온: {avg_temp:.2f}°C")
+    print(f"  - 체감온도: {heat_index:.2f}°C")
+    print(f"  - 예측 환자 수: {pred:.2f}명")
+    print("  - 모델 입력 벡터:")
+    print(input_df)
+    return pred
+
+
+# ✅ 6. (선택) 자치구/광역 단위 개별 모델 병렬 학습
+_shared = {}
+
+def _init_group_worker(x_path: str, y_path: str, threads: int):
+    # 부모가 저장한 피처 행렬을 복사 없이 memmap 으로 공유
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    _shared["X"] = np.load(x_path, mmap_mode="r")
+    _shared["y"] = np.load(y_path, mmap_mode="r")
+    _shared["threads"] = threads
+
+
+def _fit_group(task):
+    from xgboost import XGBRegressor
+
+    name, start, stop, params = task
+    X = np.asarray(_shared["X"][start:stop])
+    y = np.asarray(_shared["y"][start:stop])
+    model = XGBRegressor(**params, n_jobs=_shared["threads"])
+    model.fit(X, y)
+    return name, bytes(model.get_booster().save_raw("ubj")), stop - start
+
+
+def train_per_group(df, group_col: str = "자치구", n_jobs: int = None, threads_per_model: int = 1,
+                    params=None, min_rows: int = MIN_GROUP_ROWS) -> dict:
+    """그룹(자치구/지역)마다 XGBoost 모델을 프로세스 풀에서 병렬 학습 → 번들 딕셔너리.
+
+    피처 행렬은 그룹 순으로 정렬해 .npy 로 한 번만 쓰고, 워커는 memmap 으로 자기 구간만 읽는다.
+    모델당 스레드 수(threads_per_model) × 워커 수가 코어 수를 넘지 않도록 n_jobs 기본값을 잡는다.
+    """
+    grouped = aggregate(df.dropna(subset=[group_col]), keys=("일자", group_col))
+    grouped = grouped.sort_values([group_col, "일자"], kind="stable").reset_index(drop=True)
+    params = params or XGB_PARAMS
+
+    counts = grouped.groupby(group_col, observed=True, sort=False).size()
+    tasks, start = [], 0
+    for name, n in counts.items():
+        if n >= min_rows:
+            tasks.append((str(name), start, start + int(n), params))
+        else:
+            print(f"⚠️ {name}: 행 {n}개 < {min_rows} → 개별 모델 생략 (통합 모델 사용)")
+        start += int(n)
+    if not tasks:
+        raise ValueError(f"{group_col} 단위로 학습 가능한 그룹이 없습니다.")
 
-print("📂 현재 디렉토리:", os.getcwd())
-print("📄 파일 목록:", os.listdir())
+    n_jobs = n_jobs or max(1, (os.cpu_count() or 1) // max(1, threads_per_model))
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="heatai-") as tmp:
+        x_path, y_path = os.path.join(tmp, "X.npy"), os.path.join(tmp, "y.npy")
+        np.save(x_path, grouped[list(FEATURES)].to_numpy(dtype=np.float32))
+        np.save(y_path, grouped[TARGET].to_numpy(dtype=np.float32))
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_group_worker,
+                                 initargs=(x_path, y_path, threads_per_model)) as pool:
+            results = list(pool.map(_fit_group, tasks))
 
-# ✅ 정적 데이터 로드 (CSV)
-if not os.path.exists(STATIC_FILE):
-    print(f"❌ 정적 데이터 파일이 없습니다: {STATIC_FILE}")
-    exit(1)
+    elapsed = time.perf_counter() - t0
+    print(f"🧩 {group_col} 모델 {len(results)}개 학습 완료: {elapsed:.2f}s (workers={n_jobs}, threads/model={threads_per_model})")
+    return {
+        "group_col": group_col,
+        "features": list(FEATURES),
+        "models": {name: raw for name, raw, _ in results},
+        "rows": {name: n for name, _, n in results},
+        "params": dict(params),
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
 
-df_static = pd.read_csv(STATIC_FILE, encoding="cp949")
-print(f"✅ 정적 데이터 로드 완료: {df_static.shape}")
 
-# 🔧 열 이름 정제
-df_static.columns = df_static.columns.str.strip().str.replace('\n', '').str.replace(' ', '')
+def run_per_group(group: str, static_file: str = STATIC_FILE, dynamic_file: str = DYNAMIC_FILE,
+                  bundle_file: str = BUNDLE_FILE, n_jobs: int = None, threads_per_model: int = 1) -> dict:
+    df = load_data(static_file, dynamic_file)
+    bundle = train_per_group(df, GROUP_COLS[group], n_jobs=n_jobs, threads_per_model=threads_per_model)
+    joblib.dump(bundle, bundle_file)
+    print(f"✅ 모델 번들 저장 완료 → '{bundle_file}'")
+    return bundle
 
-# 🔧 '일자' 생성
-if '일시' in df_static.columns and pd.api.types.is_numeric_dtype(df_static['일시']):
-    df_static['일자'] = pd.to_datetime('1899-12-30') + pd.to_timedelta(df_static['일시'], unit='D')
-    df_static['일자'] = df_static['일자'].dt.strftime('%Y-%m-%d')
-elif '일시' in df_static.columns:
-    df_static['일자'] = pd.to_datetime(df_static['일시'], errors='coerce').dt.strftime('%Y-%m-%d')
 
-# 🔧 '지역' 통일
-for col in ['광역자치단체', '지역', '시도']:
-    if col in df_static.columns:
-        df_static['지역'] = df_static[col]
-        break
+# ✅ 7. (선택) 지연·이동창 피처 결합 (서빙과 같은 FeatureStore 정의)
+def add_lag_features(grouped, key_col: str = "지역", store_file: str = FEATURE_STORE_FILE):
+    store = FeatureStore(key_col)
+    feats = store.rebuild(grouped)
+    if store_file:
+        store.save(store_file)
+        print(f"✅ 피처 저장소 저장 완료 → '{store_file}' ({len(feats)}행)")
+    keyed = grouped.assign(_key=grouped[key_col].astype(str))
+    feats = feats.rename(columns={key_col: "_key"})
+    return keyed.merge(feats, on=["일자", "_key"], how="left").drop(columns="_key")
 
-# 🔧 불필요한 열 제거
-df_static = df_static.drop(columns=[col for col in ['일시', '광역자치단체', '시도'] if col in df_static.columns])
 
-# ✅ 동적 데이터 로드
-if os.path.exists(DYNAMIC_FILE):
+# ✅ 8. (선택) 디스크 스트리밍 학습 (전체 DataFrame 을 메모리에 올리지 않음)
+# 1) CSV 를 청크로 읽어 (일자, 지역) 해시로 파티션 파일에 흘려 쓴다 (청크 1개만 메모리에 있음)
+#    파티션 수는 입력 크기 추정치 / 청크 예산이라 파티션 하나가 대략 청크 1개 분량이다.
+# 2) 파티션마다 조각을 하나씩 부분 집계(합계·개수)해 누적 → 피처 샤드(.npy) 저장
+#    (조각 1개 + 누적 집계만 메모리에 있고, 누적이 예산을 넘으면 그 자리에서 다시 합친다)
+# 3) 샤드를 memmap 으로 하나씩 넘기는 DataIter → ExtMemQuantileDMatrix (캐시는 디스크)
+_AGG_COLS = FEATURES + [TARGET]
+
+def _peak_rss_mb() -> float:
     try:
-        df_dynamic = pd.read_csv(DYNAMIC_FILE, encoding="utf-8-sig")
-    except UnicodeDecodeError:
-        df_dynamic = pd.read_csv(DYNAMIC_FILE, encoding="cp949")
-    print(f"✅ 동적 데이터 로드 완료: {df_dynamic.shape}")
-    df = pd.concat([df_static, df_dynamic], ignore_index=True)
-else:
-    print("⚠️ 동적 데이터 없음 → 정적 데이터만 사용")
-    df = df_static.copy()
-
-print(f"📊 결합 후 전체 행 수: {len(df)}")
-
-# ✅ 열 이름 다시 정제 (전체 통일)
-df.columns = df.columns.str.strip().str.replace('\n', '').str.replace(' ', '')
-
-# ✅ 결측치 제거 대상
-required_columns = [
-    '일자', '지역', '최고체감온도(°C)', '최고기온(°C)',
-    '평균기온(°C)', '최저기온(°C)', '평균상대습도(%)', '환자수'
-]
-print("\n📌 결측치 개수:")
-print(df[required_columns].isna().sum())
-
-df = df.dropna(subset=required_columns)
-print("🧹 결측치 제거 후 행 수:", len(df))
-
-# ✅ 집계
-grouped = df.groupby(['일자', '지역']).agg({
-    '최고체감온도(°C)': 'mean',
-    '최고기온(°C)': 'mean',
-    '평균기온(°C)': 'mean',
-    '최저기온(°C)': 'mean',
-    '평균상대습도(%)': 'mean',
-    '환자수': 'sum'
-}).reset_index()
-print(f"📊 집계 완료: {grouped.shape}")
-
-# ✅ 피처 및 타겟 정의
-features = [
-    '최고체감온도(°C)', '최고기온(°C)', '평균기온(°C)',
-    '최저기온(°C)', '평균상대습도(%)'
-]
-target = '환자수'
-
-# ✅ 학습 가능성 검사
-if len(grouped) == 0 or not all(col in grouped.columns for col in features + [target]):
-    print("❌ 학습 가능한 데이터가 없습니다.")
-    exit(1)
-
-X = grouped[features]
-y = grouped[target]
-
-# ✅ 모델 학습
-model = XGBRegressor(
-    n_estimators=200,
-    max_depth=4,
-    learning_rate=0.1,
-    random_state=42
-)
-model.fit(X, y)
-
-# ✅ 성능 평가
-y_pred = model.predict(X)
-r2 = r2_score(y, y_pred)
-mse = mean_squared_error(y, y_pred)
-rmse = mse ** 0.5  # ✔ squared=False 사용 안 함 (버전 호환성)
-
-print("\n📈 모델 성능 평가")
-print(f"  - R²: {r2:.4f}")
-print(f"  - RMSE: {rmse:.4f}")
-
-# ✅ 저장
-joblib.dump(model, MODEL_FILE)
-joblib.dump(features, FEATURE_FILE)
-print(f"\n✅ 모델 및 피처 저장 완료 → '{MODEL_FILE}', '{FEATURE_FILE}'")
-print(f"🧠 사용된 피처: {features}")
-
-# ✅ 추론 함수 테스트
-print("\n🧪 예측 함수 연동 테스트 (predict_from_weather)")
-sample_tmx = 34.0
-sample_tmn = 26.0
-sample_reh = 70.0
-
-pred, avg_temp, heat_index, input_df = predict_from_weather(sample_tmx, sample_tmn, sample_reh)
-
-print(f"  - 입력: TMX={sample_tmx}, TMN={sample_tmn}, REH={sample_reh}")
-print(f"  - 평균기온: {avg_temp:.2f}°C")
-print(f"  - 체감온도: {heat_index:.2f}°C")
-print(f"  - 예측 환자 수: {pred:.2f}명")
-print(f"  - 모델 입력 벡터:")
-print(input_df)
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except ImportError:  # Windows
+        return float("nan")
+
+
+def estimate_rows(sources, sample_bytes: int = 1 << 20) -> int:
+    """파일 크기 / 앞부분 표본의 평균 행 길이로 전체 행 수를 추정 (파일을 끝까지 읽지 않음)."""
+    total = 0
+    for path, _ in sources:
+        with open(path, "rb") as f:
+            sample = f.read(sample_bytes)
+        if sample:
+            total += math.ceil(os.path.getsize(path) / (len(sample) / max(sample.count(b"\n"), 1)))
+    return total
+
+
+def partition_count(sources, chunksize: int = CHUNK_ROWS) -> int:
+    """파티션 하나가 청크 예산(chunksize 행)을 넘지 않도록 입력 크기에서 파티션 수를 정한다."""
+    return max(1, math.ceil(estimate_rows(sources) / chunksize))
+
+
+def spill_partitions(sources, work_dir: str, n_parts: int = PARTITIONS, chunksize: int = CHUNK_ROWS) -> int:
+    """sources: [(경로, 정적여부)]. 각 청크를 (일자, 지역) 해시 파티션별 .npy 조각으로 저장. 반환: 총 행 수.
+
+    조각 열: [일자(일 수), 지역 코드, FEATURES..., 환자수] (float64)
+    """
+    n_parts = n_parts or partition_count(sources, chunksize)
+    regions = {}
+    total, chunk_no = 0, 0
+    for path, static in sources:
+        for chunk in iter_chunks(path, static=static, chunksize=chunksize):
+            t0 = time.perf_counter()
+            days = chunk["일자"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+            codes = np.array([regions.setdefault(r, len(regions)) for r in chunk["지역"].astype(str)], dtype=np.int64)
+            block = np.column_stack([days, codes, chunk[_AGG_COLS].to_numpy(dtype=np.float64)])
+            part = (days * 31 + codes) % n_parts
+            for p in np.unique(part):
+                np.save(os.path.join(work_dir, f"part{p:03d}_{chunk_no:05d}.npy"), block[part == p])
+            dt_s = time.perf_counter() - t0
+            total += len(chunk)
+            print(f"  📥 청크 {chunk_no} ({os.path.basename(path)}): {len(chunk):,}행, "
+                  f"{len(chunk) / max(dt_s, 1e-9):,.0f}행/s, peak RSS {_peak_rss_mb():.0f} MB")
+            chunk_no += 1
+    return total
+
+
+def _partial_agg(block: np.ndarray):
+    """조각 → (일자, 지역)별 피처 합계·비결측 개수, 환자수 합계 (평균은 모두 합친 뒤 나눈다)."""
+    import pandas as pd
+
+    g = pd.DataFrame(block, columns=["_day", "_region"] + _AGG_COLS).groupby(["_day", "_region"], sort=False)
+    return pd.concat([g[_AGG_COLS].sum(), g[FEATURES].count().add_suffix("#n")], axis=1)
+
+
+def build_shards(work_dir: str, n_parts: int, budget_rows: int = CHUNK_ROWS) -> list:
+    """파티션별 조각을 하나씩 부분 집계해 (일자, 지역) 샤드 (X.npy, y.npy, 행 수) 목록으로. 조각은 지운다.
+
+    메모리에는 조각 1개와 누적 부분 집계만 있으며, 누적이 budget_rows 를 넘으면 다시 합쳐 줄인다.
+    """
+    import glob
+    import pandas as pd
+
+    shards = []
+    for p in range(n_parts):
+        pieces = sorted(glob.glob(os.path.join(work_dir, f"part{p:03d}_*.npy")))
+        if not pieces:
+            continue
+        t0 = time.perf_counter()
+        acc, acc_rows, n_in = [], 0, 0
+        for f in pieces:
+            block = np.load(f)
+            os.remove(f)
+            n_in += len(block)
+            acc.append(_partial_agg(block))
+            acc_rows += len(acc[-1])
+            if acc_rows > budget_rows and len(acc) > 1:
+                acc = [pd.concat(acc).groupby(level=[0, 1], sort=False).sum()]
+                acc_rows = len(acc[0])
+        agg = pd.concat(acc).groupby(level=[0, 1], sort=True).sum()
+        X = agg[FEATURES].to_numpy(dtype=np.float64) / agg[[f + "#n" for f in FEATURES]].to_numpy(dtype=np.float64)
+
+        x_path = os.path.join(work_dir, f"shard{p:03d}_X.npy")
+        y_path = os.path.join(work_dir, f"shard{p:03d}_y.npy")
+        np.save(x_path, X.astype(np.float32))
+        np.save(y_path, agg[TARGET].to_numpy(dtype=np.float32))
+        shards.append((x_path, y_path, len(agg)))
+        dt_s = time.perf_counter() - t0
+        print(f"  🧱 샤드 {p}: {n_in:,}행 → {len(agg):,}행, {n_in / max(dt_s, 1e-9):,.0f}행/s")
+    if not shards:
+        raise ValueError("학습 가능한 데이터가 없습니다.")
+    return shards
+
+
+def _shard_iter(shards: list, cache_prefix: str):
+    import xgboost as xgb
+
+    class ShardIter(xgb.DataIter):
+        """샤드를 하나씩 memmap 으로 열어 XGBoost 에 넘긴다."""
+
+        def __init__(self):
+            self._i = 0
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data) -> bool:
+            if self._i == len(shards):
+                return False
+            x_path, y_path, _ = shards[self._i]
+            input_data(data=np.load(x_path, mmap_mode="r"), label=np.load(y_path, mmap_mode="r"),
+                       feature_names=list(FEATURES))
+            self._i += 1
+            return True
+
+        def reset(self):
+            self._i = 0
+
+    return ShardIter()
+
+
+def fit_out_of_core(shards: list, work_dir: str, params=None):
+    """샤드 반복자 → 외부 메모리 DMatrix 로 학습. 저장 형식 호환을 위해 XGBRegressor 로 감싸 반환."""
+    import xgboost as xgb
+
+    params = dict(params or XGB_PARAMS)
+    train_params = {"objective": "reg:squarederror", "tree_method": "hist",
+                    "max_depth": params.get("max_depth", 6), "eta": params.get("learning_rate", 0.3),
+                    "seed": params.get("random_state", 0)}
+    it = _shard_iter(shards, os.path.join(work_dir, "cache"))
+    t0 = time.perf_counter()
+    if hasattr(xgb, "ExtMemQuantileDMatrix"):
+        dtrain = xgb.ExtMemQuantileDMatrix(it, max_bin=256)
+    else:  # xgboost < 3.0
+        dtrain = xgb.DMatrix(it)
+    print(f"  🗂️ 외부 메모리 DMatrix 구성: {dtrain.num_row():,}행, {time.perf_counter() - t0:.2f}s")
+    booster = xgb.train(train_params, dtrain, num_boost_round=params.get("n_estimators", 100))
+
+    model = xgb.XGBRegressor(**params)
+    model.load_model(bytearray(booster.save_raw("ubj")))
+    return model
+
+
+def evaluate_shards(model, shards: list) -> dict:
+    """샤드 단위로 예측하며 R²/RMSE 를 누적 계산 (전체 y 를 모으지 않음)."""
+    n = sse = sy = syy = 0.0
+    for x_path, y_path, _ in shards:
+        y = np.load(y_path).astype(np.float64)
+        y_pred = model.predict(np.load(x_path, mmap_mode="r"))
+        n += len(y)
+        sse += float(((y - y_pred) ** 2).sum())
+        sy += float(y.sum())
+        syy += float((y ** 2).sum())
+    sst = syy - sy * sy / n
+    scores = {"r2": 1 - sse / sst if sst else float("nan"), "rmse": (sse / n) ** 0.5}
+    print("\n📈 모델 성능 평가 (스트리밍)")
+    print(f"  - R²: {scores['r2']:.4f}")
+    print(f"  - RMSE: {scores['rmse']:.4f}")
+    return scores
+
+
+def run_out_of_core(static_file: str = STATIC_FILE, dynamic_file: str = DYNAMIC_FILE,
+                    model_file: str = MODEL_FILE, feature_file: str = FEATURE_FILE, test: bool = True,
+                    chunksize: int = CHUNK_ROWS, n_parts: int = PARTITIONS, work_dir: str = None,
+                    artifact_file: str = ARTIFACT_FILE) -> dict:
+    """디스크 스트리밍 학습 파이프라인. 최대 메모리는 청크·파티션 크기로 제한된다."""
+    if not os.path.exists(static_file):
+        raise FileNotFoundError(f"정적 데이터 파일이 없습니다: {static_file}")
+    sources = [(static_file, True)]
+    if dynamic_file and os.path.exists(dynamic_file):
+        sources.append((dynamic_file, False))
+
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="heatai-ooc-", dir=work_dir) as tmp:
+        n_parts = n_parts or partition_count(sources, chunksize)
+        rows = spill_partitions(sources, tmp, n_parts, chunksize)
+        print(f"✅ 스트리밍 읽기 완료: {rows:,}행 → 파티션 {n_parts}개")
+        shards = build_shards(tmp, n_parts, chunksize)
+        print(f"📊 집계 완료: {sum(n for _, _, n in shards):,}행, 샤드 {len(shards)}개")
+        model = fit_out_of_core(shards, tmp)
+        scores = evaluate_shards(model, shards)
+        fingerprint = data_fingerprint((np.load(x, mmap_mode="r"), np.load(y, mmap_mode="r")) for x, y, _ in shards)
+    save(model, FEATURES, model_file, feature_file, artifact_file, fingerprint, scores)
+    if test:
+        smoke_test(model_file, feature_file, artifact_file)
+    print(f"\n⏱️ 전체 소요 시간: {time.perf_counter() - t0:.2f}s, peak RSS {_peak_rss_mb():.0f} MB")
+    return scores
+
+
+def run(static_file: str = STATIC_FILE, dynamic_file: str = DYNAMIC_FILE,
+        model_file: str = MODEL_FILE, feature_file: str = FEATURE_FILE, test: bool = True,
+        lag_features: bool = False, artifact_file: str = ARTIFACT_FILE) -> dict:
+    """전체 학습 파이프라인. 반환: 평가 지표."""
+    t0 = time.perf_counter()
+    grouped = aggregate(load_data(static_file, dynamic_file))
+    features = list(FEATURES)
+    if lag_features:
+        grouped = add_lag_features(grouped)
+        features += LAG_FEATURES
+    model = fit(grouped, features)
+    scores = evaluate(model, grouped, features)
+    fingerprint = data_fingerprint([(grouped[features].to_numpy(dtype=np.float32), grouped[TARGET].to_numpy())])
+    save(model, features, model_file, feature_file, artifact_file, fingerprint, scores)
+    if test:
+        smoke_test(model_file, feature_file, artifact_file)
+    print(f"\n⏱️ 전체 소요 시간: {time.perf_counter() - t0:.2f}s")
+    return scores
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="HeatAI XGBoost 학습")
+    ap.add_argument("--static", default=STATIC_FILE, help="정적 데이터 CSV")
+    ap.add_argument("--dynamic", default=DYNAMIC_FILE, help="동적(ASOS) 데이터 CSV")
+    ap.add_argument("--model-out", default=MODEL_FILE)
+    ap.add_argument("--features-out", default=FEATURE_FILE)
+    ap.add_argument("--artifact-out", default=ARTIFACT_FILE, help="부스터 + 피처 매니페스트 단일 파일 ('' 이면 생략)")
+    ap.add_argument("--no-test", action="store_true", help="저장 후 predict_from_weather 연동 테스트 생략")
+    ap.add_argument("--lag-features", action="store_true", help="전일·3/7일 이동창·연속 폭염일수 피처 추가")
+    ap.add_argument("--per-group", choices=sorted(GROUP_COLS), help="자치구/광역 단위 개별 모델 번들 학습")
+    ap.add_argument("--bundle-out", default=BUNDLE_FILE)
+    ap.add_argument("--jobs", type=int, default=None, help="병렬 학습 프로세스 수 (기본: 코어 수 / 모델당 스레드)")
+    ap.add_argument("--threads-per-model", type=int, default=1)
+    ap.add_argument("--out-of-core", action="store_true", help="CSV 를 청크로 흘려 읽고 외부 메모리 DMatrix 로 학습")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--partitions", type=int, default=PARTITIONS, help="기본: 입력 크기 / --chunk-rows 로 자동 결정")
+    ap.add_argument("--work-dir", default=None, help="스트리밍 학습 임시 파일 위치 (기본: 시스템 임시 폴더)")
+    args = ap.parse_args(argv)
+
+    print("📂 현재 디렉토리:", os.getcwd())
+    try:
+        if args.out_of_core:
+            if args.lag_features or args.per_group:
+                raise ValueError("--out-of-core 는 --lag-features / --per-group 과 함께 쓸 수 없습니다.")
+            run_out_of_core(args.static, args.dynamic, args.model_out, args.features_out, test=not args.no_test,
+                            chunksize=args.chunk_rows, n_parts=args.partitions, work_dir=args.work_dir,
+                            artifact_file=args.artifact_out)
+        elif args.per_group:
+            run_per_group(args.per_group, args.static, args.dynamic, args.bundle_out,
+                          n_jobs=args.jobs, threads_per_model=args.threads_per_model)
+        else:
+            run(args.static, args.dynamic, args.model_out, args.features_out, test=not args.no_test,
+                lag_features=args.lag_features, artifact_file=args.artifact_out)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
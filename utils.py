@@ -1,10 +1,19 @@
 import requests
-import pandas as pd
+import numpy as np
 import datetime
 import datetime as dt 
 import math
+import os
+import threading
+import time
 from urllib.parse import unquote
 
+import metrics
+from rate_limit import RateLimited, default_limiter
+from regions import SEOUL_GU_CENTERS, SEOUL_GUS, region_to_latlon, region_to_stn_id  # noqa: F401 (utils 경로로도 재노출)
+from singleflight import SingleFlight
+from stale_cache import CircuitBreaker, CircuitOpen, stale_while_revalidate
+
 # ---- Streamlit cache 안전 래퍼 ----
 try:
     import streamlit as st
@@ -15,23 +24,6 @@ except Exception:
             return fn
         return _wrap
 
-# ----------------------- 파라미터 정렬 -----------------------
-region_to_stn_id = {
-    "서울특별시": 108, "부산광역시": 159, "대구광역시": 143, "인천광역시": 112,
-    "광주광역시": 156, "대전광역시": 133, "울산광역시": 152, "세종특별자치시": 131,
-    "경기도": 119, "강원도": 101, "충청북도": 131, "충청남도": 133,
-    "전라북도": 146, "전라남도": 165, "경상북도": 137, "경상남도": 155, "제주특별자치도": 184
-}
-
-region_to_latlon = {
-    "서울특별시": (37.5665, 126.9780), "부산광역시": (35.1796, 129.0756), "대구광역시": (35.8722, 128.6025),
-    "인천광역시": (37.4563, 126.7052), "광주광역시": (35.1595, 126.8526), "대전광역시": (36.3504, 127.3845),
-    "울산광역시": (35.5384, 129.3114), "세종특별자치시": (36.4800, 127.2890), "경기도": (37.4138, 127.5183),
-    "강원도": (37.8228, 128.1555), "충청북도": (36.6358, 127.4917), "충청남도": (36.5184, 126.8000),
-    "전라북도": (35.7167, 127.1442), "전라남도": (34.8161, 126.4630), "경상북도": (36.5760, 128.5056),
-    "경상남도": (35.4606, 128.2132), "제주특별자치도": (33.4996, 126.5312)
-}
-
 # ----------------------- 체감온도 산식 (기상청 2022 개정) -----------------------
 def compute_tw_stull(ta, rh):
     try:
@@ -60,10 +52,102 @@ def compute_heat_index_kma2022(ta, rh):
     )
     return round(heat_index, 1)
 
+def compute_heat_index_array(ta, rh):
+    """compute_heat_index_kma2022 의 벡터 버전 (배열 입력 → float32 배열, 계산 불가 시 NaN)."""
+    ta = np.asarray(ta, dtype=np.float64)
+    rh = np.asarray(rh, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        tw = (
+            ta * np.arctan(0.151977 * np.sqrt(rh + 8.313659))
+            + np.arctan(ta + rh)
+            - np.arctan(rh - 1.67633)
+            + 0.00391838 * np.power(rh, 1.5) * np.arctan(0.023101 * rh)
+            - 4.686035
+        )
+        tw = np.round(tw, 3)
+        heat_index = (
+            -0.2442
+            + 0.55399 * tw
+            + 0.45535 * ta
+            - 0.0022 * (tw ** 2)
+            + 0.00278 * tw * ta
+            + 3.0
+        )
+    return np.round(heat_index, 1).astype(np.float32)
+
 # ----------------------- 공통 상수 -----------------------
 KMA_BASE = "http://apis.data.go.kr/1360000/"
 KST = dt.timezone(dt.timedelta(hours=9))
 
+# ----------------------- 요청 합치기 (singleflight) -----------------------
+# 같은 격자(nx, ny)·같은 발표시각 요청은 동시 세션 수와 무관하게 한 번만 나간다.
+# HEATAI_SINGLEFLIGHT_DIR 설정 시 같은 호스트의 다른 프로세스와도 합친다.
+# 다른 프로세스와는 정상 응답(resultCode 00)만 공유 (오류·자료없음은 각자 다시 요청)
+_flight = SingleFlight(lock_dir=os.environ.get("HEATAI_SINGLEFLIGHT_DIR") or None,
+                       share=lambda resp: resp.get("header", {}).get("resultCode") == "00")
+
+def _flight_key(endpoint: str, params: dict):
+    return (endpoint,) + tuple(
+        str(params.get(k)) for k in ("nx", "ny", "base_date", "base_time", "stnIds", "startDt", "endDt")
+    )
+
+# ----------------------- 엔드포인트별 차단기 -----------------------
+# 연속 3회 네트워크/HTTP 오류면 60초 동안 해당 엔드포인트 호출을 멈춘다 (타임아웃 대기 반복 방지).
+_breakers = {}
+
+def _breaker(name: str) -> CircuitBreaker:
+    b = _breakers.get(name)
+    if b is None:
+        b = _breakers.setdefault(name, CircuitBreaker(
+            name,
+            threshold=int(os.environ.get("HEATAI_BREAKER_THRESHOLD", "3")),
+            cooldown=float(os.environ.get("HEATAI_BREAKER_COOLDOWN", "60")),
+        ))
+    return b
+
+def breaker_states() -> dict:
+    return {name: b.state for name, b in _breakers.items()}
+
+# 우선순위별 속도 제한 대기 한도(초): 실시간은 짧게 기다리고 실패, 백필은 오래 기다린다
+RATE_WAIT = {"realtime": 2.0, "precompute": 10.0, "backfill": 60.0}
+QUOTA_EXCEEDED = "22"  # LIMITED_NUMBER_OF_SERVICE_REQUESTS_EXCEEDS_ERROR
+
+def kma_request(endpoint: str, params: dict, timeout: float = 10, priority: str = "realtime") -> dict:
+    """KMA_BASE 하위 엔드포인트 호출 → JSON의 response 딕셔너리 (진행 중 동일 요청은 공유).
+
+    실제 업스트림 호출 전에 키별 공유 예산(rate_limit)에서 토큰을 받으며, 받지 못하면 RateLimited.
+    """
+    name = endpoint.rsplit("/", 1)[-1]
+
+    def fetch():
+        breaker = _breaker(name)
+        if breaker.state == "open":  # 예산 토큰을 쓰기 전에 먼저 거른다
+            metrics.incr("breaker.rejected", endpoint=name)
+            raise CircuitOpen(f"{name}: 업스트림 차단 중")
+        limiter = default_limiter() if os.environ.get("HEATAI_RATE_LIMIT", "1") != "0" else None
+        if limiter is not None:
+            try:
+                limiter.acquire(params.get("serviceKey", ""), priority, timeout=RATE_WAIT[priority])
+            except RateLimited:
+                metrics.incr("kma.rate_limited", endpoint=name, priority=priority)
+                raise
+        def upstream():
+            metrics.incr("kma.upstream", endpoint=name)
+            with metrics.span("kma.upstream", endpoint=name):
+                r = requests.get(KMA_BASE + endpoint, params=params, timeout=timeout)
+                r.raise_for_status()
+                return r.json().get("response", {})
+
+        resp = breaker.call(upstream)
+        code = resp.get("header", {}).get("resultCode")
+        metrics.incr("kma.result_code", endpoint=name, code=code)
+        if code == QUOTA_EXCEEDED and limiter is not None:
+            limiter.mark_exhausted(params.get("serviceKey", ""))
+        return resp
+
+    with metrics.span("kma.request", endpoint=name):
+        return _flight.do(_flight_key(endpoint, params), fetch)
+
 # ----------------------- 좌표 변환 -----------------------
 def convert_latlon_to_xy(lat, lon):
     RE, GRID = 6371.00877, 5.0
@@ -87,81 +171,262 @@ def convert_latlon_to_xy(lat, lon):
     y = ro - ra * math.cos(theta) + YO + 0.5
     return int(x), int(y)
 
+def convert_xy_to_latlon(x, y):
+    """convert_latlon_to_xy 의 역변환 (격자 → 위경도). 배열 입력 가능, 소수 격자(칸 모서리 등)도 허용."""
+    RE, GRID = 6371.00877, 5.0
+    SLAT1, SLAT2, OLON, OLAT = 30.0, 60.0, 126.0, 38.0
+    XO, YO = 43, 136
+    DEGRAD = math.pi / 180.0
+    re = RE / GRID
+    slat1, slat2 = SLAT1 * DEGRAD, SLAT2 * DEGRAD
+    olon, olat = OLON * DEGRAD, OLAT * DEGRAD
+    sn = math.log(math.cos(slat1) / math.cos(slat2)) / math.log(
+        math.tan(math.pi / 4 + slat2 / 2) / math.tan(math.pi / 4 + slat1 / 2)
+    )
+    sf = (math.tan(math.pi / 4 + slat1 / 2) ** sn) * (math.cos(slat1) / sn)
+    ro = re * sf / (math.tan(math.pi / 4 + olat / 2) ** sn)
+    xn = np.asarray(x, dtype=np.float64) - XO
+    yn = ro - np.asarray(y, dtype=np.float64) + YO
+    ra = np.sign(sn) * np.sqrt(xn ** 2 + yn ** 2)
+    alat = 2.0 * np.arctan((re * sf / ra) ** (1.0 / sn)) - math.pi / 2
+    theta = np.arctan2(xn, yn)
+    alon = theta / sn + olon
+    return alat / DEGRAD, alon / DEGRAD
+
 # ----------------------- 예보 조회 기준 시각 -----------------------
-def get_fixed_base_datetime(target_date: datetime.date):
-    now = dt.datetime.now(dt.timezone.utc).astimezone(KST)
-    today_kst = now.date()
-
-    if target_date == today_kst:
-        hour = now.hour
-        if   hour >= 23: bt = "2300"
-        elif hour >= 20: bt = "2000"
-        elif hour >= 17: bt = "1700"
-        elif hour >= 14: bt = "1400"
-        elif hour >= 11: bt = "1100"
-        elif hour >= 8:  bt = "0800"
-        elif hour >= 5:  bt = "0500"
-        else:            bt = "0200"
-        return target_date.strftime("%Y%m%d"), bt
-    else:
-        # 과거/미래 조회용: target_date 유지
-        return target_date.strftime("%Y%m%d"), "0500"
+# 상품별 발표 주기와 API 제공 지연(기상청 OpenAPI 활용가이드 기준)을 모델링해, 처음부터 이미 제공된
+# 발표시각으로 요청한다. 실제로 자료가 있었던(확인된) 최신 시각과 비어 있던 시각을 상품별로 기억해
+# 같은 빈 시각을 MISSING_TTL_S 동안 다시 요청하지 않는다 (그 뒤에는 늦게 올라왔는지 다시 확인).
+#   vilage     단기예보  02/05/08/11/14/17/20/23시 발표, 10분 후 제공, 최근 1일치 발표만 보관
+#   ultra_ncst 초단기실황 매시 정시 발표, 10분 후 제공, 최근 1일치 발표만 보관
+#   asos_day   ASOS 일자료 전일분, 다음날 11시 이후 제공
+PRODUCTS = {
+    "vilage": {"hours": (2, 5, 8, 11, 14, 17, 20, 23), "lag_min": 10, "retention_h": 24},
+    "ultra_ncst": {"hours": tuple(range(24)), "lag_min": 10, "retention_h": 24},
+}
+ASOS_READY_HOUR = 11
+MISSING_TTL_S = 300
+
+class BaseTimeResolver:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._confirmed = {}   # product → 자료가 있었던 최신 datetime
+        self._missing = {}     # (product, datetime) → 비어 있음을 확인한 시각(monotonic), MISSING_TTL_S 동안 유효
+
+    @staticmethod
+    def _slots_before(product: str, until: dt.datetime):
+        """until 이전(포함) 발표시각을 최신부터 차례로."""
+        hours = PRODUCTS[product]["hours"]
+        day = until.replace(hour=0, minute=0, second=0, microsecond=0)
+        while True:
+            for h in reversed(hours):
+                slot = day.replace(hour=h)
+                if slot <= until:
+                    yield slot
+            day -= dt.timedelta(days=1)
+
+    def latest(self, product: str, now: dt.datetime = None) -> dt.datetime:
+        """지금 제공되고 있을 최신 발표시각 (KST). 비어 있던 시각은 건너뛴다."""
+        now = now or dt.datetime.now(KST)
+        ready = now - dt.timedelta(minutes=PRODUCTS[product]["lag_min"])
+        expired = time.monotonic() - MISSING_TTL_S
+        with self._lock:
+            for slot in self._slots_before(product, ready.replace(tzinfo=None)):
+                if self._missing.get((product, slot), expired) <= expired:
+                    break
+            confirmed = self._confirmed.get(product)
+        if confirmed is not None and slot < confirmed <= now.replace(tzinfo=None):
+            slot = confirmed   # 예상보다 일찍 제공된 시각을 이미 확인한 경우
+        return slot
+
+    def previous(self, product: str, slot: dt.datetime) -> dt.datetime:
+        gen = self._slots_before(product, slot)
+        next(gen)
+        return next(gen)
+
+    def confirm(self, product: str, slot: dt.datetime):
+        with self._lock:
+            if slot > self._confirmed.get(product, dt.datetime.min):
+                self._confirmed[product] = slot
+            self._missing.pop((product, slot), None)
+
+    def mark_missing(self, product: str, slot: dt.datetime):
+        metrics.incr("kma.slot_missing", product=product)
+        now = time.monotonic()
+        with self._lock:
+            for k in [k for k, t in self._missing.items() if now - t > MISSING_TTL_S]:
+                del self._missing[k]
+            self._missing[(product, slot)] = now
+
+resolver = BaseTimeResolver()
+
+def _split(slot: dt.datetime):
+    return slot.strftime("%Y%m%d"), slot.strftime("%H%M")
+
+def _join(base_date: str, base_time: str) -> dt.datetime:
+    return dt.datetime.strptime(base_date + base_time, "%Y%m%d%H%M")
+
+def get_base_datetime(target_date: datetime.date, product: str = "vilage"):
+    """target_date 를 조회할 (base_date, base_time).
+
+    오늘·미래는 현재 제공 중인 최신 발표, 과거 날짜는 그 전날 마지막 발표(그날 전체를 덮는 예보)를 쓴다.
+    그 발표가 API 보관 기간(retention_h)을 지났으면 (None, None) — 호출하는 쪽은 요청하지 않는다.
+    """
+    slot = resolver.latest(product)
+    if target_date < slot.date():
+        day_before_end = dt.datetime.combine(target_date, dt.time(0)) - dt.timedelta(hours=1)
+        slot = next(BaseTimeResolver._slots_before(product, day_before_end))
+        oldest = dt.datetime.now(KST).replace(tzinfo=None) - dt.timedelta(hours=PRODUCTS[product]["retention_h"])
+        if slot < oldest:
+            return None, None
+    return _split(slot)
+
+# 예전 이름 유지
+get_fixed_base_datetime = get_base_datetime
+
+def next_release(product: str, now: dt.datetime = None) -> dt.datetime:
+    """now 이후 처음으로 새 발표가 제공될 시각 (발표시각 + 제공 지연, KST)."""
+    now = now or dt.datetime.now(KST)
+    lag = dt.timedelta(minutes=PRODUCTS[product]["lag_min"])
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    while True:
+        for h in PRODUCTS[product]["hours"]:
+            if day.replace(hour=h) + lag > now:
+                return day.replace(hour=h) + lag
+        day += dt.timedelta(days=1)
+
+def latest_asos_date(now: dt.datetime = None) -> datetime.date:
+    """ASOS 일자료가 제공되는 마지막 날짜 (11시 전에는 그저께까지)."""
+    now = now or dt.datetime.now(KST)
+    return now.date() - dt.timedelta(days=1 if now.hour >= ASOS_READY_HOUR else 2)
+
+NO_DATA = "03"
+
+def _request_slot(product: str, endpoint: str, params: dict, timeout: float, priority: str = "realtime"):
+    """발표시각 하나를 요청하고 결과로 resolver 를 갱신 → item 목록 (그 시각에 자료가 없으면 None)."""
+    resp = kma_request(endpoint, params, timeout=timeout, priority=priority)
+    code = resp.get("header", {}).get("resultCode")
+    items = (((resp.get("body") or {}).get("items") or {}).get("item") or []) if code == "00" else []
+    slot = _join(params["base_date"], params["base_time"])
+    if items:
+        resolver.confirm(product, slot)
+        return items
+    if code in ("00", NO_DATA):
+        resolver.mark_missing(product, slot)
+    return None
+
+# ----------------------- 단기예보 파서 -----------------------
+FCST_CATEGORIES = ("TMP", "REH", "TMX", "TMN")
+
+def parse_vilage_fcst(items) -> dict:
+    """getVilageFcst item 목록을 한 번만 순회해 {fcstDate: {category: float32[24]}} 로 채운다.
+
+    인덱스는 fcstTime 의 시(0~23)이며 값이 없는 시각은 NaN.
+    TMX/TMN 은 발표된 시각(보통 15시/06시) 칸에만 값이 들어간다.
+    """
+    days = {}
+    for it in items:
+        cat = it.get("category")
+        if cat not in FCST_CATEGORIES:
+            continue
+        try:
+            val = float(it.get("fcstValue"))
+            hour = int(str(it.get("fcstTime", "0000"))[:2])
+        except (TypeError, ValueError):
+            continue
+        fdate = str(it.get("fcstDate"))
+        day = days.get(fdate)
+        if day is None:
+            day = days[fdate] = {c: np.full(24, np.nan, dtype=np.float32) for c in FCST_CATEGORIES}
+        day[cat][hour] = val
+    return days
+
+def summarize_fcst_day(day: dict) -> dict:
+    """parse_vilage_fcst 의 하루치 배열 → 일 요약 (TMX/TMN/REH/TMP, 시간별 체감온도와 일 최고값).
+
+    TMX/TMN 이 발표되지 않은 슬롯이면 시간별 TMP 의 최고/최저로 대신한다.
+    """
+    def _nan(fn, arr):
+        return float(fn(arr)) if not np.all(np.isnan(arr)) else None
+
+    tmp, reh = day["TMP"], day["REH"]
+    hourly_hi = compute_heat_index_array(tmp, reh)
+    summary = {
+        "TMX": _nan(np.nanmax, day["TMX"]),
+        "TMN": _nan(np.nanmin, day["TMN"]),
+        "REH": _nan(np.nanmean, reh),
+        "TMP": _nan(np.nanmean, tmp),
+        "TMP_MAX": _nan(np.nanmax, tmp),
+        "TMP_MIN": _nan(np.nanmin, tmp),
+        "HI_MAX": None,
+        "HI_HOURLY": hourly_hi,
+    }
+    hi_max = _nan(np.nanmax, hourly_hi)
+    if hi_max is not None:
+        summary["HI_MAX"] = round(hi_max, 1)
+    if summary["TMX"] is None:
+        summary["TMX"] = summary["TMP_MAX"]
+    if summary["TMN"] is None:
+        summary["TMN"] = summary["TMP_MIN"]
+    return summary
 
 # ----------------------- 날씨 API 함수들 -----------------------
+@stale_while_revalidate("get_weather", fresh_ttl=600, is_good=lambda out: bool(out[0]),
+                        key=lambda region_name, target_date, KMA_API_KEY: (region_name, target_date))
 def get_weather(region_name, target_date: datetime.date, KMA_API_KEY: str):
-    """단기예보(getVilageFcst)에서 TMX/TMN/REH/T3H 추출."""
+    """단기예보(getVilageFcst)에서 target_date 의 TMX/TMN/REH/TMP 요약 추출.
+
+    업스트림 장애 시 마지막으로 받은 요약을 즉시 돌려주고 백그라운드에서 갱신한다 (get_weather.age 로 경과 확인).
+    """
     latlon = region_to_latlon.get(region_name, (37.5665, 126.9780))
-    nx, ny = convert_latlon_to_xy(*latlon)
-    base_date, base_time = get_fixed_base_datetime(target_date)
+    return fetch_fcst_summary(*convert_latlon_to_xy(*latlon), target_date, KMA_API_KEY)
 
-    url = KMA_BASE + "VilageFcstInfoService_2.0/getVilageFcst"
-    params = {
-        "serviceKey": unquote(KMA_API_KEY),
-        "numOfRows": "1000",
-        "pageNo": "1",
-        "dataType": "JSON",
-        "base_date": base_date,
-        "base_time": base_time,
-        "nx": nx,
-        "ny": ny
-    }
-    try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        resp = r.json().get("response", {})
-        if resp.get("header", {}).get("resultCode") != "00":
-            return {}, base_date, base_time
+def fetch_fcst_summary(nx: int, ny: int, target_date: datetime.date, KMA_API_KEY: str, priority: str = "realtime"):
+    """격자 (nx, ny) 단기예보의 target_date 요약 → (요약, base_date, base_time). 캐시 없음."""
+    base_date, base_time = get_base_datetime(target_date)
+    if base_date is None:   # 보관 기간이 지난 과거 날짜: 항상 비어 있으므로 요청하지 않음
+        metrics.incr("kma.skipped_unpublished", product="vilage")
+        return {}, base_date, base_time
 
-        items = resp.get("body", {}).get("items", {}).get("item", [])
-        if not items:
-            return {}, base_date, base_time
+    try:
+        for attempt in range(2):  # 발표 지연으로 비어 있던 경우에만 직전 발표로 한 번 더
+            params = {
+                "serviceKey": unquote(KMA_API_KEY),
+                "numOfRows": "1000",
+                "pageNo": "1",
+                "dataType": "JSON",
+                "base_date": base_date,
+                "base_time": base_time,
+                "nx": nx,
+                "ny": ny
+            }
+            items = _request_slot("vilage", "VilageFcstInfoService_2.0/getVilageFcst", params, timeout=10,
+                                  priority=priority)
+            if items is not None:
+                break
+            retry = get_base_datetime(target_date)
+            if attempt or retry[0] is None or retry == (base_date, base_time):
+                return {}, base_date, base_time
+            metrics.incr("kma.retry", endpoint="getVilageFcst")
+            base_date, base_time = retry
 
-        df = pd.DataFrame(items)
-        df["fcstDate"] = df["fcstDate"].astype(str)
-        target_str = target_date.strftime("%Y%m%d")
-        if target_str not in df["fcstDate"].values:
+        day = parse_vilage_fcst(items).get(target_date.strftime("%Y%m%d"))
+        if day is None:
             return {}, base_date, base_time
 
-        df = df[df["fcstDate"] == target_str]
-        df = df[df["category"].isin(["T3H", "TMX", "TMN", "REH"])]
-
-        summary = {}
-        for cat in ["TMX", "TMN", "REH", "T3H"]:
-            vals = df[df["category"] == cat]["fcstValue"]
-            if not vals.empty:
-                try:
-                    vals = vals.astype(float)
-                except Exception:
-                    continue
-                summary[cat] = vals.mean() if cat in ["REH", "T3H"] else float(vals.iloc[0])
+        summary = summarize_fcst_day(day)
+        summary = {k: v for k, v in summary.items() if v is not None}
         return summary, base_date, base_time
-    except Exception:
+    except Exception as e:
+        metrics.record_error("weather.get_weather", e)
         return {}, base_date, base_time
 
 def get_asos_weather(region: str, ymd: str, ASOS_API_KEY: str):
     """ASOS 일별 관측(getWthrDataList)에서 TMX/TMN/REH 추출."""
+    if ymd > latest_asos_date().strftime("%Y%m%d"):  # 아직 제공 전인 날짜는 요청하지 않음
+        metrics.incr("kma.skipped_unpublished", product="asos_day")
+        return {}
     stn_id = region_to_stn_id[region]
-    url = KMA_BASE + "AsosDalyInfoService/getWthrDataList"
     params = {
         "serviceKey": unquote(ASOS_API_KEY),
         "pageNo": 1,
@@ -174,9 +439,7 @@ def get_asos_weather(region: str, ymd: str, ASOS_API_KEY: str):
         "stnIds": stn_id
     }
     try:
-        r = requests.get(url, params=params, timeout=10)
-        r.raise_for_status()
-        resp = r.json().get("response", {})
+        resp = kma_request("AsosDalyInfoService/getWthrDataList", params, timeout=10)
         if resp.get("header", {}).get("resultCode") != "00":
             return {}
         items = resp.get("body", {}).get("items", {}).get("item", [])
@@ -190,9 +453,59 @@ def get_asos_weather(region: str, ymd: str, ASOS_API_KEY: str):
             except Exception:
                 out[k_out] = None
         return out
-    except Exception:
+    except Exception as e:
+        metrics.record_error("weather.get_asos_weather", e)
+        return {}
+
+@metrics.cache_stats("asos_range")
+@cache_data(ttl=3600)
+@metrics.cache_fill
+def get_asos_weather_range(region: str, start_ymd: str, end_ymd: str, ASOS_API_KEY: str,
+                           priority: str = "realtime") -> dict:
+    """ASOS 일별 관측을 기간 한 번의 요청으로 조회 → {yyyymmdd: {TMX, TMN, REH}}."""
+    end_ymd = min(end_ymd, latest_asos_date().strftime("%Y%m%d"))  # 제공 전 날짜는 잘라냄
+    if end_ymd < start_ymd:
+        metrics.incr("kma.skipped_unpublished", product="asos_day")
+        return {}
+    stn_id = region_to_stn_id[region]
+    n_days = (dt.datetime.strptime(end_ymd, "%Y%m%d") - dt.datetime.strptime(start_ymd, "%Y%m%d")).days + 1
+    params = {
+        "serviceKey": unquote(ASOS_API_KEY),
+        "pageNo": 1,
+        "numOfRows": max(n_days, 1),
+        "dataType": "JSON",
+        "dataCd": "ASOS",
+        "dateCd": "DAY",
+        "startDt": start_ymd,
+        "endDt": end_ymd,
+        "stnIds": stn_id
+    }
+    try:
+        resp = kma_request("AsosDalyInfoService/getWthrDataList", params, timeout=20, priority=priority)
+        if resp.get("header", {}).get("resultCode") != "00":
+            return {}
+        items = resp.get("body", {}).get("items", {}).get("item", [])
+        out = {}
+        for item in items:
+            ymd = str(item.get("tm", "")).replace("-", "")
+            if not ymd:
+                continue
+            row = {}
+            for k_in, k_out in [("maxTa", "TMX"), ("minTa", "TMN"), ("avgRhm", "REH")]:
+                try:
+                    row[k_out] = float(item[k_in])
+                except Exception:
+                    row[k_out] = None
+            out[ymd] = row
+        return out
+    except Exception as e:
+        metrics.record_error("weather.get_asos_weather_range", e)
         return {}
 
+def api_budget(api_key: str) -> dict:
+    """키의 오늘 남은 요청 예산 (우선순위별 포함)."""
+    return default_limiter().remaining(unquote(api_key))
+
 def get_risk_level(pred: float):
     if pred == 0: return "🟢 매우 낮음"
     elif pred <= 2: return "🟡 낮음"
@@ -208,7 +521,9 @@ def calculate_avg_temp(tmx, tmn):
 # -------- 초단기/예보 보조 --------
 KMA_ULTRA_BASE = KMA_BASE
 
+@metrics.cache_stats("reverse_geocode")
 @cache_data(ttl=300)
+@metrics.cache_fill
 def _reverse_geocode_to_gu(lat: float, lon: float) -> dict:
     try:
         url = "https://nominatim.openstreetmap.org/reverse"
@@ -235,32 +550,13 @@ def _reverse_geocode_to_gu(lat: float, lon: float) -> dict:
         if not gu.endswith("구") and gu: gu = gu + "구"
 
         return {"gu": gu, "city": city}
-    except Exception:
+    except Exception as e:
+        metrics.record_error("geo.reverse_geocode", e)
         return {}
 
-@cache_data(ttl=180)
-def _get_ultra_now(nx: int, ny: int, KMA_API_KEY: str) -> dict:
-    """기상청 초단기실황(REH, T1H) 조회 (00/30 교차 + 전시간 폴백, resultCode 체크)."""
-    def compute_candidates():
-        now_kst = dt.datetime.now(dt.timezone.utc).astimezone(KST)
-        ref = now_kst - dt.timedelta(minutes=40)
-        hh = ref.strftime("%H")
-        mm = "30" if ref.minute >= 30 else "00"
-        base_date = ref.strftime("%Y%m%d")
-        cands = [(base_date, f"{hh}{mm}")]
-        cands.append((base_date, f"{hh}{'00' if mm == '30' else '30'}"))
-        prev = ref - dt.timedelta(hours=1)
-        cands.append((prev.strftime("%Y%m%d"), f"{prev.strftime('%H')}30"))
-        cands.append((prev.strftime("%Y%m%d"), f"{prev.strftime('%H')}00"))
-        seen, uniq = set(), []
-        for d, t in cands:
-            k = d + t
-            if k not in seen:
-                seen.add(k); uniq.append((d, t))
-        return uniq
-
+def fetch_ultra_now(nx: int, ny: int, KMA_API_KEY: str, priority: str = "realtime") -> dict:
+    """기상청 초단기실황(REH, T1H) 조회. 발표시각은 resolver 가 고르며, 캐시 없음."""
     def call_api(base_date: str, base_time: str):
-        url = KMA_ULTRA_BASE + "VilageFcstInfoService_2.0/getUltraSrtNcst"
         params = {
             "serviceKey": unquote(KMA_API_KEY),
             "dataType": "JSON",
@@ -271,13 +567,10 @@ def _get_ultra_now(nx: int, ny: int, KMA_API_KEY: str) -> dict:
             "nx": nx,
             "ny": ny,
         }
-        r = requests.get(url, params=params, timeout=8)
-        r.raise_for_status()
-        resp = r.json().get("response", {})
-        header = resp.get("header", {})
-        if header.get("resultCode") != "00":
+        items = _request_slot("ultra_ncst", "VilageFcstInfoService_2.0/getUltraSrtNcst", params,
+                              timeout=8, priority=priority)
+        if not items:
             return None
-        items = resp.get("body", {}).get("items", {}).get("item", [])
         reh = t1h = None
         for it in items:
             cat = it.get("category")
@@ -289,53 +582,68 @@ def _get_ultra_now(nx: int, ny: int, KMA_API_KEY: str) -> dict:
             elif cat == "T1H": t1h = val
         if reh is None and t1h is None:
             return None
-        bdate = items[0].get("baseDate", base_date) if items else base_date
-        btime = items[0].get("baseTime", base_time) if items else base_time
+        bdate = items[0].get("baseDate", base_date)
+        btime = items[0].get("baseTime", base_time)
         return {"REH": reh, "T1H": t1h, "base_date": bdate, "base_time": btime}
 
-    last_err = None
-    for bd, bt in compute_candidates():
+    slot = resolver.latest("ultra_ncst")
+    for attempt in range(2):  # 예상보다 늦게 제공된 경우에만 직전 정시로 한 번 더
+        if attempt:
+            metrics.incr("kma.retry", endpoint="getUltraSrtNcst")
+            slot = min(resolver.latest("ultra_ncst"), resolver.previous("ultra_ncst", slot))
         try:
-            out = call_api(bd, bt)
+            out = call_api(*_split(slot))
             if out:
                 return out
         except Exception as e:
-            last_err = e
-            continue
+            metrics.record_error("weather.ultra_now", e)
+            break
     return {"REH": None, "T1H": None, "base_date": None, "base_time": None}
 
-@cache_data(ttl=600)
-def _get_today_tmx_tmn(nx: int, ny: int, KMA_API_KEY: str, base_date: str, base_time: str) -> dict:
+@metrics.cache_stats("ultra_now")
+@cache_data(ttl=180)
+@metrics.cache_fill
+def _get_ultra_now(nx: int, ny: int, KMA_API_KEY: str) -> dict:
+    return fetch_ultra_now(nx, ny, KMA_API_KEY)
+
+def fetch_today_tmx_tmn(nx: int, ny: int, KMA_API_KEY: str, base_date: str, base_time: str,
+                        priority: str = "realtime") -> dict:
+    """단기예보에서 오늘(KST) TMX/TMN 만 추출. 캐시 없음."""
     params = {
         "serviceKey": unquote(KMA_API_KEY),
         "dataType": "JSON",
-        "numOfRows": "500",
+        "numOfRows": "1000",
         "pageNo": "1",
         "base_date": base_date,
         "base_time": base_time,
         "nx": nx,
         "ny": ny,
     }
-    url = KMA_ULTRA_BASE + "VilageFcstInfoService_2.0/getVilageFcst"
     try:
-        r = requests.get(url, params=params, timeout=8)
-        r.raise_for_status()
-        resp = r.json().get("response", {})
-        if resp.get("header", {}).get("resultCode") != "00":
-            return {"TMX": None, "TMN": None}
-        items = resp.get("body", {}).get("items", {}).get("item", [])
-        tmx = tmn = None
+        items = _request_slot("vilage", "VilageFcstInfoService_2.0/getVilageFcst", params, timeout=8,
+                              priority=priority)
+        if items is None:
+            retry = get_base_datetime(dt.datetime.now(KST).date())
+            if retry == (base_date, base_time):
+                return {"TMX": None, "TMN": None}
+            metrics.incr("kma.retry", endpoint="getVilageFcst")
+            params["base_date"], params["base_time"] = retry
+            items = _request_slot("vilage", "VilageFcstInfoService_2.0/getVilageFcst", params, timeout=8,
+                                  priority=priority)
+            if items is None:
+                return {"TMX": None, "TMN": None}
         today_kst = dt.datetime.now(dt.timezone.utc).astimezone(KST).strftime("%Y%m%d")
-        for it in items:
-            if it.get("fcstDate") != today_kst:
-                continue
-            cat = it.get("category")
-            try:
-                val = float(it.get("fcstValue"))
-            except (TypeError, ValueError):
-                continue
-            if cat == "TMX": tmx = val
-            elif cat == "TMN": tmn = val
-        return {"TMX": tmx, "TMN": tmn}
-    except Exception:
+        day = parse_vilage_fcst(items).get(today_kst)
+        if day is None:
+            return {"TMX": None, "TMN": None}
+        summary = summarize_fcst_day(day)
+        return {"TMX": summary["TMX"], "TMN": summary["TMN"]}
+    except Exception as e:
+        metrics.record_error("weather.today_tmx_tmn", e)
         return {"TMX": None, "TMN": None}
+
+@metrics.cache_stats("today_tmx_tmn")
+@cache_data(ttl=600)
+@metrics.cache_fill
+def _get_today_tmx_tmn(nx: int, ny: int, KMA_API_KEY: str, base_date: str, base_time: str) -> dict:
+    return fetch_today_tmx_tmn(nx, ny, KMA_API_KEY, base_date, base_time)